@@ -1,6 +1,10 @@
-from typing import Optional
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional, Dict, Any, AsyncIterator
+import json
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from services.chat_service import ChatService, ChatRequest, ChatResponse, SessionInfo
+from services.session_scheduler import SessionBusyError
+from services.session_router import SessionRouter, ClusterNodes, SessionIds, SessionBlobs
 from api.dependencies import get_chat_service
 
 
@@ -16,10 +20,43 @@ async def chat(
     try:
         response = await chat_service.chat(request)
         return response
+    except SessionBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    chat_service: ChatService = Depends(get_chat_service)
+):
+    """Process a chat message and stream the reflection as server-sent events"""
+    events = chat_service.chat_stream(request)
+    try:
+        # Admission happens before the first event, so a busy session is still a plain 429
+        first = await events.__anext__()
+    except SessionBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return StreamingResponse(
+        _format_sse(_prepend(first, events)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _prepend(first: Dict[str, Any], events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    yield first
+    async for event in events:
+        yield event
+
+
+async def _format_sse(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Encode service events in the server-sent events wire format"""
+    async for event in events:
+        yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
 @router.get("/session/{session_id}", response_model=SessionInfo)
 async def get_session_info(
     session_id: str,
@@ -36,11 +73,27 @@ async def get_session_info(
 async def get_conversation_history(
     session_id: str,
     max_messages: int = 10,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
     chat_service: ChatService = Depends(get_chat_service)
 ):
-    """Get conversation history for a session"""
-    history = await chat_service.get_conversation_history(session_id, max_messages)
-    return {"session_id": session_id, "history": history}
+    """Get a page of conversation history for a session
+    
+    Without cursors this returns the newest ``max_messages`` messages. Pass a
+    page's ``start`` as ``before`` for older messages, or its ``end`` as
+    ``after`` for newer ones.
+    """
+    page = await chat_service.get_history_page(session_id, max_messages, after=after, before=before)
+    if page is None:
+        return {"session_id": session_id, "history": []}
+    return {
+        "session_id": session_id,
+        "history": page["messages"],
+        "start": page["start"],
+        "end": page["end"],
+        "has_more_before": page["has_more_before"],
+        "has_more_after": page["has_more_after"]
+    }
 
 
 @router.delete("/session/{session_id}")
@@ -95,3 +148,44 @@ async def analyze_session(
     if not analysis:
         raise HTTPException(status_code=404, detail="Session not found")
     return analysis
+
+
+def get_session_router(request: Request) -> SessionRouter:
+    """The node's session router; cluster endpoints 404 when not clustered"""
+    session_router = getattr(request.app.state, "session_router", None)
+    if session_router is None:
+        raise HTTPException(status_code=404, detail="Clustering is not enabled")
+    if not session_router.authorized(request.headers.get(SessionRouter.TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Invalid cluster token")
+    return session_router
+
+
+@router.get("/cluster")
+async def cluster_status(session_router: SessionRouter = Depends(get_session_router)):
+    """Node list and forwarding and handoff counters of this node"""
+    return session_router.stats()
+
+
+@router.put("/cluster/nodes")
+async def set_cluster_nodes(body: ClusterNodes, session_router: SessionRouter = Depends(get_session_router)):
+    """Change the node list of this node; call it on every node, old and new"""
+    session_router.set_nodes(body.nodes)
+    return session_router.stats()
+
+
+@router.post("/cluster/sessions/export")
+async def export_sessions(body: SessionIds, session_router: SessionRouter = Depends(get_session_router)):
+    """Copies of sessions the calling node is taking over; they stay here until released"""
+    return {"sessions": session_router.export_sessions(body.session_ids)}
+
+
+@router.post("/cluster/sessions/release")
+async def release_sessions(body: SessionIds, session_router: SessionRouter = Depends(get_session_router)):
+    """Remove sessions the calling node has imported"""
+    return {"released": session_router.release_sessions(body.session_ids)}
+
+
+@router.post("/cluster/sessions/import")
+async def import_sessions(body: SessionBlobs, session_router: SessionRouter = Depends(get_session_router)):
+    """Adopt sessions handed off by another node"""
+    return {"imported": session_router.import_sessions(body.sessions)}
@@ -1,6 +1,12 @@
+import os
+import sys
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+
+# Shared backend packages (core.lexicon, ...) live one directory up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from routes import router
 
 load_dotenv()
@@ -1,16 +1,24 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import json
+from search_index import InvertedIndex
 
 class MemoryManager:
     def __init__(self):
         self.sessions: Dict[str, List[Dict]] = {}
         self.max_messages_per_session = 100  # Limit session size
+        # Search index over all stored messages; document ids run parallel to
+        # each session's message list
+        self._documents: Dict[int, Tuple[str, Dict]] = {}
+        self._session_documents: Dict[str, List[int]] = {}
+        self._next_document_id = 1
+        self.search_index = InvertedIndex(text_of=lambda doc_id: self._documents[doc_id][1]["text"])
 
     def create_session(self, session_id: str) -> None:
         """Create a new session"""
         if session_id not in self.sessions:
             self.sessions[session_id] = []
+            self._session_documents[session_id] = []
 
     def add_message(self, session_id: str, message: str, is_user: bool) -> None:
         """Add a message to the session"""
@@ -25,10 +33,29 @@ class MemoryManager:
         }
         
         self.sessions[session_id].append(message_data)
+        self._index_message(session_id, message_data)
         
         # Limit session size
-        if len(self.sessions[session_id]) > self.max_messages_per_session:
-            self.sessions[session_id] = self.sessions[session_id][-self.max_messages_per_session:]
+        excess = len(self.sessions[session_id]) - self.max_messages_per_session
+        if excess > 0:
+            del self.sessions[session_id][:excess]
+            self._unindex_messages(session_id, excess)
+
+    def _index_message(self, session_id: str, message_data: Dict) -> None:
+        doc_id = self._next_document_id
+        self._next_document_id += 1
+        self._documents[doc_id] = (session_id, message_data)
+        self._session_documents[session_id].append(doc_id)
+        self.search_index.add(doc_id, message_data["text"])
+
+    def _unindex_messages(self, session_id: str, count: Optional[int] = None) -> None:
+        """Drop the oldest ``count`` (default: all) of a session's messages from the index"""
+        doc_ids = self._session_documents.get(session_id, [])
+        count = len(doc_ids) if count is None else count
+        for doc_id in doc_ids[:count]:
+            _, message_data = self._documents.pop(doc_id)
+            self.search_index.remove(doc_id, message_data["text"])
+        del doc_ids[:count]
 
     def get_session_context(self, session_id: str, limit: int = 10) -> List[Dict]:
         """Get recent messages from session for context"""
@@ -44,12 +71,15 @@ class MemoryManager:
     def clear_session(self, session_id: str) -> None:
         """Clear all messages from session"""
         if session_id in self.sessions:
+            self._unindex_messages(session_id)
             self.sessions[session_id] = []
 
     def delete_session(self, session_id: str) -> None:
         """Delete a session entirely"""
         if session_id in self.sessions:
+            self._unindex_messages(session_id)
             del self.sessions[session_id]
+            del self._session_documents[session_id]
 
     def get_session_summary(self, session_id: str) -> Dict:
         """Get summary information about a session"""
@@ -69,21 +99,20 @@ class MemoryManager:
             "created": messages[0]["timestamp"] if messages else None
         }
 
-    def search_sessions(self, query: str, limit: int = 5) -> List[Dict]:
-        """Search through sessions for specific content"""
-        results = []
-        query_lower = query.lower()
+    def search_sessions(self, query: str, limit: int = 5, prefix: bool = False) -> List[Dict]:
+        """Search through sessions for messages containing every word of the query
         
-        for session_id, messages in self.sessions.items():
-            for message in messages:
-                if query_lower in message["text"].lower():
-                    results.append({
-                        "session_id": session_id,
-                        "message": message,
-                        "context": self.get_session_context(session_id, 3)
-                    })
-                    if len(results) >= limit:
-                        return results
+        With ``prefix`` each query word also matches longer words it starts
+        (e.g. "anx" matches "anxious"). Oldest matches come first.
+        """
+        results = []
+        for doc_id in self.search_index.search(query, limit, prefix=prefix):
+            session_id, message = self._documents[doc_id]
+            results.append({
+                "session_id": session_id,
+                "message": message,
+                "context": self.get_session_context(session_id, 3)
+            })
         
         return results
 
@@ -1,6 +1,6 @@
-import re
 from typing import Dict, List
 from dataclasses import dataclass
+from core.lexicon.registry import lexicon, LexiconMatch
 
 @dataclass
 class SafetyResult:
@@ -9,38 +9,53 @@ class SafetyResult:
     risk_level: str
 
 class SafetyLayer:
+    ADVICE_KEYWORDS = [
+        "should", "must", "have to", "need to", "tell me", "give me", "what should",
+        "how should", "recommend", "suggest", "advice", "instruction", "steps",
+        "tell me what to do", "help me decide", "make decision for me"
+    ]
+    
+    # Ordered phrase sequences, equivalent to the "a.*b" regexes they replace
+    DEPENDENCY_PATTERNS = [
+        ("i can't", "without you"),
+        ("i need you to",),
+        ("please tell me",),
+        ("just tell me",),
+        ("i don't know", "help me"),
+    ]
+    
+    DISTRESS_KEYWORDS = [
+        "suicide", "kill myself", "end my life", "want to die",
+        "self harm", "hurt myself", "can't go on", "no reason to live",
+        "better off dead", "want to disappear"
+    ]
+    
+    HIGH_DISTRESS_INDICATORS = [
+        "crisis", "emergency", "urgent", "can't cope", "overwhelmed",
+        "breaking point", "at my limit", "can't take it anymore"
+    ]
+    
+    DEPENDENCY_INDICATORS = [
+        "i can't decide",
+        "i don't know what to do",
+        "i'm lost",
+        "i'm confused",
+        "i need help deciding",
+    ]
+    
     def __init__(self):
-        self.adice_keywords = [
-            "should", "must", "have to", "need to", "tell me", "give me", "what should",
-            "how should", "recommend", "suggest", "advice", "instruction", "steps",
-            "tell me what to do", "help me decide", "make decision for me"
-        ]
-        
-        self.dependency_patterns = [
-            r"i can't.*without you",
-            r"i need you to.*",
-            r"please tell me.*",
-            r"just tell me.*",
-            r"i don't know.*help me",
-        ]
-        
-        self.distress_keywords = [
-            "suicide", "kill myself", "end my life", "want to die",
-            "self harm", "hurt myself", "can't go on", "no reason to live",
-            "better off dead", "want to disappear"
-        ]
-        
-        self.high_distress_indicators = [
-            "crisis", "emergency", "urgent", "can't cope", "overwhelmed",
-            "breaking point", "at my limit", "can't take it anymore"
-        ]
+        self.advice_keywords = self.ADVICE_KEYWORDS
+        self.dependency_patterns = self.DEPENDENCY_PATTERNS
+        self.distress_keywords = self.DISTRESS_KEYWORDS
+        self.high_distress_indicators = self.HIGH_DISTRESS_INDICATORS
+        self.dependency_indicators = self.DEPENDENCY_INDICATORS
 
     def check_message(self, message: str) -> SafetyResult:
         """Check message for safety concerns and determine if redirection is needed"""
-        message_lower = message.lower()
+        match = lexicon.scan(message)
         
         # Check for immediate safety concerns
-        if self._check_immediate_safety(message_lower):
+        if self._check_immediate_safety(match):
             return SafetyResult(
                 requires_redirection=True,
                 redirect_response=self._get_safety_redirect(),
@@ -48,7 +63,7 @@ class SafetyLayer:
             )
         
         # Check for high distress
-        if self._check_high_distress(message_lower):
+        if self._check_high_distress(match):
             return SafetyResult(
                 requires_redirection=True,
                 redirect_response=self._get_distress_redirect(),
@@ -56,7 +71,7 @@ class SafetyLayer:
             )
         
         # Check for advice-seeking behavior
-        if self._check_advice_seeking(message_lower):
+        if self._check_advice_seeking(match):
             return SafetyResult(
                 requires_redirection=True,
                 redirect_response=self._get_reflection_redirect(),
@@ -64,7 +79,7 @@ class SafetyLayer:
             )
         
         # Check for dependency language
-        if self._check_dependency(message_lower):
+        if self._check_dependency(match):
             return SafetyResult(
                 requires_redirection=True,
                 redirect_response=self._get_autonomy_redirect(),
@@ -77,38 +92,22 @@ class SafetyLayer:
             risk_level="safe"
         )
 
-    def _check_immediate_safety(self, message: str) -> bool:
+    def _check_immediate_safety(self, match: LexiconMatch) -> bool:
         """Check for immediate safety concerns"""
-        return any(keyword in message for keyword in self.distress_keywords)
+        return match.has("safety.distress")
 
-    def _check_high_distress(self, message: str) -> bool:
+    def _check_high_distress(self, match: LexiconMatch) -> bool:
         """Check for high emotional distress"""
-        return any(keyword in message for keyword in self.high_distress_indicators)
+        return match.has("safety.high_distress")
 
-    def _check_advice_seeking(self, message: str) -> bool:
+    def _check_advice_seeking(self, match: LexiconMatch) -> bool:
         """Check if user is seeking direct advice"""
-        # Check for advice keywords
-        if any(keyword in message for keyword in self.advice_keywords):
-            return True
-        
-        # Check for dependency patterns
-        for pattern in self.dependency_patterns:
-            if re.search(pattern, message):
-                return True
-        
-        return False
+        # Advice keywords or dependency patterns
+        return match.has("safety.advice") or match.has("safety.advice_pattern")
 
-    def _check_dependency(self, message: str) -> bool:
+    def _check_dependency(self, match: LexiconMatch) -> bool:
         """Check for dependency language"""
-        dependency_indicators = [
-            "i can't decide",
-            "i don't know what to do",
-            "i'm lost",
-            "i'm confused",
-            "i need help deciding",
-        ]
-        
-        return any(indicator in message for indicator in dependency_indicators)
+        return match.has("safety.dependency")
 
     def _get_safety_redirect(self) -> str:
         """Get response for immediate safety concerns"""
@@ -141,3 +140,10 @@ class SafetyLayer:
         
         import random
         return random.choice(autonomy_redirects)
+
+
+lexicon.register("safety.distress", SafetyLayer.DISTRESS_KEYWORDS)
+lexicon.register("safety.high_distress", SafetyLayer.HIGH_DISTRESS_INDICATORS)
+lexicon.register("safety.advice", SafetyLayer.ADVICE_KEYWORDS)
+lexicon.register_sequences("safety.advice_pattern", SafetyLayer.DEPENDENCY_PATTERNS)
+lexicon.register("safety.dependency", SafetyLayer.DEPENDENCY_INDICATORS)
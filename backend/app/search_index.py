@@ -0,0 +1,138 @@
+from typing import Callable, Dict, List, Iterator, Optional, Tuple
+from bisect import bisect_left, insort
+import heapq
+import re
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_MAX_CHAR = chr(0x10FFFF)  # Sorts after every character a token can continue with
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens of a text"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class InvertedIndex:
+    """Incrementally maintained token -> document postings
+
+    Documents are integer ids that callers hand out in increasing order. Each
+    posting list is a dict used as an insertion-ordered set, so it iterates in
+    ascending id order (oldest first) and still supports O(1) removal. A
+    sorted vocabulary backs prefix lookups.
+    """
+
+    # Prefix terms expanding to more tokens than this are checked against the
+    # document text (via ``text_of``) instead of one posting lookup per token
+    MAX_PREFIX_LOOKUPS = 16
+
+    def __init__(self, text_of: Optional[Callable[[int], str]] = None):
+        self.text_of = text_of
+        self.postings: Dict[str, Dict[int, None]] = {}
+        self.vocabulary: List[str] = []
+        self.document_count = 0
+
+    def add(self, doc_id: int, text: str) -> None:
+        """Index a document; ``doc_id`` must be larger than any indexed id"""
+        for token in set(tokenize(text)):
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                insort(self.vocabulary, token)
+            posting[doc_id] = None
+        self.document_count += 1
+
+    def remove(self, doc_id: int, text: str) -> None:
+        """Remove a document indexed with the same text"""
+        for token in set(tokenize(text)):
+            posting = self.postings.get(token)
+            if posting is None or doc_id not in posting:
+                continue
+            del posting[doc_id]
+            if not posting:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+        self.document_count -= 1
+
+    def expand(self, prefix: str) -> List[str]:
+        """Vocabulary tokens starting with ``prefix``"""
+        start = bisect_left(self.vocabulary, prefix)
+        return self.vocabulary[start:bisect_left(self.vocabulary, prefix + _MAX_CHAR, start)]
+
+    def search(self, query: str, limit: int = 5, prefix: bool = False) -> List[int]:
+        """Oldest ``limit`` documents containing every query term
+        
+        With ``prefix`` each term matches any token it is a prefix of. One
+        term drives an ascending scan of its postings and the others are
+        membership checks; the scan stops once ``limit`` documents matched.
+        The driver is the term with the lowest estimated scan cost (see
+        ``_scan_cost``), which for exact terms is the rarest one.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or limit <= 0:
+            return []
+        
+        candidates = []
+        for term in terms:
+            if prefix:
+                postings = [self.postings[token] for token in self.expand(term)]
+            else:
+                posting = self.postings.get(term)
+                postings = [posting] if posting is not None else []
+            if not postings:
+                return []
+            candidates.append((sum(len(posting) for posting in postings), term, postings))
+        
+        driver_index = min(range(len(candidates)), key=lambda index: self._scan_cost(candidates, index, limit))
+        _, _, driver = candidates.pop(driver_index)
+        checks = []
+        for _, term, postings in candidates:
+            if len(postings) > self.MAX_PREFIX_LOOKUPS and self.text_of is not None:
+                checks.append(self._text_check(term))
+            else:
+                checks.append(self._posting_check(postings))
+        results = []
+        for doc_id in self._ascending(driver):
+            if all(check(doc_id) for check in checks):
+                results.append(doc_id)
+                if len(results) >= limit:
+                    break
+        return results
+
+    # Relative cost of merging in one more posting list, in scanned postings
+    MERGE_COST_PER_LIST = 2
+    
+    def _scan_cost(self, candidates: List[Tuple[int, str, List[Dict[int, None]]]], index: int, limit: int) -> float:
+        """Estimated postings touched when candidate ``index`` drives the scan
+        
+        Assuming terms occur independently, a driver posting passes the other
+        checks with the product of their document frequencies, so about
+        ``limit / product`` postings are scanned before the scan stops.
+        """
+        total, _, postings = candidates[index]
+        documents = max(1, self.document_count)
+        selectivity = 1.0
+        for other, (other_total, _, _) in enumerate(candidates):
+            if other != index:
+                selectivity *= min(1.0, other_total / documents)
+        return len(postings) * self.MERGE_COST_PER_LIST + min(total, limit / selectivity)
+    
+    @staticmethod
+    def _posting_check(postings: List[Dict[int, None]]) -> Callable[[int], bool]:
+        if len(postings) == 1:
+            return postings[0].__contains__
+        return lambda doc_id: any(doc_id in posting for posting in postings)
+
+    def _text_check(self, prefix: str) -> Callable[[int], bool]:
+        return lambda doc_id: any(token.startswith(prefix) for token in tokenize(self.text_of(doc_id)))
+
+    @staticmethod
+    def _ascending(postings: List[Dict[int, None]]) -> Iterator[int]:
+        """Distinct ids of several posting lists in ascending order"""
+        if len(postings) == 1:
+            yield from postings[0]
+            return
+        previous = None
+        for doc_id in heapq.merge(*postings):
+            if doc_id != previous:
+                previous = doc_id
+                yield doc_id
@@ -0,0 +1,128 @@
+"""Session routing across local nodes: hop latency, key movement and handoff
+
+Starts ``--nodes`` backend processes (TEST_MODE, so no API calls) on loopback,
+each in its own temporary directory, and then:
+
+- creates sessions through random nodes and times GET /session/{id} on the
+  owner vs through another node, which forwards it
+- reports how many of 100k keys move when one node is added to the ring
+- starts one more node, switches every node to the larger cluster and
+  checks that each moved session arrives intact
+
+    cd backend && python -m benchmarks.cluster
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+import httpx
+from services.session_router import HashRing
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "benchmark"
+
+
+def start_node(port: int, nodes: List[str], workdir: str) -> subprocess.Popen:
+    env = dict(os.environ, TEST_MODE="true", STARTUP_TIMING_REPORT="false", CLUSTER_TOKEN=TOKEN,
+               CLUSTER_NODES=",".join(nodes), CLUSTER_NODE_URL=f"http://127.0.0.1:{port}",
+               PYTHONPATH=BACKEND_DIR)
+    node_dir = os.path.join(workdir, str(port))
+    os.makedirs(node_dir)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=node_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, nodes: List[str]):
+    for node in nodes:
+        for _ in range(120):
+            try:
+                if (await client.get(f"{node}/api/v1/cluster")).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+        else:
+            raise SystemExit(f"{node} did not start")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[int(fraction * (len(values) - 1))]
+
+
+async def run(nodes: List[str], new_node: str, sessions: int, reads: int, start_new_node):
+    rnd = random.Random(1)
+    async with httpx.AsyncClient(timeout=30, headers={"x-cluster-token": TOKEN}) as client:
+        await wait_ready(client, nodes)
+        session_ids = []
+        for index in range(sessions):
+            response = await client.post(rnd.choice(nodes) + "/api/v1/chat",
+                                          json={"message": f"I feel stuck at work today {index}"})
+            session_ids.append(response.json()["session_id"])
+        counts: Dict[str, int] = {}
+        for session_id in session_ids:
+            counts[session_id] = (await client.get(f"{rnd.choice(nodes)}/api/v1/session/{session_id}")).json()["message_count"]
+        
+        ring = HashRing(nodes)
+        direct, hop = [], []
+        for session_id in (session_ids * (reads // sessions + 1))[:reads]:
+            owner = ring.owner(session_id)
+            other = next(node for node in nodes if node != owner)
+            for target, latencies in ((owner, direct), (other, hop)):
+                started = time.perf_counter()
+                await client.get(f"{target}/api/v1/session/{session_id}")
+                latencies.append((time.perf_counter() - started) * 1000)
+        print(f"GET /session/{{id}} on the owner:  p50 {percentile(direct, 0.5):.2f} ms  p99 {percentile(direct, 0.99):.2f} ms")
+        print(f"GET /session/{{id}} via a hop:     p50 {percentile(hop, 0.5):.2f} ms  p99 {percentile(hop, 0.99):.2f} ms")
+        
+        grown = nodes + [new_node]
+        larger = HashRing(grown)
+        keys = [f"key-{index}" for index in range(100_000)]
+        moved_keys = sum(ring.owner(key) != larger.owner(key) for key in keys)
+        print(f"Adding a node to {len(nodes)} moves {100 * moved_keys / len(keys):.1f}% of 100k keys")
+        
+        start_new_node()
+        await wait_ready(client, [new_node])
+        for node in nodes:
+            await client.put(f"{node}/api/v1/cluster/nodes", json={"nodes": grown})
+        moved = [session_id for session_id in session_ids if larger.owner(session_id) != ring.owner(session_id)]
+        await asyncio.sleep(2)
+        intact = 0
+        for session_id in session_ids:
+            response = await client.get(f"{rnd.choice(grown)}/api/v1/session/{session_id}")
+            intact += response.status_code == 200 and response.json()["message_count"] == counts[session_id]
+        print(f"{len(moved)} of {sessions} sessions moved to the new node; {intact} of {sessions} intact after handoff")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark session routing across local nodes")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=8101)
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--reads", type=int, default=600)
+    args = parser.parse_args()
+    
+    ports = [args.base_port + index for index in range(args.nodes + 1)]
+    urls = [f"http://127.0.0.1:{port}" for port in ports]
+    processes = []
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            processes.extend(start_node(port, urls[:-1], workdir) for port in ports[:-1])
+            asyncio.run(run(urls[:-1], urls[-1], args.sessions, args.reads,
+                            lambda: processes.append(start_node(ports[-1], urls, workdir))))
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Concurrent query embeddings: one upstream call each vs coalesced by EmbeddingBatcher
+
+Serves a stand-in OpenAI-compatible /embeddings endpoint from a background
+thread. Like the real API under a concurrency limit, it answers every call
+after a fixed latency and serves only a few calls at once. OpenAIEmbeddings
+is pointed at it, and ``--queries`` concurrent requests over ``--distinct``
+texts are sent directly and through the batcher, with the settings' window
+and batch size, over real loopback HTTP.
+
+    cd backend && python -m benchmarks.embedding_batching
+"""
+import argparse
+import asyncio
+import base64
+import struct
+import threading
+import time
+from typing import List
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from langchain_openai import OpenAIEmbeddings
+from config.settings import settings
+from knowledge.embeddings.batcher import EmbeddingBatcher
+
+DIMENSIONS = 256
+
+stand_in = FastAPI()
+stand_in.state.latency = 0.05
+stand_in.state.concurrency = 8
+stand_in.state.slots = None
+stand_in.state.calls = 0
+
+
+def _vector(text: str) -> List[float]:
+    return [float((len(text) + index) % 7) for index in range(DIMENSIONS)]
+
+
+@stand_in.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    if stand_in.state.slots is None:
+        # Bound to the server's event loop, so created on first use
+        stand_in.state.slots = asyncio.Semaphore(stand_in.state.concurrency)
+    async with stand_in.state.slots:
+        stand_in.state.calls += 1
+        await asyncio.sleep(stand_in.state.latency)
+    data = []
+    for index, text in enumerate(texts):
+        vector = _vector(str(text))
+        if body.get("encoding_format") == "base64":
+            vector = base64.b64encode(struct.pack(f"<{DIMENSIONS}f", *vector)).decode("ascii")
+        data.append({"object": "embedding", "index": index, "embedding": vector})
+    return JSONResponse({"object": "list", "data": data, "model": body["model"],
+                         "usage": {"prompt_tokens": len(texts), "total_tokens": len(texts)}})
+
+
+def serve(port: int, latency_ms: float, concurrency: int) -> uvicorn.Server:
+    stand_in.state.latency = latency_ms / 1000.0
+    stand_in.state.concurrency = concurrency
+    server = uvicorn.Server(uvicorn.Config(stand_in, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run(client: OpenAIEmbeddings, queries: List[str], batched: bool) -> float:
+    if batched:
+        embed = EmbeddingBatcher(client.aembed_documents, window_ms=settings.embedding_batch_window_ms,
+                                 max_batch_size=settings.embedding_batch_max_size).embed
+    else:
+        embed = client.aembed_query
+    # Warm the connection pool outside the timing
+    await client.aembed_query("warm up")
+    stand_in.state.calls = 0
+    started = time.perf_counter()
+    vectors = await asyncio.gather(*(embed(query) for query in queries))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    assert all(vector == _vector(query) for query, vector in zip(queries, vectors))
+    return elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding request batching")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=150)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--upstream-concurrency", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    
+    server = serve(args.port, args.latency_ms, args.upstream_concurrency)
+    queries = [f"query {index % args.distinct}" for index in range(args.queries)]
+    try:
+        for label, batched in (("one call per query", False), ("batched", True)):
+            client = OpenAIEmbeddings(model=settings.embedding_model, api_key="benchmark",
+                                      base_url=f"http://127.0.0.1:{args.port}/v1", check_embedding_ctx_length=False)
+            elapsed_ms = asyncio.run(run(client, queries, batched))
+            print(f"{label:>18}: {args.queries} queries in {elapsed_ms:7.1f} ms "
+                  f"using {stand_in.state.calls} upstream calls")
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Per-call overhead of ChatCompletionsClient vs ChatOpenAI
+
+Serves a stand-in OpenAI-compatible /chat/completions endpoint (JSON and SSE
+streaming, fixed reply, no model behind it) from a background thread, then
+points both clients at it and times sequential invoke, ainvoke and astream
+calls plus a concurrent ainvoke burst. The stand-in answers instantly, so the
+numbers are client overhead plus loopback HTTP.
+
+    cd backend && python -m benchmarks.llm_client
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from typing import List
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from langchain_core.messages import HumanMessage, SystemMessage
+from core.reflection_engine.llm_client import ChatCompletionsClient
+
+REPLY = "What feels most true for you right now?"
+MESSAGES = [SystemMessage(content="You are Lucid. " * 50), HumanMessage(content="I feel stuck at work lately.")]
+
+stand_in = FastAPI()
+
+
+def _chunk(model: str, delta: dict, finish_reason=None) -> str:
+    return "data: " + json.dumps({"id": "bench", "object": "chat.completion.chunk", "created": 0, "model": model,
+                                  "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}) + "\n\n"
+
+
+@stand_in.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body["model"]
+    if body.get("stream"):
+        async def events():
+            for word in REPLY.split(" "):
+                yield _chunk(model, {"content": word + " "})
+            yield _chunk(model, {}, "stop")
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+    return JSONResponse({
+        "id": "bench", "object": "chat.completion", "created": 0, "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": REPLY}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 9, "total_tokens": 19}
+    })
+
+
+def serve(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(stand_in, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def report(label: str, latencies: List[float]):
+    latencies = sorted(latencies)
+    print(f"{label:>20}: p50 {statistics.median(latencies):6.2f} ms   p95 {latencies[int(0.95 * len(latencies))]:6.2f} ms")
+
+
+def timed_invoke(client, calls: int) -> List[float]:
+    client.invoke(MESSAGES)
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        client.invoke(MESSAGES)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def timed_async(client, calls: int, concurrency: int):
+    await client.ainvoke(MESSAGES)
+    ainvoke, astream = [], []
+    for _ in range(calls):
+        started = time.perf_counter()
+        await client.ainvoke(MESSAGES)
+        ainvoke.append((time.perf_counter() - started) * 1000)
+    for _ in range(calls):
+        started = time.perf_counter()
+        text = "".join([chunk.content async for chunk in client.astream(MESSAGES)])
+        astream.append((time.perf_counter() - started) * 1000)
+    assert text.strip() == REPLY, text
+    started = time.perf_counter()
+    await asyncio.gather(*(client.ainvoke(MESSAGES) for _ in range(concurrency)))
+    return ainvoke, astream, concurrency / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LLM clients against a local stand-in server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    
+    from langchain_openai import ChatOpenAI
+    
+    server = serve(args.port)
+    base_url = f"http://127.0.0.1:{args.port}/v1"
+    clients = (
+        ("langchain", ChatOpenAI(model="gpt-4o-mini", temperature=0.6, max_tokens=150,
+                                 openai_api_key="benchmark", base_url=base_url)),
+        ("http", ChatCompletionsClient("benchmark", "gpt-4o-mini", base_url=base_url, max_tokens=150))
+    )
+    try:
+        for label, client in clients:
+            report(f"{label} invoke", timed_invoke(client, args.calls))
+            ainvoke, astream, calls_per_second = asyncio.run(timed_async(client, args.calls, args.concurrency))
+            report(f"{label} ainvoke", ainvoke)
+            report(f"{label} astream", astream)
+            print(f"{label + ' ' + str(args.concurrency) + '-way':>20}: {calls_per_second:6.0f} calls/s "
+                  "(bound by the single-process stand-in)")
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
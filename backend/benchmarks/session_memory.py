@@ -0,0 +1,76 @@
+"""Session memory footprint and add_message cost
+
+Fills ``--sessions`` sessions with ten messages each (with analysis and
+validation metadata, as the engine stores them) and reports the traced
+bytes per session. Then it times add_message on sessions already at
+max_conversation_length, where every append also evicts the oldest message.
+It only uses long-standing MemoryManager calls, so it can be run from an
+older checkout for a before/after comparison.
+
+    cd backend && python -m benchmarks.session_memory
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from core.memory.memory_manager import MemoryManager
+from core.memory.memory_store import InMemorySessionStore
+from core.utils.logger import logger
+
+USER_TEXT = "I feel unsure about what comes next at work"
+REPLY_TEXT = "What feels most uncertain right now?"
+
+
+def analyzer(text: str):
+    return {"emotions": ["confusion"], "cognitive_patterns": [], "question_type": "statement",
+            "complexity": 7, "sentiment": "neutral", "context_tags": ["context.emotion.confusion"]}
+
+
+def validation():
+    # A fresh dict per reply, like the validator result the engine stores
+    return {"validation": {"is_valid": True, "violations": [], "confidence": 1.0}}
+
+
+def exchange(memory_manager: MemoryManager, session_id: str):
+    memory_manager.add_messages(session_id, [(USER_TEXT, True, None), (REPLY_TEXT, False, validation())])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark session memory use and add_message")
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--hot-sessions", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    logger.setLevel("WARNING")
+    
+    memory_manager = MemoryManager(max_conversation_length=20, analyzer=analyzer, store=InMemorySessionStore())
+    gc.collect()
+    tracemalloc.start()
+    session_ids = []
+    for _ in range(args.sessions):
+        session_id = memory_manager.create_session()
+        for _ in range(5):
+            exchange(memory_manager, session_id)
+        session_ids.append(session_id)
+    gc.collect()
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{traced / args.sessions:.0f} bytes per session of 10 messages ({args.sessions} sessions)")
+    
+    hot = session_ids[:args.hot_sessions]
+    for session_id in hot:
+        for _ in range(6):
+            exchange(memory_manager, session_id)
+    appended = 0
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        for session_id in hot:
+            memory_manager.add_message(session_id, USER_TEXT, True)
+            memory_manager.add_message(session_id, REPLY_TEXT, False, validation())
+            appended += 2
+    elapsed = time.perf_counter() - started
+    print(f"add_message at capacity: {elapsed / appended * 1e6:.1f} us per message ({appended / elapsed:.0f} msgs/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Threaded session store throughput with 1 vs N lock stripes
+
+Worker threads repeatedly store an exchange and read the session back on
+their own sessions, through MemoryManager on a ShardedSessionStore, for
+``--seconds`` per configuration. Two workloads are run:
+
+- ``python``: the plain in-memory path, which holds the GIL throughout, so
+  striping cannot add parallelism there.
+- ``blocking``: every shard load also waits ``--wait-ms`` without the GIL, as
+  a cold SQLite read or an fsync would, which is where striping pays off.
+
+    cd backend && python -m benchmarks.session_shards
+"""
+import argparse
+import threading
+import time
+from typing import Dict
+from core.memory.memory_manager import MemoryManager
+from core.memory.memory_store import InMemorySessionStore
+from core.memory.sharded_store import ShardedSessionStore
+from core.utils.logger import logger
+
+
+def analyzer(text: str):
+    return {"emotions": ["confusion"], "cognitive_patterns": [], "context_tags": ["context.emotion.confusion"]}
+
+
+def sharded_store(shards: int, wait_ms: float) -> ShardedSessionStore:
+    store = ShardedSessionStore([InMemorySessionStore() for _ in range(shards)])
+    if wait_ms:
+        for shard in store.shards:
+            load = shard.load
+            
+            def blocking_load(session_id, load=load):
+                time.sleep(wait_ms / 1000.0)
+                return load(session_id)
+            shard.load = blocking_load
+    return store
+
+
+def throughput(shards: int, threads: int, sessions: int, seconds: float, wait_ms: float) -> float:
+    memory_manager = MemoryManager(analyzer=analyzer, store=sharded_store(shards, wait_ms))
+    session_ids = [memory_manager.create_session() for _ in range(sessions)]
+    counts: Dict[int, int] = {}
+    deadline = time.perf_counter() + seconds
+    
+    def work(worker: int):
+        own = session_ids[worker::threads]
+        done = 0
+        while time.perf_counter() < deadline:
+            session_id = own[done % len(own)]
+            memory_manager.add_messages(session_id, [("I feel stuck at work", True, None),
+                                                     ("What feels most stuck?", False, None)])
+            memory_manager.get_session(session_id)
+            done += 1
+        counts[worker] = done
+    
+    workers = [threading.Thread(target=work, args=(worker,)) for worker in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(counts.values()) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark session store lock striping")
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--seconds", type=float, default=1.0)
+    parser.add_argument("--wait-ms", type=float, default=0.2)
+    args = parser.parse_args()
+    logger.setLevel("WARNING")
+    
+    thread_counts = (1, 2, 4, 8)
+    print("ops/s (add_messages + get_session) at " + "/".join(map(str, thread_counts)) + " threads")
+    for workload, wait_ms in (("python", 0.0), ("blocking", args.wait_ms)):
+        for shards in (1, args.shards):
+            results = [throughput(shards, threads, args.sessions, args.seconds, wait_ms) for threads in thread_counts]
+            print(f"{workload:>8}, {shards:2d} shard(s): " + " / ".join(f"{ops:7.0f}" for ops in results))
+
+
+if __name__ == "__main__":
+    main()
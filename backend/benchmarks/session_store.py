@@ -0,0 +1,83 @@
+"""Per-turn session store latency: in-memory vs Redis, batched and with the previous call shape
+
+A turn is what a chat request does to its session: resolve it, read the
+history and context tags for the prompt, then store the user message and the
+reply. The batched shape reads both with get_context_with_tags and stores the
+exchange with one add_messages; the previous shape made separate calls for
+each. The Redis runs need a Redis-protocol server at ``--url``; keys use a
+throwaway prefix and are deleted afterwards.
+
+    cd backend && python -m benchmarks.session_store --url redis://localhost:6379/0
+"""
+import argparse
+import os
+import statistics
+import time
+from typing import Callable, List
+from core.memory.memory_manager import MemoryManager
+from core.memory.memory_store import InMemorySessionStore
+from core.memory.redis_store import RedisSessionStore
+from core.utils.logger import logger
+
+VALIDATION = {"validation": {"is_valid": True, "violations": [], "confidence": 1.0}}
+
+
+def analyzer(text: str):
+    return {"emotions": ["anxious"], "cognitive_patterns": [], "context_tags": ["context.emotion.anxiety"]}
+
+
+def batched_turn(memory_manager: MemoryManager, session_id: str, index: int):
+    memory_manager.get_session(session_id)
+    memory_manager.get_context_with_tags(session_id)
+    memory_manager.add_messages(session_id, [(f"user message {index} " * 8, True, None),
+                                             (f"reflection {index} " * 10, False, VALIDATION)])
+
+
+def previous_turn(memory_manager: MemoryManager, session_id: str, index: int):
+    memory_manager.get_session(session_id)
+    memory_manager.get_conversation_context(session_id)
+    memory_manager.get_context_tags(session_id)
+    memory_manager.add_message(session_id, f"user message {index} " * 8, True)
+    memory_manager.add_message(session_id, f"reflection {index} " * 10, False, VALIDATION)
+
+
+def measure(memory_manager: MemoryManager, turn: Callable, turns: int, sessions: int) -> List[float]:
+    session_ids = [memory_manager.create_session() for _ in range(sessions)]
+    latencies = []
+    for index in range(turns):
+        started = time.perf_counter()
+        turn(memory_manager, session_ids[index % sessions], index)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    for session_id in session_ids:
+        memory_manager.delete_session(session_id)
+    return latencies
+
+
+def report(label: str, latencies: List[float]):
+    latencies = sorted(latencies)
+    print(f"{label:>28}: mean {statistics.mean(latencies):8.0f} us   "
+          f"p50 {latencies[len(latencies) // 2]:8.0f} us   p99 {latencies[int(len(latencies) * 0.99)]:8.0f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-turn session store latency")
+    parser.add_argument("--url", help="Redis URL; without it only the in-memory store is measured")
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=50)
+    args = parser.parse_args()
+    logger.setLevel("WARNING")
+    
+    memory = MemoryManager(analyzer=analyzer, store=InMemorySessionStore())
+    report("in-memory", measure(memory, batched_turn, args.turns, args.sessions))
+    if not args.url:
+        return
+    
+    store = RedisSessionStore(args.url, key_prefix=f"lucid:bench:{os.getpid()}:")
+    store.client.ping()
+    redis = MemoryManager(analyzer=analyzer, store=store)
+    report("redis, batched", measure(redis, batched_turn, args.turns, args.sessions))
+    report("redis, previous call shape", measure(redis, previous_turn, args.turns, args.sessions))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,14 +15,102 @@ class Settings(BaseSettings):
     openai_temperature: float = 0.6
     openai_max_tokens: int = 150
     
+    # LLM Client
+    llm_client: str = "langchain"  # langchain (ChatOpenAI) or http (lean pooled chat-completions client)
+    openai_base_url: str = "https://api.openai.com/v1"  # any OpenAI-compatible endpoint (http client only)
+    llm_pool_size: int = 20  # keep-alive connections per client
+    llm_connect_timeout_seconds: float = 5.0
+    llm_timeout_seconds: float = 30.0
+    
     # Vector Store Configuration
-    vector_store_type: str = "faiss"  # faiss or chroma
+    vector_store_type: str = "faiss"  # faiss, chroma or numpy
     vector_store_path: str = "data/vector_store"
     embedding_model: str = "text-embedding-3-small"
+    knowledge_snapshot_path: str = "knowledge/knowledge.snapshot"  # built by python -m knowledge.vector_store.snapshot
+    
+    # Vector Store Persistence (FAISS segment log)
+    vector_store_fsync_policy: str = "always"  # always, interval or never
+    vector_store_fsync_interval_ms: int = 1000
+    vector_store_segment_max_bytes: int = 16 * 1024 * 1024
+    vector_store_compact_min_bytes: int = 64 * 1024 * 1024
+    vector_store_compact_max_age_seconds: float = 3600.0
+    vector_store_compact_check_interval_seconds: float = 60.0  # also checked after every write; 0 disables the timer
+    
+    # Embedding Cache Configuration
+    embedding_cache_enabled: bool = True
+    embedding_cache_max_bytes: int = 64 * 1024 * 1024
+    embedding_cache_path: str = "data/embedding_cache.sqlite3"
+    embedding_cache_max_disk_entries: int = 100_000
+    
+    # Embedding Request Batching
+    embedding_batching_enabled: bool = True
+    embedding_batch_window_ms: float = 5.0
+    embedding_batch_max_size: int = 64
+    
+    # Retrieval Context Cache
+    context_cache_enabled: bool = True
+    context_cache_max_entries: int = 512
+    context_cache_ttl_seconds: float = 300.0
+    
+    # Knowledge Ingest
+    ingest_batch_size: int = 64
+    ingest_max_concurrency: int = 4
+    ingest_chunk_max_chars: int = 320  # three chunks fit get_relevant_context's default 1000-char budget
+    ingest_checkpoint_path: str = "data/ingest_checkpoint.sqlite3"
     
     # Memory Configuration
     max_conversation_length: int = 20
     session_timeout_minutes: int = 30
+    session_expiry_interval_seconds: float = 1.0  # background sweep period (in-memory store only)
+    session_expiry_batch_size: int = 500  # max expiry entries popped per sweep tick
+    session_store_shards: int = 16  # lock stripes of the in-memory store; sessions on different shards never contend
+    
+    # Session Memory Tiers (in-memory store)
+    session_memory_budget_mb: float = 256  # 0 keeps every session as live objects
+    session_hot_fraction: float = 0.5  # share of the budget for live sessions; the rest holds compressed ones
+    session_hot_idle_seconds: float = 120  # idle sessions are compressed after this long
+    session_spill_dir: str = "data/session_spill"
+    
+    # Session Write-Ahead Log (in-memory store)
+    session_wal_enabled: bool = True
+    session_wal_dir: str = "data/session_wal"
+    session_wal_flush_interval_ms: float = 50.0  # durability window; 0 fsyncs every mutation before returning
+    session_wal_fsync: bool = True
+    session_wal_snapshot_interval_seconds: float = 300.0
+    session_wal_snapshot_min_bytes: int = 32 * 1024 * 1024  # log size that triggers a snapshot early
+    
+    # Long-Term Memory (per-user recall across sessions)
+    long_term_memory_enabled: bool = True
+    long_term_memory_path: str = "data/long_term_memory"
+    long_term_memory_top_k: int = 3
+    long_term_memory_min_score: float = 0.3  # cosine similarity below which a past message is not recalled
+    long_term_memory_budget_ms: float = 50.0  # recall gives up after this long and the prompt goes without
+    long_term_memory_flush_interval_seconds: float = 2.0
+    long_term_memory_batch_size: int = 64
+    long_term_memory_max_pending: int = 10_000  # oldest queued messages are dropped beyond this
+    long_term_memory_max_open_partitions: int = 256
+    long_term_memory_min_words: int = 4  # shorter messages are not remembered
+    
+    # Request Scheduling
+    session_max_queued_requests: int = 4  # per session, the running one included; more are rejected with 429
+    
+    # Session Store
+    session_store_type: str = "memory"  # memory or redis (any Redis-protocol server)
+    session_store_url: str = "redis://localhost:6379/0"
+    session_store_key_prefix: str = "lucid:session:"
+    session_store_count_cache_seconds: float = 30.0  # the redis session count is a keyspace SCAN, reused this long
+    
+    # Cluster (session affinity across backend nodes)
+    cluster_nodes: str = ""  # comma-separated base URLs of every node; empty serves every session locally
+    cluster_node_url: str = ""  # this node's URL exactly as listed in cluster_nodes
+    cluster_virtual_nodes: int = 128
+    cluster_forward_timeout_seconds: float = 60.0
+    cluster_max_connections: int = 100  # keep-alive pool for forwarding to other nodes
+    cluster_handoff_window_seconds: float = 60.0  # how long after a node list change missing sessions are pulled from previous owners
+    cluster_token: str = ""  # required with cluster_nodes; cluster endpoints and forwarded requests must send it in X-Cluster-Token
+    
+    # Startup
+    startup_timing_report: bool = True
     
     # Test Mode
     test_mode: bool = False
@@ -0,0 +1,58 @@
+from typing import List, Optional
+from core.lexicon.registry import lexicon
+from .rules import ConstraintRules
+
+
+class IncrementalConstraintChecker:
+    """Checks LUCID constraints on a response while it is still being generated
+
+    Only violations that can no longer be undone by later tokens are reported:
+    a directive or advice pattern, a second question mark, or exceeding the
+    maximum length. Everything else is left to the final validate_output pass.
+
+    Each chunk is scanned once with the shared lexicon, together with just
+    enough of the text before it to catch a pattern split across chunks, so a
+    whole response costs one pass instead of one per chunk.
+    """
+    
+    # Text before a new chunk that a pattern ending in the chunk can start in
+    OVERLAP = max(len(pattern) for pattern in ConstraintRules.DIRECTIVE_PATTERNS + ConstraintRules.ADVICE_PATTERNS) - 1
+    
+    def __init__(self, max_length: Optional[int] = None):
+        self.max_length = max_length or ConstraintRules.MAX_LENGTH
+        # Response so far without leading whitespace, as validate_output sees it once stripped
+        self.buffer = ""
+        self.questions = 0
+        self._trailing_space = 0
+        self.violations: List[str] = []
+    
+    @property
+    def has_violation(self) -> bool:
+        return bool(self.violations)
+    
+    def feed(self, chunk: str) -> List[str]:
+        """Append a streamed chunk and return violations that are now certain"""
+        if self.violations:
+            return self.violations
+        if not self.buffer:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return self.violations
+        
+        window_start = max(0, len(self.buffer) - self.OVERLAP)
+        self.buffer += chunk
+        match = lexicon.scan(self.buffer[window_start:], cache=False)
+        self.violations.extend(ConstraintRules.directive_violations(match))
+        self.violations.extend(ConstraintRules.advice_violations(match))
+        
+        self.questions += chunk.count('?')
+        if self.questions > 1:
+            self.violations.append(f"Multiple questions found: {self.questions}")
+        
+        content = chunk.rstrip()
+        self._trailing_space = len(chunk) - len(content) + (0 if content else self._trailing_space)
+        length = len(self.buffer) - self._trailing_space
+        if length > self.max_length:
+            self.violations.append(f"Response too long: {length} > {self.max_length}")
+        
+        return self.violations
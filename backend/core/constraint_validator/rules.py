@@ -1,6 +1,7 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from enum import Enum
+from core.lexicon.registry import lexicon, LexiconMatch
 
 
 class ValidationRule(Enum):
@@ -39,15 +40,28 @@ class ConstraintRules:
         "perhaps you", "maybe you", "have you thought about"
     ]
     
+    # Statement markers (forbidden when no question is asked)
+    STATEMENT_MARKERS = ["i think", "i believe", "i feel"]
+    
+    # Maximum response length in characters
+    MAX_LENGTH = 150
+    
+    @classmethod
+    def directive_violations(cls, match: LexiconMatch) -> List[str]:
+        """Directive patterns found by a lexicon scan"""
+        found = match.terms("validation.directive")
+        return [f"Directive language detected: '{pattern}'" for pattern in cls.DIRECTIVE_PATTERNS if pattern in found]
+    
+    @classmethod
+    def advice_violations(cls, match: LexiconMatch) -> List[str]:
+        """Advice patterns found by a lexicon scan"""
+        found = match.terms("validation.advice")
+        return [f"Advice pattern detected: '{pattern}'" for pattern in cls.ADVICE_PATTERNS if pattern in found]
+    
     @classmethod
     def validate_no_directive(cls, text: str) -> ValidationResult:
         """Validate that text contains no directive language"""
-        violations = []
-        text_lower = text.lower()
-        
-        for pattern in cls.DIRECTIVE_PATTERNS:
-            if pattern in text_lower:
-                violations.append(f"Directive language detected: '{pattern}'")
+        violations = cls.directive_violations(lexicon.scan(text))
         
         return ValidationResult(
             is_valid=len(violations) == 0,
@@ -75,16 +89,11 @@ class ConstraintRules:
     @classmethod
     def validate_reflective_only(cls, text: str) -> ValidationResult:
         """Validate that text is purely reflective"""
-        violations = []
-        text_lower = text.lower()
-        
-        # Check for advice patterns
-        for pattern in cls.ADVICE_PATTERNS:
-            if pattern in text_lower:
-                violations.append(f"Advice pattern detected: '{pattern}'")
+        match = lexicon.scan(text)
+        violations = cls.advice_violations(match)
         
         # Check for statements instead of questions
-        if '?' not in text and any(marker in text_lower for marker in ["i think", "i believe", "i feel"]):
+        if '?' not in text and match.has("validation.statement"):
             violations.append("Statement instead of reflective question")
         
         return ValidationResult(
@@ -94,8 +103,9 @@ class ConstraintRules:
         )
     
     @classmethod
-    def validate_max_length(cls, text: str, max_length: int = 150) -> ValidationResult:
+    def validate_max_length(cls, text: str, max_length: Optional[int] = None) -> ValidationResult:
         """Validate maximum response length"""
+        max_length = max_length or cls.MAX_LENGTH
         violations = []
         
         if len(text) > max_length:
@@ -106,3 +116,8 @@ class ConstraintRules:
             violations=violations,
             confidence=1.0 if len(text) <= max_length else 0.7
         )
+
+
+lexicon.register("validation.directive", ConstraintRules.DIRECTIVE_PATTERNS)
+lexicon.register("validation.advice", ConstraintRules.ADVICE_PATTERNS)
+lexicon.register("validation.statement", ConstraintRules.STATEMENT_MARKERS)
@@ -0,0 +1,101 @@
+from typing import Dict, List, Sequence, Tuple
+
+
+class _CharClasses(dict):
+    """Translation table mapping pattern characters to class ids, everything else to 0
+
+    Only Latin-1 misses are remembered, so arbitrary input cannot grow the table.
+    """
+    
+    CACHED_CODEPOINTS = 256
+    
+    def __missing__(self, codepoint: int) -> int:
+        if codepoint < self.CACHED_CODEPOINTS:
+            self[codepoint] = 0
+        return 0
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton for matching many literal patterns in one pass
+
+    The goto/fail structure is flattened into a deterministic transition table
+    indexed by character class, so scanning costs one list lookup per input
+    character regardless of how many patterns are registered. Characters that
+    appear in no pattern share class 0 and send the automaton back to the root.
+    """
+    
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns = list(patterns)
+        self._classes = _CharClasses()
+        self._rows: List[List[int]] = []
+        self._outputs: List[Tuple[int, ...]] = []
+        self._build()
+    
+    @property
+    def state_count(self) -> int:
+        return len(self._rows)
+    
+    def _build(self):
+        """Build the trie, failure links and the flattened transition table"""
+        goto: List[Dict[str, int]] = [{}]
+        terminal: List[List[int]] = [[]]
+        
+        for pattern_id, pattern in enumerate(self.patterns):
+            if not pattern:
+                raise ValueError("Empty patterns cannot be matched")
+            state = 0
+            for char in pattern:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    terminal.append([])
+                state = next_state
+            terminal[state].append(pattern_id)
+        
+        alphabet = sorted({char for pattern in self.patterns for char in pattern})
+        if len(alphabet) > 255:
+            raise ValueError("Pattern alphabet exceeds 255 distinct characters")
+        for class_id, char in enumerate(alphabet, start=1):
+            self._classes[ord(char)] = class_id
+        
+        fail = [0] * len(goto)
+        outputs = [list(ids) for ids in terminal]
+        rows = [[0] * (len(alphabet) + 1) for _ in goto]
+        for char, child in goto[0].items():
+            rows[0][self._classes[ord(char)]] = child
+        
+        # Breadth-first so every failure target's row is complete before it is used
+        queue = list(goto[0].values())
+        for state in queue:
+            outputs[state].extend(outputs[fail[state]])
+            fallback = rows[fail[state]]
+            row = rows[state]
+            for class_id, char in enumerate(alphabet, start=1):
+                child = goto[state].get(char)
+                if child is not None:
+                    fail[child] = fallback[class_id]
+                    row[class_id] = child
+                    queue.append(child)
+                else:
+                    row[class_id] = fallback[class_id]
+        
+        self._rows = rows
+        self._outputs = [tuple(ids) for ids in outputs]
+    
+    def find_all(self, text: str) -> List[Tuple[int, int]]:
+        """Return (end_index, pattern_id) for every occurrence, overlaps included"""
+        rows = self._rows
+        outputs = self._outputs
+        state = 0
+        matches = []
+        
+        # One byte per input character: its class id
+        for index, class_id in enumerate(text.translate(self._classes).encode("latin-1")):
+            state = rows[state][class_id]
+            if outputs[state]:
+                end = index + 1
+                matches.extend((end, pattern_id) for pattern_id in outputs[state])
+        
+        return matches
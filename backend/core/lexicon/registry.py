@@ -0,0 +1,133 @@
+from typing import Dict, FrozenSet, Iterable, List, Sequence, Tuple
+from dataclasses import dataclass, field
+from functools import lru_cache
+from core.lexicon.automaton import AhoCorasick
+from core.utils.logger import logger
+
+
+@dataclass(frozen=True)
+class LexiconMatch:
+    """Every category and term found in one scan of a message"""
+    hits: Dict[str, FrozenSet[str]] = field(default_factory=dict)
+    
+    def has(self, category: str) -> bool:
+        """Whether any term of the category occurs in the message"""
+        return category in self.hits
+    
+    def terms(self, category: str) -> FrozenSet[str]:
+        """Distinct terms of the category that occur in the message"""
+        return self.hits.get(category, frozenset())
+    
+    def count(self, category: str) -> int:
+        """Number of distinct terms of the category that occur in the message"""
+        return len(self.hits.get(category, ()))
+    
+    def categories(self, prefix: str = "") -> List[str]:
+        """Matched categories, optionally restricted to a dotted prefix"""
+        return [category for category in self.hits if category.startswith(prefix)]
+
+
+class Lexicon:
+    """Registry of keyword categories compiled into a single Aho-Corasick automaton
+
+    Components register their keyword lists under a dotted category name
+    ("analysis.emotion.confusion", "validation.directive", ...). A scan lowercases
+    the text once and walks it once, reporting every category hit. Matching is
+    plain substring containment, the same semantics as ``keyword in text_lower``.
+
+    Sequence entries replace ``a.*b`` style regexes: they match when each term
+    starts after the end of the previous one, without any backtracking.
+    """
+    
+    def __init__(self, cache_size: int = 1024):
+        self._terms: Dict[str, Tuple[str, ...]] = {}
+        self._sequences: Dict[str, List[Tuple[str, ...]]] = {}
+        self._automaton = None
+        self._term_categories: List[Tuple[str, ...]] = []
+        self._scan_cached = lru_cache(maxsize=cache_size)(self._scan)
+    
+    def register(self, category: str, terms: Iterable[str]):
+        """Register (or replace) the plain keywords of a category"""
+        self._terms[category] = tuple(term.lower() for term in terms)
+        self._invalidate()
+    
+    def register_groups(self, prefix: str, groups: Dict[str, Iterable[str]]):
+        """Register each keyword group as category ``<prefix>.<group name>``"""
+        for name, terms in groups.items():
+            self.register(f"{prefix}.{name}", terms)
+    
+    def register_sequences(self, category: str, sequences: Iterable[Sequence[str]]):
+        """Register (or replace) ordered term sequences that must appear in that order"""
+        self._sequences[category] = [tuple(term.lower() for term in sequence) for sequence in sequences]
+        self._invalidate()
+    
+    def _invalidate(self):
+        self._automaton = None
+        self._scan_cached.cache_clear()
+    
+    def compile(self):
+        """Build the automaton over every registered term"""
+        categories_by_term: Dict[str, List[str]] = {}
+        for category, terms in self._terms.items():
+            for term in terms:
+                categories_by_term.setdefault(term, []).append(category)
+        for sequences in self._sequences.values():
+            for sequence in sequences:
+                for term in sequence:
+                    categories_by_term.setdefault(term, [])
+        
+        patterns = list(categories_by_term)
+        self._term_categories = [tuple(categories_by_term[term]) for term in patterns]
+        self._automaton = AhoCorasick(patterns)
+        logger.info(f"Lexicon compiled: {len(patterns)} terms, "
+                    f"{len(self._terms) + len(self._sequences)} categories, "
+                    f"{self._automaton.state_count} states")
+    
+    def scan(self, text: str, cache: bool = True) -> LexiconMatch:
+        """Scan text once and return every category hit
+
+        Results are memoized unless ``cache`` is False, as for text that is
+        never scanned twice, e.g. windows of a streamed response.
+        """
+        if self._automaton is None:
+            self.compile()
+        return self._scan_cached(text) if cache else self._scan(text)
+    
+    def _scan(self, text: str) -> LexiconMatch:
+        automaton = self._automaton
+        occurrences = automaton.find_all(text.lower())
+        
+        hits: Dict[str, set] = {}
+        ends: Dict[str, List[int]] = {}
+        for end, pattern_id in occurrences:
+            term = automaton.patterns[pattern_id]
+            for category in self._term_categories[pattern_id]:
+                hits.setdefault(category, set()).add(term)
+            if self._sequences:
+                ends.setdefault(term, []).append(end)
+        
+        for category, sequences in self._sequences.items():
+            for sequence in sequences:
+                if self._sequence_matches(sequence, ends):
+                    hits.setdefault(category, set()).add(".*".join(sequence))
+        
+        return LexiconMatch({category: frozenset(terms) for category, terms in hits.items()})
+    
+    @staticmethod
+    def _sequence_matches(sequence: Tuple[str, ...], ends: Dict[str, List[int]]) -> bool:
+        """Greedy check that each term occurs after the previous one ends"""
+        position = 0
+        for term in sequence:
+            # Occurrence ends are in ascending order, so the first fit is the earliest
+            next_position = next(
+                (end for end in ends.get(term, ()) if end - len(term) >= position),
+                None
+            )
+            if next_position is None:
+                return False
+            position = next_position
+        return True
+
+
+# Global lexicon shared by safety, analysis, prompt building and validation
+lexicon = Lexicon()
@@ -0,0 +1,77 @@
+from typing import Dict, Any, Optional
+from collections import deque
+import asyncio
+import time
+from core.memory.memory_manager import MemoryManager
+from core.utils.logger import logger
+
+
+class SessionExpiryWorker:
+    """Background asyncio task that evicts expired sessions in bounded ticks
+
+    Every ``interval_seconds`` it asks the memory manager to evict due sessions,
+    popping at most ``batch_budget`` expiry entries. When a tick uses its whole
+    budget there is more due work, so the next tick runs right after yielding to
+    the event loop instead of waiting a full interval; request handling is never
+    blocked for more than one budget's worth of heap operations.
+    """
+    
+    # Window over which the eviction rate is reported
+    RATE_WINDOW_SECONDS = 60.0
+    
+    def __init__(self, memory_manager: MemoryManager, interval_seconds: float = 1.0, batch_budget: int = 500):
+        self.memory_manager = memory_manager
+        self.interval_seconds = interval_seconds
+        self.batch_budget = batch_budget
+        self._task: Optional[asyncio.Task] = None
+        self._recent = deque()  # (monotonic time, evicted) per tick that evicted anything
+        self.ticks = 0
+        self.last_tick_ms = 0.0
+        self.max_tick_ms = 0.0
+    
+    def start(self):
+        """Start the task on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(f"Session expiry worker started (interval={self.interval_seconds}s, budget={self.batch_budget})")
+    
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+    
+    def tick(self) -> int:
+        """Run one bounded eviction pass; returns the number of sessions evicted"""
+        started = time.perf_counter()
+        evicted = self.memory_manager.cleanup_expired_sessions(budget=self.batch_budget)
+        now = time.perf_counter()
+        self.ticks += 1
+        self.last_tick_ms = (now - started) * 1000
+        self.max_tick_ms = max(self.max_tick_ms, self.last_tick_ms)
+        if evicted:
+            self._recent.append((now, evicted))
+        while self._recent and self._recent[0][0] < now - self.RATE_WINDOW_SECONDS:
+            self._recent.popleft()
+        return evicted
+    
+    async def _run(self):
+        delay = self.interval_seconds
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                self.tick()
+                backlog = self.memory_manager.store.expiry_stats().get("oldest_due_entry_ms", 0.0) > 0
+            except Exception as e:
+                logger.error(f"Session expiry tick failed: {e}")
+                backlog = False
+            delay = 0 if backlog else self.interval_seconds
+    
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self.memory_manager.store.expiry_stats())
+        stats.update({
+            "ticks": self.ticks,
+            "last_tick_ms": round(self.last_tick_ms, 3),
+            "max_tick_ms": round(self.max_tick_ms, 3),
+            "evictions_per_second": round(sum(count for _, count in self._recent) / self.RATE_WINDOW_SECONDS, 3)
+        })
+        return stats
@@ -0,0 +1,255 @@
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple, Union
+from collections.abc import Sequence
+from datetime import datetime
+import itertools
+import json
+import secrets
+import time
+import uuid
+
+
+# Message ids are rendered on demand from a random per-process prefix and a counter
+_ID_PREFIX = secrets.randbits(64) << 64
+_id_counter = itertools.count(1)
+
+# Metadata dicts are shared between messages with equal content (e.g. the
+# validation result of every valid reply); treat message metadata as read-only
+_EMPTY_METADATA: Dict[str, Any] = {}
+_METADATA_INTERN_MAX = 4096
+_metadata_interned: Dict[str, Dict[str, Any]] = {}
+
+
+def intern_metadata(metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Return a shared dict equal to ``metadata``"""
+    if not metadata:
+        return _EMPTY_METADATA
+    try:
+        key = json.dumps(metadata, sort_keys=True)
+    except (TypeError, ValueError):
+        return metadata
+    shared = _metadata_interned.get(key)
+    if shared is None:
+        if len(_metadata_interned) >= _METADATA_INTERN_MAX:
+            return metadata
+        shared = _metadata_interned[key] = metadata
+    return shared
+
+
+class Message:
+    """A single message in a conversation, stored compactly
+
+    Slotted, with a float timestamp and an integer id key that is only rendered
+    to a UUID string when ``id`` is read. The ISO timestamp is rendered once, the
+    first time the message is serialized. ``metadata`` may be shared with other
+    messages (see ``intern_metadata``) and must not be mutated.
+    """
+    
+    __slots__ = ("_id", "text", "is_user", "ts", "metadata", "analysis", "_iso")
+    
+    def __init__(self, text: str = "", is_user: bool = True, metadata: Optional[Dict[str, Any]] = None,
+                 analysis: Optional[Dict[str, Any]] = None, id: Optional[str] = None, ts: Optional[float] = None):
+        self._id: Union[int, str] = id if id is not None else next(_id_counter)
+        self.text = text
+        self.is_user = is_user
+        self.ts = ts if ts is not None else time.time()
+        self.metadata = metadata if metadata is not None else _EMPTY_METADATA
+        self.analysis = analysis if analysis is not None else _EMPTY_METADATA  # Computed once at ingest
+        self._iso: Optional[str] = None
+    
+    @property
+    def id(self) -> str:
+        if isinstance(self._id, int):
+            self._id = str(uuid.UUID(int=_ID_PREFIX | self._id))
+        return self._id
+    
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.ts)
+    
+    @property
+    def timestamp_iso(self) -> str:
+        if self._iso is None:
+            self._iso = datetime.fromtimestamp(self.ts).isoformat()
+        return self._iso
+    
+    def to_dict(self, cursor: Optional[int] = None) -> Dict[str, Any]:
+        """Serializable form used in API responses, with its history cursor if given"""
+        data = {
+            "text": self.text,
+            "is_user": self.is_user,
+            "timestamp": self._iso or self.timestamp_iso,
+            "metadata": self.metadata
+        }
+        if cursor is not None:
+            data["cursor"] = cursor
+        return data
+    
+    def __repr__(self) -> str:
+        return f"Message({'user' if self.is_user else 'assistant'}, {self.text[:40]!r})"
+
+
+class MessageRing:
+    """Fixed-capacity ring buffer of a session's most recent messages
+
+    Messages are addressed by absolute position: ``first`` is the position of
+    the oldest retained message and ``end`` one past the newest. Positions keep
+    counting across trims (stores persist ``first``), so they serve as stable
+    history cursors. Appending to a full ring overwrites the oldest slot in
+    O(1). The backing list grows only up to ``capacity``, so short sessions do
+    not pay for unused slots.
+    """
+    
+    __slots__ = ("capacity", "_buffer", "first", "end")
+    
+    def __init__(self, capacity: int, messages: Iterable[Message] = (), first: int = 0):
+        self.capacity = max(1, capacity)
+        self._buffer: List[Optional[Message]] = []
+        self.first = first
+        self.end = first
+        for message in messages:
+            self.append(message)
+    
+    def append(self, message: Message) -> Optional[Message]:
+        """Add a message; returns the message it evicted, if the ring was full"""
+        evicted = None
+        if self.end - self.first == self.capacity:
+            evicted = self._buffer[self.first % self.capacity]
+            self.first += 1
+        index = self.end % self.capacity
+        if index < len(self._buffer):
+            self._buffer[index] = message
+        else:
+            self._buffer.extend([None] * (index - len(self._buffer)))
+            self._buffer.append(message)
+        self.end += 1
+        return evicted
+    
+    def get(self, position: int) -> Message:
+        """Message at an absolute position"""
+        if not self.first <= position < self.end:
+            raise IndexError("message position no longer in history")
+        return self._buffer[position % self.capacity]
+    
+    def popleft(self) -> Message:
+        """Remove and return the oldest message"""
+        if self.first == self.end:
+            raise IndexError("pop from an empty ring")
+        index = self.first % self.capacity
+        message = self._buffer[index]
+        self._buffer[index] = None
+        self.first += 1
+        return message
+    
+    def clear(self):
+        for position in range(self.first, self.end):
+            self._buffer[position % self.capacity] = None
+        self.first = self.end
+    
+    def items(self, start: int, stop: int) -> Iterator[Tuple[int, Message]]:
+        """(position, message) pairs for the retained positions in [start, stop)"""
+        buffer, capacity = self._buffer, self.capacity
+        for position in range(max(start, self.first), min(stop, self.end)):
+            yield position, buffer[position % capacity]
+    
+    def __len__(self) -> int:
+        return self.end - self.first
+    
+    def __iter__(self) -> Iterator[Message]:
+        for position in range(self.first, self.end):
+            yield self._buffer[position % self.capacity]
+
+
+class ConversationView(Sequence):
+    """Read-only window over a session's messages; nothing is copied or rebuilt
+
+    A view covers the absolute positions the ring held when it was taken; later
+    appends are not visible. Messages the ring has since evicted drop off the
+    front of the view.
+    """
+    
+    __slots__ = ("_ring", "_start", "_stop")
+    
+    def __init__(self, ring: MessageRing, start: Optional[int] = None, stop: Optional[int] = None):
+        self._ring = ring
+        self._start = ring.first if start is None else start
+        self._stop = ring.end if stop is None else stop
+    
+    @classmethod
+    def empty(cls) -> "ConversationView":
+        return cls(MessageRing(1))
+    
+    def _bounds(self):
+        return max(self._start, self._ring.first), self._stop
+    
+    def __len__(self) -> int:
+        start, stop = self._bounds()
+        return max(0, stop - start)
+    
+    def __getitem__(self, index: Union[int, slice]):
+        start, stop = self._bounds()
+        length = max(0, stop - start)
+        if isinstance(index, slice):
+            begin, finish, step = index.indices(length)
+            if step != 1:
+                return tuple(self)[index]
+            return ConversationView(self._ring, start + begin, start + max(begin, finish))
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("conversation index out of range")
+        return self._ring.get(start + index)
+    
+    def __iter__(self) -> Iterator[Message]:
+        for _, message in self._ring.items(self._start, self._stop):
+            yield message
+    
+    def items(self) -> Iterator[Tuple[int, Message]]:
+        """(cursor, message) pairs"""
+        return self._ring.items(self._start, self._stop)
+    
+    def __reversed__(self) -> Iterator[Message]:
+        start, stop = self._bounds()
+        for position in range(stop - 1, start - 1, -1):
+            yield self._ring.get(position)
+    
+    @property
+    def start(self) -> int:
+        """Cursor (absolute position) of the first message in the view"""
+        return self._bounds()[0]
+    
+    @property
+    def stop(self) -> int:
+        """Cursor one past the last message in the view"""
+        return max(self._bounds())
+    
+    def after(self, cursor: int, limit: Optional[int] = None) -> "ConversationView":
+        """Messages at or after ``cursor``, at most ``limit`` of them"""
+        start, stop = self._bounds()
+        start = max(start, min(cursor, stop))
+        if limit is not None:
+            stop = min(stop, start + max(0, limit))
+        return ConversationView(self._ring, start, stop)
+    
+    def before(self, cursor: int, limit: Optional[int] = None) -> "ConversationView":
+        """Messages before ``cursor``, the last ``limit`` of them"""
+        start, stop = self._bounds()
+        stop = max(start, min(cursor, stop))
+        if limit is not None:
+            start = max(start, stop - max(0, limit))
+        return ConversationView(self._ring, start, stop)
+    
+    def last_user_messages(self, count: int) -> List[Message]:
+        """The newest ``count`` user messages, oldest first, scanning back from the end"""
+        found: List[Message] = []
+        if count <= 0:
+            return found
+        for message in reversed(self):
+            if message.is_user:
+                found.append(message)
+                if len(found) == count:
+                    break
+        found.reverse()
+        return found
+    
+    def __repr__(self) -> str:
+        return f"ConversationView({len(self)} messages)"
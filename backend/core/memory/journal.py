@@ -0,0 +1,271 @@
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple, Union
+import fcntl
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from knowledge.vector_store.segments import fsync_directory
+from core.utils.logger import logger
+
+
+OP_CREATE = 1
+OP_UPDATE = 2
+OP_DELETE = 3
+OP_SNAPSHOT = 4
+
+_FILE_PATTERN = re.compile(r"^(wal|snapshot)-(\d{8})\.(log|bin)$")
+
+
+class SessionJournal:
+    """Write-ahead log and snapshots of in-process session state
+
+    Mutations are framed as ``<length, crc32, op>`` headers followed by a
+    binary body whose layout the session store owns. ``log`` only queues the
+    record (its body may be a callable, encoded later); a writer thread
+    group-commits everything queued every ``flush_interval_ms`` with one write
+    and one fsync. That interval is the durability window: a crash loses at
+    most the mutations of the last window. With an interval of 0 each ``log``
+    call is written and fsynced before it returns.
+
+    Files are numbered by generation. ``snapshot-N.bin`` holds every session
+    as it was at some point after ``wal-N.log`` was started; recovery reads the
+    newest complete snapshot and replays ``wal-N.log`` and any later logs over
+    it, so replay must be idempotent. Older generations are deleted once a
+    snapshot commits. A lock file keeps a second process off the directory.
+    """
+    
+    HEADER = struct.Struct("<IIB")
+    LOCK_FILE = "LOCK"
+    
+    def __init__(self, path: str, flush_interval_ms: float = 50.0, fsync: bool = True,
+                 snapshot_interval_seconds: float = 300.0, snapshot_min_bytes: int = 32 * 1024 * 1024):
+        self.path = path
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.fsync = fsync
+        self.snapshot_interval_seconds = snapshot_interval_seconds
+        self.snapshot_min_bytes = snapshot_min_bytes
+        
+        os.makedirs(path, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(path, self.LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(self._lock_fd)
+            raise RuntimeError(f"Session journal {path} is in use by another process")
+        
+        snapshots, logs = self._generations()
+        self.snapshot_generation = snapshots[-1] if snapshots else 0
+        self._replay_logs = [generation for generation in logs if generation >= self.snapshot_generation]
+        self.generation = max([self.snapshot_generation] + logs)
+        self._file = None
+        self.log_bytes = 0  # written since the last snapshot
+        self.last_snapshot_at = time.time()
+        
+        self._pending: List[Tuple[int, Union[bytes, Callable[[], bytes]]]] = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        
+        self.records = 0
+        self.commits = 0
+        self.max_commit_records = 0
+        self.last_commit_ms = 0.0
+        self.snapshots = 0
+        self.last_snapshot_ms = 0.0
+        self.last_snapshot_sessions = 0
+    
+    def _file_path(self, kind: str, generation: int) -> str:
+        return os.path.join(self.path, f"{kind}-{generation:08d}.{'log' if kind == 'wal' else 'bin'}")
+    
+    def _generations(self) -> Tuple[List[int], List[int]]:
+        snapshots, logs = [], []
+        for name in os.listdir(self.path):
+            match = _FILE_PATTERN.match(name)
+            if match:
+                (logs if match.group(1) == "wal" else snapshots).append(int(match.group(2)))
+        return sorted(snapshots), sorted(logs)
+    
+    def _read(self, file_path: str, truncate: bool) -> Iterator[Tuple[int, bytes]]:
+        """(op, body) records of a file, stopping at a torn or corrupt tail"""
+        with open(file_path, "r+b" if truncate else "rb") as f:
+            data = f.read()
+            view = memoryview(data)
+            offset = 0
+            header_size = self.HEADER.size
+            while offset < len(data):
+                end = offset + header_size
+                if end > len(data):
+                    break
+                length, checksum, op = self.HEADER.unpack_from(data, offset)
+                body = view[end:end + length]
+                if len(body) < length or zlib.crc32(body) != checksum:
+                    break
+                yield op, body
+                offset = end + length
+            if offset < len(data):
+                logger.warning(f"Dropping torn tail of {os.path.basename(file_path)} at byte {offset}")
+                if truncate:
+                    f.truncate(offset)
+                    os.fsync(f.fileno())
+    
+    def read_snapshot(self) -> Iterator[Tuple[int, bytes]]:
+        """Records of the newest complete snapshot"""
+        if self.snapshot_generation:
+            yield from self._read(self._file_path("snapshot", self.snapshot_generation), truncate=False)
+    
+    def read_log(self) -> Iterator[Tuple[int, bytes]]:
+        """Logged mutations newer than the snapshot, in order; must run before the first ``log``"""
+        for generation in self._replay_logs:
+            file_path = self._file_path("wal", generation)
+            yield from self._read(file_path, truncate=True)
+            # Not folded into a snapshot yet, so they count towards the next one
+            self.log_bytes += os.path.getsize(file_path)
+    
+    def start(self):
+        """Open a fresh log generation and start group commits"""
+        self._open_generation(self.generation + 1)
+        if self.flush_interval > 0:
+            self._writer = threading.Thread(target=self._flush_periodically, name="session-wal", daemon=True)
+            self._writer.start()
+    
+    def _open_generation(self, generation: int):
+        if self._file is not None:
+            self._file.close()
+        self.generation = generation
+        self._file = open(self._file_path("wal", generation), "ab")
+        fsync_directory(self.path)
+    
+    def log(self, op: int, body: Union[bytes, Callable[[], bytes]]):
+        """Queue a mutation; ``body`` may be a callable, encoded by the writer"""
+        with self._pending_lock:
+            self._pending.append((op, body))
+        if self.flush_interval <= 0:
+            self.flush()
+    
+    def _frame(self, op: int, body: bytes) -> bytes:
+        return self.HEADER.pack(len(body), zlib.crc32(body), op) + body
+    
+    def flush(self):
+        """Write and fsync everything queued as one commit"""
+        with self._write_lock:
+            if self._file is None:
+                return
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            started = time.perf_counter()
+            data = b"".join(self._frame(op, body() if callable(body) else body) for op, body in batch)
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.log_bytes += len(data)
+            self.records += len(batch)
+            self.commits += 1
+            self.max_commit_records = max(self.max_commit_records, len(batch))
+            self.last_commit_ms = (time.perf_counter() - started) * 1000
+    
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Session journal commit failed: {e}")
+    
+    def should_snapshot(self) -> bool:
+        """Whether the log has grown or aged enough to be folded into a snapshot"""
+        if not self.log_bytes and not self._pending:
+            return False
+        return (self.log_bytes >= self.snapshot_min_bytes
+                or time.time() - self.last_snapshot_at >= self.snapshot_interval_seconds)
+    
+    def rotate(self) -> int:
+        """Start a new log generation; returns it as the generation of the next snapshot"""
+        self.flush()
+        with self._write_lock:
+            self._open_generation(self.generation + 1)
+            self.log_bytes = 0
+            return self.generation
+    
+    def snapshot_writer(self, generation: int) -> "SnapshotWriter":
+        return SnapshotWriter(self, generation)
+    
+    def _snapshot_committed(self, generation: int, sessions: int, elapsed_ms: float):
+        """Drop the generations a committed snapshot replaces"""
+        self.snapshot_generation = generation
+        snapshots, logs = self._generations()
+        for old in snapshots:
+            if old < generation:
+                os.remove(self._file_path("snapshot", old))
+        for old in logs:
+            if old < generation:
+                os.remove(self._file_path("wal", old))
+        self.last_snapshot_at = time.time()
+        self.snapshots += 1
+        self.last_snapshot_ms = elapsed_ms
+        self.last_snapshot_sessions = sessions
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "snapshot_generation": self.snapshot_generation,
+            "records": self.records,
+            "commits": self.commits,
+            "records_per_commit": round(self.records / self.commits, 2) if self.commits else 0.0,
+            "max_commit_records": self.max_commit_records,
+            "last_commit_ms": round(self.last_commit_ms, 3),
+            "pending": len(self._pending),
+            "log_bytes": self.log_bytes,
+            "durability_window_ms": self.flush_interval * 1000,
+            "snapshots": self.snapshots,
+            "last_snapshot_ms": round(self.last_snapshot_ms, 1),
+            "last_snapshot_sessions": self.last_snapshot_sessions
+        }
+    
+    def close(self):
+        """Commit everything queued and release the directory"""
+        self._closed.set()
+        if self._writer is not None:
+            self._writer.join()
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.close(self._lock_fd)
+
+
+class SnapshotWriter:
+    """Writes one snapshot generation through a temporary file"""
+    
+    def __init__(self, journal: SessionJournal, generation: int):
+        self.journal = journal
+        self.generation = generation
+        self.final_path = journal._file_path("snapshot", generation)
+        self.tmp_path = self.final_path + ".tmp"
+        self._file = open(self.tmp_path, "wb")
+        self.sessions = 0
+        self._started = time.perf_counter()
+    
+    def write(self, bodies: List[bytes]):
+        self._file.write(b"".join(self.journal._frame(OP_SNAPSHOT, body) for body in bodies))
+        self.sessions += len(bodies)
+    
+    def commit(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.tmp_path, self.final_path)
+        fsync_directory(self.journal.path)
+        self.journal._snapshot_committed(self.generation, self.sessions,
+                                         (time.perf_counter() - self._started) * 1000)
+    
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
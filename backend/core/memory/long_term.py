@@ -0,0 +1,238 @@
+from typing import Dict, List, Any, Optional, Tuple
+from collections import OrderedDict, deque
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from langchain_core.documents import Document
+from knowledge.embeddings.embedder import Embedder
+from knowledge.vector_store.numpy_store import NumpyVectorStore
+from core.utils.logger import logger
+
+
+class LongTermMemory:
+    """Per-user semantic memory of past user messages, across sessions
+
+    Each user has its own partition, a NumpyVectorStore directory named by a
+    hash of the user id, so a lookup only ever scans that user's vectors.
+    ``remember`` just queues the message; a background task embeds queued
+    messages in batches and appends them to their partitions, keeping
+    embedding calls and disk writes off the request path. ``arecall`` returns
+    the most similar past messages from other sessions within a time budget.
+    """
+    
+    def __init__(self, embedder: Embedder, path: str, top_k: int = 3, min_score: float = 0.3,
+                 budget_ms: float = 50.0, flush_interval_seconds: float = 2.0, batch_size: int = 64,
+                 max_pending: int = 10_000, max_open_partitions: int = 256, min_words: int = 4):
+        self.embedder = embedder
+        self.path = path
+        self.top_k = top_k
+        self.min_score = min_score
+        self.budget_ms = budget_ms
+        self.flush_interval_seconds = flush_interval_seconds
+        self.batch_size = batch_size
+        self.min_words = min_words
+        
+        # (user_id, session_id, text, timestamp) waiting to be embedded
+        self._pending: deque = deque(maxlen=max_pending)
+        self._partitions: "OrderedDict[str, NumpyVectorStore]" = OrderedDict()
+        self._partitions_lock = threading.Lock()
+        # Serializes appends, so a shutdown flush waits for one already running in a worker thread
+        self._store_lock = threading.Lock()
+        self.max_open_partitions = max_open_partitions
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        
+        self.queued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.recalls = 0
+        self.recall_timeouts = 0
+        self.recall_ms_total = 0.0
+        logger.info(f"LongTermMemory initialized at {path} (top_k={top_k}, budget={budget_ms}ms)")
+    
+    def remember(self, user_id: Optional[str], session_id: str, text: str):
+        """Queue a user message for indexing; messages too short to recall are skipped"""
+        if not user_id or len(text.split()) < self.min_words:
+            return
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1  # the deque discards the oldest entry
+        self._pending.append((user_id, session_id, text, time.time()))
+        self.queued += 1
+        if len(self._pending) >= self.batch_size and self._wake is not None:
+            self._wake.set()
+    
+    def start(self):
+        """Start the batched writer on the running event loop"""
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(f"Long-term memory writer started (interval={self.flush_interval_seconds}s, batch={self.batch_size})")
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                while await self.flush():
+                    if len(self._pending) < self.batch_size:
+                        break
+            except Exception as e:
+                logger.error(f"Long-term memory flush failed: {e}")
+    
+    def _take_batch(self) -> List[Tuple[str, str, str, float]]:
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            batch.append(self._pending.popleft())
+        return batch
+    
+    async def flush(self) -> int:
+        """Embed and store one batch of queued messages; returns how many were stored"""
+        batch = self._take_batch()
+        if not batch:
+            return 0
+        try:
+            vectors = await self.embedder.embeddings.aembed_documents([text for _, _, text, _ in batch])
+        except asyncio.CancelledError:
+            # Stopped before storing; leave the batch for the shutdown flush
+            self._pending.extendleft(reversed(batch))
+            raise
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Failed to embed {len(batch)} long-term memories: {e}")
+            return 0
+        return await asyncio.to_thread(self._store_batch, batch, vectors)
+    
+    def flush_sync(self) -> int:
+        """Store everything queued, blocking; used at shutdown"""
+        stored = 0
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return stored
+            try:
+                vectors = self.embedder.embeddings.embed_documents([text for _, _, text, _ in batch])
+            except Exception as e:
+                self.failed += len(batch) + len(self._pending)
+                self._pending.clear()
+                logger.error(f"Failed to embed {len(batch)} long-term memories: {e}")
+                return stored
+            stored += self._store_batch(batch, vectors)
+    
+    def _store_batch(self, batch: List[Tuple[str, str, str, float]], vectors: List[List[float]]) -> int:
+        """Append a batch to the partitions of its users, one append per user"""
+        by_user: Dict[str, Tuple[List[Document], List[List[float]]]] = {}
+        for (user_id, session_id, text, timestamp), vector in zip(batch, vectors):
+            documents, user_vectors = by_user.setdefault(user_id, ([], []))
+            documents.append(Document(page_content=text, metadata={"session_id": session_id, "timestamp": timestamp}))
+            user_vectors.append(vector)
+        
+        stored = 0
+        with self._store_lock:
+            for user_id, (documents, user_vectors) in by_user.items():
+                try:
+                    self._partition(user_id).add_embeddings(documents, user_vectors)
+                    stored += len(documents)
+                except Exception as e:
+                    self.failed += len(documents)
+                    logger.error(f"Failed to store long-term memories for a user: {e}")
+            self.written += stored
+            self.flushes += 1
+        return stored
+    
+    def _partition(self, user_id: str, create: bool = True) -> Optional[NumpyVectorStore]:
+        """The user's partition, keeping at most max_open_partitions open"""
+        key = hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:32]
+        with self._partitions_lock:
+            partition = self._partitions.get(key)
+            if partition is not None:
+                self._partitions.move_to_end(key)
+                return partition
+            partition_path = os.path.join(self.path, key)
+            if not create and not os.path.isdir(partition_path):
+                return None
+            partition = NumpyVectorStore(partition_path, self.embedder.embeddings)
+            self._partitions[key] = partition
+            while len(self._partitions) > self.max_open_partitions:
+                # Dropped maps and handles are released by garbage collection
+                self._partitions.popitem(last=False)
+            return partition
+    
+    def _search(self, user_id: str, embedding: List[float], exclude_session: Optional[str]) -> List[str]:
+        partition = self._partition(user_id, create=False)
+        if partition is None or not len(partition):
+            return []
+        # Extra candidates so that hits from the current session can be skipped
+        hits = partition.similarity_search_by_vector_with_score(embedding, k=self.top_k * 3)
+        return [
+            doc.page_content for doc, score in hits
+            if score >= self.min_score and doc.metadata.get("session_id") != exclude_session
+        ][:self.top_k]
+    
+    def recall(self, user_id: Optional[str], query: str, exclude_session: Optional[str] = None) -> List[str]:
+        """Past messages of the user most similar to ``query`` (blocking, no time budget)"""
+        if not user_id:
+            return []
+        try:
+            return self._search(user_id, self.embedder.embed_text(query), exclude_session)
+        except Exception as e:
+            logger.error(f"Long-term memory recall failed: {e}")
+            return []
+    
+    async def arecall(self, user_id: Optional[str], query: str, exclude_session: Optional[str] = None,
+                      embedding: Optional[List[float]] = None) -> List[str]:
+        """Like recall, but gives up with no results once the search has taken ``budget_ms``
+        
+        The budget covers only the partition search, not embedding ``query``;
+        pass ``embedding`` when the caller has already embedded it.
+        """
+        if not user_id:
+            return []
+        started = time.perf_counter()
+        try:
+            if embedding is None:
+                embedding = await self.embedder.aembed_query(query)
+            search = asyncio.to_thread(self._search, user_id, embedding, exclude_session)
+            return await asyncio.wait_for(search, self.budget_ms / 1000.0)
+        except asyncio.TimeoutError:
+            self.recall_timeouts += 1
+            return []
+        except Exception as e:
+            logger.error(f"Long-term memory recall failed: {e}")
+            return []
+        finally:
+            self.recalls += 1
+            self.recall_ms_total += (time.perf_counter() - started) * 1000
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "open_partitions": len(self._partitions),
+            "recalls": self.recalls,
+            "recall_timeouts": self.recall_timeouts,
+            "average_recall_ms": round(self.recall_ms_total / self.recalls, 3) if self.recalls else 0.0
+        }
+    
+    def close(self):
+        """Stop the writer and store whatever is still queued
+        
+        Cancelling the writer does not stop a batch already being stored in a
+        worker thread; flush_sync waits for it on the store lock.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        stored = self.flush_sync()
+        if stored:
+            logger.info(f"Stored {stored} queued long-term memories on shutdown")
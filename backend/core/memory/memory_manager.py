@@ -1,123 +1,237 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Set, Tuple
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from datetime import datetime
+from collections import Counter, deque
 import uuid
+from core.memory.history import Message, MessageRing, ConversationView, intern_metadata
 from core.utils.logger import logger
 
 
+# Ring capacity of sessions created without an explicit one
+DEFAULT_MAX_CONVERSATION_LENGTH = 20
+
+
+def _increment(counts: Counter, labels):
+    for label in labels:
+        counts[label] += 1
+
+
+def _decrement(counts: Counter, labels):
+    """Decrement label counts, dropping labels whose count reaches zero"""
+    for label in labels:
+        remaining = counts[label] - 1
+        if remaining > 0:
+            counts[label] = remaining
+        else:
+            del counts[label]
+
+
 @dataclass
-class Message:
-    """Represents a single message in conversation"""
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
-    text: str = ""
-    is_user: bool = True
-    timestamp: datetime = field(default_factory=datetime.now)
-    metadata: Dict[str, Any] = field(default_factory=dict)
+class SessionStats:
+    """Rolling per-session aggregates, updated as messages are added and trimmed"""
+    user_message_count: int = 0
+    assistant_message_count: int = 0
+    total_length: int = 0
+    emotion_counts: Counter = field(default_factory=Counter)
+    pattern_counts: Counter = field(default_factory=Counter)
+    # Context tags of the most recent messages, newest last
+    recent_context_tags: deque = field(default_factory=lambda: deque(maxlen=5))
+    
+    @property
+    def message_count(self) -> int:
+        return self.user_message_count + self.assistant_message_count
+    
+    def add(self, message: Message):
+        """Account for a message appended to the session"""
+        if message.is_user:
+            self.user_message_count += 1
+        else:
+            self.assistant_message_count += 1
+        self.total_length += len(message.text)
+        analysis = message.analysis
+        if analysis:
+            _increment(self.emotion_counts, analysis.get("emotions", ()))
+            _increment(self.pattern_counts, analysis.get("cognitive_patterns", ()))
+        self.recent_context_tags.append(tuple(message.analysis.get("context_tags", ())))
+    
+    def remove(self, message: Message):
+        """Account for a message trimmed from the front of the session"""
+        if message.is_user:
+            self.user_message_count -= 1
+        else:
+            self.assistant_message_count -= 1
+        self.total_length -= len(message.text)
+        analysis = message.analysis
+        if analysis:
+            _decrement(self.emotion_counts, analysis.get("emotions", ()))
+            _decrement(self.pattern_counts, analysis.get("cognitive_patterns", ()))
+    
+    def reset(self):
+        """Forget all aggregates"""
+        self.user_message_count = 0
+        self.assistant_message_count = 0
+        self.total_length = 0
+        self.emotion_counts.clear()
+        self.pattern_counts.clear()
+        self.recent_context_tags.clear()
+    
+    def context_tags(self) -> Set[str]:
+        """Union of context tags over the recent message window"""
+        return {tag for tags in self.recent_context_tags for tag in tags}
 
 
 @dataclass
 class Session:
     """Represents a conversation session"""
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
-    messages: List[Message] = field(default_factory=list)
+    messages: MessageRing = field(default_factory=lambda: MessageRing(DEFAULT_MAX_CONVERSATION_LENGTH))
     created_at: datetime = field(default_factory=datetime.now)
     last_activity: datetime = field(default_factory=datetime.now)
     user_context: Dict[str, Any] = field(default_factory=dict)
+    stats: SessionStats = field(default_factory=SessionStats)
 
 
 class MemoryManager:
     """Manages conversation context and short-term memory"""
     
-    def __init__(self, max_conversation_length: int = 20, session_timeout_minutes: int = 30):
+    def __init__(self, max_conversation_length: int = 20, session_timeout_minutes: int = 30,
+                 analyzer: Optional[Callable[[str], Dict[str, Any]]] = None, store=None):
         self.max_conversation_length = max_conversation_length
         self.session_timeout_minutes = session_timeout_minutes
-        self.sessions: Dict[str, Session] = {}
+        # Analyzes each user message once at ingest to feed the session aggregates
+        self.analyzer = analyzer
+        if store is None:
+            from core.memory.session_store import create_session_store
+            store = create_session_store(session_timeout_minutes, max_conversation_length)
+        self.store = store
+        # Overrides how new session ids are picked, e.g. so that this node owns them
+        self.session_id_factory: Optional[Callable[[], str]] = None
         logger.info(f"MemoryManager initialized with max_length={max_conversation_length}, timeout={session_timeout_minutes}min")
     
     def create_session(self, user_context: Optional[Dict[str, Any]] = None) -> str:
         """Create a new conversation session"""
-        session = Session(user_context=user_context or {})
-        self.sessions[session.id] = session
+        session = Session(messages=MessageRing(self.max_conversation_length), user_context=user_context or {})
+        if self.session_id_factory:
+            session.id = self.session_id_factory()
+        self.store.create(session)
         logger.info(f"Created new session: {session.id}")
         return session.id
     
     def get_session(self, session_id: str) -> Optional[Session]:
         """Get session by ID, updating last activity"""
-        session = self.sessions.get(session_id)
-        if session:
-            session.last_activity = datetime.now()
-        return session
+        return self.store.load(session_id)
     
     def add_message(self, session_id: str, message: str, is_user: bool = True, metadata: Optional[Dict[str, Any]] = None) -> bool:
         """Add a message to a session"""
-        session = self.get_session(session_id)
-        if not session:
-            logger.warning(f"Session not found: {session_id}")
-            return False
-        
-        msg = Message(text=message, is_user=is_user, metadata=metadata or {})
-        session.messages.append(msg)
-        
-        # Maintain conversation length limit
-        if len(session.messages) > self.max_conversation_length:
-            # Remove oldest messages, keeping at least one user message for context
-            user_messages = [m for m in session.messages if m.is_user]
-            if len(user_messages) > 1:
-                # Remove everything up to the second oldest user message
-                second_oldest_user_idx = next(i for i, m in enumerate(session.messages) 
-                                           if m.is_user and i > 0)
-                session.messages = session.messages[second_oldest_user_idx:]
-            else:
-                # Remove oldest message if only one user message exists
-                session.messages.pop(0)
+        return self.add_messages(session_id, [(message, is_user, metadata)])
+    
+    def add_messages(self, session_id: str, messages: List[Tuple[str, bool, Optional[Dict[str, Any]]]]) -> bool:
+        """Add (text, is_user, metadata) messages to a session with a single store update"""
+        appended = []
+        for message, is_user, metadata in messages:
+            msg = Message(text=message, is_user=is_user, metadata=intern_metadata(metadata))
+            if is_user and self.analyzer:
+                msg.analysis = self.analyzer(message)
+            appended.append(msg)
         
-        logger.debug(f"Added message to session {session_id}: {'user' if is_user else 'assistant'}")
+        # Other threads may touch the same session; the store serializes the read-modify-write
+        with self.store.lock(session_id):
+            session = self.get_session(session_id)
+            if not session:
+                logger.warning(f"Session not found: {session_id}")
+                return False
+            
+            trimmed_count = 0
+            for msg in appended:
+                session.stats.add(msg)
+                # The ring keeps the newest max_conversation_length messages; with
+                # alternating exchanges this drops the oldest exchange as a pair
+                evicted = session.messages.append(msg)
+                if evicted is not None:
+                    session.stats.remove(evicted)
+                    trimmed_count += 1
+            
+            # The store appends first and trims after, so this holds even when the
+            # batch trims messages it appended itself
+            self.store.update(session, appended, trimmed_count)
+        logger.debug(f"Added {len(appended)} message(s) to session {session_id}")
         return True
     
     def get_conversation_context(self, session_id: str, max_messages: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Get conversation context for prompt building"""
+        """Get conversation context as serializable dicts (for API responses)"""
+        return [msg.to_dict() for msg in self.get_conversation_view(session_id, max_messages)]
+    
+    def get_conversation_view(self, session_id: str, max_messages: Optional[int] = None) -> ConversationView:
+        """Read-only view of the session's most recent messages"""
         session = self.get_session(session_id)
         if not session:
-            return []
-        
-        messages = session.messages
-        if max_messages:
-            messages = messages[-max_messages:]
-        
-        return [
-            {
-                "text": msg.text,
-                "is_user": msg.is_user,
-                "timestamp": msg.timestamp.isoformat(),
-                "metadata": msg.metadata
-            }
-            for msg in messages
-        ]
+            return ConversationView.empty()
+        view = ConversationView(session.messages)
+        return view[-max_messages:] if max_messages else view
+    
+    def get_context_with_tags(self, session_id: str) -> Tuple[ConversationView, Set[str]]:
+        """Conversation view and recent context tags from a single session read, for prompt building"""
+        session = self.get_session(session_id)
+        if not session:
+            return ConversationView.empty(), set()
+        return ConversationView(session.messages), session.stats.context_tags()
     
     def get_recent_user_messages(self, session_id: str, count: int = 3) -> List[str]:
         """Get recent user messages for context"""
-        context = self.get_conversation_context(session_id)
-        return [msg["text"] for msg in context if msg["is_user"]][-count:]
+        return [msg.text for msg in self.get_conversation_view(session_id).last_user_messages(count)]
     
-    def cleanup_expired_sessions(self) -> int:
-        """Remove expired sessions and return count of removed sessions"""
-        cutoff_time = datetime.now() - timedelta(minutes=self.session_timeout_minutes)
-        expired_sessions = [
-            session_id for session_id, session in self.sessions.items()
-            if session.last_activity < cutoff_time
-        ]
+    def get_history_page(self, session_id: str, limit: int = 10, after: Optional[int] = None,
+                         before: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """A page of history addressed by message cursors
         
-        for session_id in expired_sessions:
-            del self.sessions[session_id]
-        
-        if expired_sessions:
-            logger.info(f"Cleaned up {len(expired_sessions)} expired sessions")
-        
-        return len(expired_sessions)
+        Returns the ``limit`` messages starting at cursor ``after``, or ending
+        just before cursor ``before``, or the newest ``limit`` without either.
+        Only the page is serialized. ``start``/``end`` are the cursors to pass
+        as ``before``/``after`` for the previous and next page.
+        """
+        session = self.get_session(session_id)
+        if not session:
+            return None
+        view = ConversationView(session.messages)
+        if after is not None:
+            page = view.after(after, limit)
+        elif before is not None:
+            page = view.before(before, limit)
+        else:
+            page = view.before(view.stop, limit)
+        start, stop = page.start, page.stop
+        return {
+            "messages": [msg.to_dict(cursor) for cursor, msg in page.items()],
+            "start": start,
+            "end": stop,
+            "has_more_before": start > view.start,
+            "has_more_after": stop < view.stop
+        }
+    
+    def get_session_stats(self, session_id: str) -> Optional[SessionStats]:
+        """Get the rolling aggregates of a session"""
+        session = self.get_session(session_id)
+        return session.stats if session else None
+    
+    def get_context_tags(self, session_id: str) -> Set[str]:
+        """Get context tags of the session's recent messages for prompt building"""
+        session = self.get_session(session_id)
+        return session.stats.context_tags() if session else set()
+    
+    def cleanup_expired_sessions(self, budget: Optional[int] = None) -> int:
+        """Remove expired sessions and return count of removed sessions"""
+        expired_count = self.store.cleanup_expired(budget)
+        if expired_count:
+            logger.info(f"Cleaned up {expired_count} expired sessions")
+        return expired_count
     
     def get_session_count(self) -> int:
         """Get total number of active sessions"""
-        return len(self.sessions)
+        return self.store.count()
+    
+    def get_memory_stats(self) -> Dict[str, Any]:
+        """Sessions, messages and approximate bytes held by this process for session state"""
+        return self.store.memory_stats()
     
     def export_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Export session data for analysis"""
@@ -144,18 +258,25 @@ class MemoryManager:
     
     def clear_session(self, session_id: str) -> bool:
         """Clear all messages in a session"""
-        session = self.get_session(session_id)
-        if session:
+        with self.store.lock(session_id):
+            session = self.get_session(session_id)
+            if not session:
+                return False
+            cleared = len(session.messages)
             session.messages.clear()
+            session.stats.reset()
             session.last_activity = datetime.now()
-            logger.info(f"Cleared session: {session_id}")
-            return True
-        return False
+            self.store.update(session, [], cleared)
+        logger.info(f"Cleared session: {session_id}")
+        return True
     
     def delete_session(self, session_id: str) -> bool:
         """Delete a session entirely"""
-        if session_id in self.sessions:
-            del self.sessions[session_id]
+        if self.store.delete(session_id):
             logger.info(f"Deleted session: {session_id}")
             return True
         return False
+    
+    def close(self):
+        """Release the session store's connections"""
+        self.store.close()
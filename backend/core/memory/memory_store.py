@@ -0,0 +1,180 @@
+from typing import List, Dict, Any, Optional, Set, Tuple
+from collections import deque
+from datetime import datetime, timedelta
+import heapq
+import sys
+from core.memory.memory_manager import DEFAULT_MAX_CONVERSATION_LENGTH, Message, Session
+from core.memory.journal import SessionJournal, OP_CREATE, OP_UPDATE, OP_DELETE
+from core.memory.session_codec import (
+    SNAPSHOT_HEADER, UPDATE_HEADER, decode_session, encode_messages, encode_session, journal_body
+)
+from core.memory.session_store import SessionStore
+
+
+class InMemorySessionStore(SessionStore):
+    """Per-process dict of live Session objects
+    
+    Expiry is ordered by a min-heap of (deadline, session id) holding one entry
+    per session. Touching a session only updates its ``last_activity``; when its
+    stale entry comes due it is pushed back with the real deadline, and entries
+    of deleted sessions are dropped when popped. A sweep therefore costs
+    O(log n) per entry it pops instead of a scan over every session.
+    
+    Not thread-safe by itself: ShardedSessionStore runs one instance per lock
+    stripe. With a ``journal``, creates, updates and deletes are logged to it.
+    """
+    
+    backend = "memory"
+    
+    def __init__(self, session_timeout_minutes: int = 30,
+                 max_conversation_length: int = DEFAULT_MAX_CONVERSATION_LENGTH,
+                 journal: Optional[SessionJournal] = None):
+        super().__init__(session_timeout_minutes)
+        self.max_conversation_length = max_conversation_length
+        self.sessions: Dict[str, Session] = {}
+        self.timeout = timedelta(minutes=session_timeout_minutes)
+        self._expiry_heap: List[Tuple[datetime, str]] = []
+        self.evicted_total = 0
+        self.last_expiry_lag_ms = 0.0
+        self.max_expiry_lag_ms = 0.0
+        self.compression_level = 1
+        self.journal = journal
+    
+    def create(self, session: Session):
+        self.sessions[session.id] = session
+        heapq.heappush(self._expiry_heap, (session.last_activity + self.timeout, session.id))
+        self._log_create(session)
+    
+    def load(self, session_id: str) -> Optional[Session]:
+        session = self.sessions.get(session_id)
+        if session:
+            session.last_activity = datetime.now()
+        return session
+    
+    def update(self, session: Session, appended: List[Message], trimmed: int):
+        # The loaded session is the stored one, so it is already up to date
+        self._log_update(session, appended)
+    
+    def delete(self, session_id: str) -> bool:
+        if self.sessions.pop(session_id, None) is None:
+            return False
+        self._log_delete(session_id)
+        return True
+    
+    def cleanup_expired(self, budget: Optional[int] = None) -> int:
+        """Pop due heap entries (at most ``budget`` of them) and evict sessions that really expired"""
+        now = datetime.now()
+        heap = self._expiry_heap
+        popped = 0
+        evicted = 0
+        while heap and heap[0][0] <= now and (budget is None or popped < budget):
+            _, session_id = heapq.heappop(heap)
+            popped += 1
+            last_activity = self._last_activity(session_id)
+            if last_activity is None:
+                continue  # Deleted since the entry was pushed
+            deadline = last_activity + self.timeout
+            if deadline > now:
+                heapq.heappush(heap, (deadline, session_id))
+                continue
+            
+            self._evict(session_id)
+            evicted += 1
+            # How long the session outlived its deadline before being evicted
+            self.last_expiry_lag_ms = (now - deadline).total_seconds() * 1000
+            self.max_expiry_lag_ms = max(self.max_expiry_lag_ms, self.last_expiry_lag_ms)
+        
+        self.evicted_total += evicted
+        return evicted
+    
+    def _last_activity(self, session_id: str) -> Optional[datetime]:
+        """Last activity of a session the expiry heap tracks, None if it is gone"""
+        session = self.sessions.get(session_id)
+        return session.last_activity if session else None
+    
+    def _evict(self, session_id: str):
+        del self.sessions[session_id]
+    
+    def expiry_stats(self) -> Dict[str, Any]:
+        heap = self._expiry_heap
+        now = datetime.now()
+        return {
+            "evicted_total": self.evicted_total,
+            "heap_entries": len(heap),
+            "last_expiry_lag_ms": round(self.last_expiry_lag_ms, 1),
+            "max_expiry_lag_ms": round(self.max_expiry_lag_ms, 1),
+            # How far past due the oldest heap entry is; an upper bound on the current
+            # expiry lag, since that entry may belong to a session touched since
+            "oldest_due_entry_ms": round(max(0.0, (now - heap[0][0]).total_seconds() * 1000), 1) if heap else 0.0
+        }
+    
+    def count(self) -> int:
+        return len(self.sessions)
+    
+    def memory_stats(self) -> Dict[str, Any]:
+        """Walks every message, so meant for health checks rather than hot paths"""
+        sessions = list(self.sessions.values())
+        seen: Set[int] = set()
+        message_count = sum(len(session.messages) for session in sessions)
+        approx_bytes = sum(_approximate_size(session, seen) for session in sessions)
+        return {
+            "backend": self.backend,
+            "sessions": len(sessions),
+            "messages": message_count,
+            "approx_bytes": approx_bytes,
+            "approx_bytes_per_message": round(approx_bytes / message_count) if message_count else 0
+        }
+    
+    def _log_create(self, session: Session):
+        if self.journal:
+            self.journal.log(OP_CREATE, journal_body(session.id, encode_session(session, self.compression_level)))
+    
+    def _log_update(self, session: Session, appended: List[Message]):
+        if self.journal:
+            ring = session.messages
+            # Position of the first appended message and of the oldest retained one
+            header = UPDATE_HEADER.pack(session.last_activity.timestamp(), ring.end - len(appended), ring.first)
+            self.journal.log(OP_UPDATE, lambda: journal_body(session.id, header, encode_messages(appended)))
+    
+    def _log_delete(self, session_id: str):
+        if self.journal:
+            self.journal.log(OP_DELETE, journal_body(session_id))
+    
+    def _restore(self, session: Session):
+        """Insert a recovered session without logging it"""
+        self.sessions[session.id] = session
+        heapq.heappush(self._expiry_heap, (session.last_activity + self.timeout, session.id))
+    
+    def _restore_blob(self, session_id: str, last_activity: float, blob: bytes):
+        self._restore(decode_session(blob, self.max_conversation_length))
+    
+    def _snapshot_ids(self) -> List[str]:
+        return list(self.sessions)
+    
+    def _snapshot_body(self, session_id: str) -> Optional[bytes]:
+        """Snapshot record of a session, None if it is gone"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        return journal_body(session_id, SNAPSHOT_HEADER.pack(session.last_activity.timestamp()),
+                             encode_session(session, self.compression_level))
+
+
+def _approximate_size(obj: Any, seen: Set[int]) -> int:
+    """sys.getsizeof summed over an object graph of dataclasses and containers"""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_approximate_size(key, seen) + _approximate_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(_approximate_size(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += _approximate_size(vars(obj), seen)
+    else:
+        for cls in type(obj).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                if hasattr(obj, slot):
+                    size += _approximate_size(getattr(obj, slot), seen)
+    return size
@@ -0,0 +1,114 @@
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+import json
+import time
+from core.memory.memory_manager import Message, MessageRing, Session
+from core.memory.session_codec import decode_message, decode_stats, encode_message, encode_stats
+from core.memory.session_store import SessionStore
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions shared between workers and nodes through a Redis-protocol server
+
+    Each session is a ``meta`` hash (creation time, user context, rolling stats)
+    and a ``messages`` list of JSON-encoded messages. Both keys share a hash tag
+    so they land on the same cluster slot. Expiry is native: every load and
+    update re-arms the TTL of both keys, so idle sessions disappear server-side
+    and no sweep is needed. Nothing is kept in this process between calls.
+
+    A load is one pipelined round trip (HGETALL, LRANGE, PEXPIRE x2); an update
+    is one MULTI/EXEC (RPUSH of all appended messages, LTRIM of the trimmed
+    prefix plus HINCRBY of the trim count, HSET of the stats, PEXPIRE x2). Two workers updating the same
+    session at once may leave its stats approximate, but never lose messages.
+    
+    Counting live sessions takes a SCAN of the keyspace, so the count is
+    reused for ``count_cache_seconds``.
+    """
+    
+    backend = "redis"
+    native_ttl = True
+    
+    def __init__(self, url: str, session_timeout_minutes: int = 30, key_prefix: str = "lucid:session:",
+                 max_conversation_length: int = 20, client=None, count_cache_seconds: float = 30.0):
+        super().__init__(session_timeout_minutes)
+        self.max_conversation_length = max_conversation_length
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.key_prefix = key_prefix
+        self.ttl_ms = session_timeout_minutes * 60 * 1000
+        self.count_cache_seconds = count_cache_seconds
+        self._count: Optional[Tuple[float, int]] = None
+    
+    def _meta_key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{{{session_id}}}:meta"
+    
+    def _messages_key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{{{session_id}}}:messages"
+    
+    def create(self, session: Session):
+        meta_key = self._meta_key(session.id)
+        pipe = self.client.pipeline()
+        pipe.hset(meta_key, mapping={
+            "created_at": session.created_at.isoformat(),
+            "user_context": json.dumps(session.user_context, default=str),
+            "stats": encode_stats(session.stats)
+        })
+        pipe.pexpire(meta_key, self.ttl_ms)
+        pipe.execute()
+    
+    def load(self, session_id: str) -> Optional[Session]:
+        meta_key, messages_key = self._meta_key(session_id), self._messages_key(session_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hgetall(meta_key)
+        pipe.lrange(messages_key, 0, -1)
+        # PEXPIRE on a missing key is a no-op, so this cannot resurrect a session
+        pipe.pexpire(meta_key, self.ttl_ms)
+        pipe.pexpire(messages_key, self.ttl_ms)
+        meta, messages, _, _ = pipe.execute()
+        if not meta:
+            return None
+        
+        return Session(
+            id=session_id,
+            # "trimmed" counts every message ever trimmed, which keeps history cursors stable
+            messages=MessageRing(self.max_conversation_length, (decode_message(raw) for raw in messages),
+                                 first=int(meta.get("trimmed", 0))),
+            created_at=datetime.fromisoformat(meta["created_at"]),
+            last_activity=datetime.now(),
+            user_context=json.loads(meta.get("user_context") or "{}"),
+            stats=decode_stats(meta.get("stats"))
+        )
+    
+    def update(self, session: Session, appended: List[Message], trimmed: int):
+        meta_key, messages_key = self._meta_key(session.id), self._messages_key(session.id)
+        pipe = self.client.pipeline()
+        if appended:
+            pipe.rpush(messages_key, *[encode_message(msg) for msg in appended])
+        if trimmed:
+            pipe.ltrim(messages_key, trimmed, -1)
+            pipe.hincrby(meta_key, "trimmed", trimmed)
+        pipe.hset(meta_key, "stats", encode_stats(session.stats))
+        pipe.pexpire(meta_key, self.ttl_ms)
+        pipe.pexpire(messages_key, self.ttl_ms)
+        pipe.execute()
+    
+    def delete(self, session_id: str) -> bool:
+        return self.client.delete(self._meta_key(session_id), self._messages_key(session_id)) > 0
+    
+    def count(self) -> int:
+        # Sessions expire server-side, so the live count has to be read back
+        cached = self._count
+        if cached is not None and time.monotonic() - cached[0] < self.count_cache_seconds:
+            return cached[1]
+        count = sum(1 for _ in self.client.scan_iter(match=f"{self.key_prefix}*:meta", count=1000))
+        self._count = (time.monotonic(), count)
+        return count
+    
+    def memory_stats(self) -> Dict[str, Any]:
+        # Nothing is held here; the session count is in get_session_count
+        return {"backend": self.backend}
+    
+    def close(self):
+        self.client.close()
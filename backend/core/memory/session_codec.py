@@ -0,0 +1,148 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import Counter
+from datetime import datetime
+import json
+import struct
+import zlib
+from core.memory.memory_manager import Message, MessageRing, Session, SessionStats, intern_metadata
+
+
+def _message_fields(message: Message) -> Dict[str, Any]:
+    return {
+        "id": message.id,
+        "text": message.text,
+        "is_user": message.is_user,
+        "ts": message.ts,
+        "metadata": message.metadata,
+        "analysis": message.analysis
+    }
+
+
+def _message_from_fields(data: Dict[str, Any]) -> Message:
+    return Message(
+        id=data["id"],
+        text=data["text"],
+        is_user=data["is_user"],
+        ts=data["ts"],
+        metadata=intern_metadata(data.get("metadata")),
+        analysis=data.get("analysis") or None
+    )
+
+
+def encode_message(message: Message) -> str:
+    return json.dumps(_message_fields(message), default=str)
+
+
+def decode_message(raw: str) -> Message:
+    return _message_from_fields(json.loads(raw))
+
+
+def _stats_fields(stats: SessionStats) -> Dict[str, Any]:
+    return {
+        "user_message_count": stats.user_message_count,
+        "assistant_message_count": stats.assistant_message_count,
+        "total_length": stats.total_length,
+        "emotion_counts": stats.emotion_counts,
+        "pattern_counts": stats.pattern_counts,
+        "recent_context_tags": list(stats.recent_context_tags)
+    }
+
+
+def _stats_from_fields(data: Optional[Dict[str, Any]]) -> SessionStats:
+    stats = SessionStats()
+    if not data:
+        return stats
+    stats.user_message_count = data["user_message_count"]
+    stats.assistant_message_count = data["assistant_message_count"]
+    stats.total_length = data["total_length"]
+    stats.emotion_counts = Counter(data["emotion_counts"])
+    stats.pattern_counts = Counter(data["pattern_counts"])
+    stats.recent_context_tags.extend(tuple(tags) for tags in data["recent_context_tags"])
+    return stats
+
+
+def encode_stats(stats: SessionStats) -> str:
+    return json.dumps(_stats_fields(stats))
+
+
+def decode_stats(raw: Optional[str]) -> SessionStats:
+    return _stats_from_fields(json.loads(raw) if raw else None)
+
+
+def encode_session(session: Session, compression_level: int) -> bytes:
+    """Whole session as a compressed JSON blob"""
+    return zlib.compress(json.dumps({
+        "id": session.id,
+        "created_at": session.created_at.timestamp(),
+        "last_activity": session.last_activity.timestamp(),
+        "user_context": session.user_context,
+        "stats": _stats_fields(session.stats),
+        "first": session.messages.first,
+        "messages": [_message_fields(msg) for msg in session.messages]
+    }, default=str).encode("utf-8"), compression_level)
+
+
+def decode_session(blob: bytes, max_conversation_length: int) -> Session:
+    data = json.loads(zlib.decompress(blob))
+    return Session(
+        id=data["id"],
+        messages=MessageRing(max_conversation_length, (_message_from_fields(msg) for msg in data["messages"]),
+                             first=data["first"]),
+        created_at=datetime.fromtimestamp(data["created_at"]),
+        last_activity=datetime.fromtimestamp(data["last_activity"]),
+        user_context=data["user_context"],
+        stats=_stats_from_fields(data["stats"])
+    )
+
+
+# Journal record bodies start with the session id; updates then carry the
+# session's last activity, the position of the first appended message and the
+# position of the oldest retained message, snapshots the last activity
+UPDATE_HEADER = struct.Struct("<dqq")
+SNAPSHOT_HEADER = struct.Struct("<d")
+
+
+_ID_LENGTH = struct.Struct("<H")
+
+
+def journal_body(session_id: str, *parts: bytes) -> bytes:
+    encoded_id = session_id.encode("utf-8")
+    return b"".join((_ID_LENGTH.pack(len(encoded_id)), encoded_id) + parts)
+
+
+def split_journal_body(body: memoryview) -> Tuple[str, memoryview]:
+    (length,) = _ID_LENGTH.unpack_from(body)
+    start = _ID_LENGTH.size
+    return bytes(body[start:start + length]).decode("utf-8"), body[start + length:]
+
+
+def encode_messages(messages: List[Message]) -> bytes:
+    return json.dumps([_message_fields(msg) for msg in messages], default=str).encode("utf-8")
+
+
+def replay_update(session: Session, body: memoryview):
+    """Apply a logged update, skipping what the session already reflects"""
+    last_activity, start, first = UPDATE_HEADER.unpack_from(body)
+    ring, stats = session.messages, session.stats
+    messages = json.loads(bytes(body[UPDATE_HEADER.size:]))
+    for position, data in enumerate(messages, start):
+        if position < ring.end:
+            continue
+        if position > ring.end:
+            # Nothing in between survived; restart the ring at this position
+            ring.clear()
+            stats.reset()
+            ring.first = ring.end = position
+        msg = _message_from_fields(data)
+        stats.add(msg)
+        evicted = ring.append(msg)
+        if evicted is not None:
+            stats.remove(evicted)
+    if first >= ring.end and first > ring.first:
+        # Cleared
+        ring.clear()
+        stats.reset()
+        ring.first = ring.end = first
+    while ring.first < first:
+        stats.remove(ring.popleft())
+    session.last_activity = datetime.fromtimestamp(last_activity)
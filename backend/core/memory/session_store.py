@@ -0,0 +1,147 @@
+from typing import List, Dict, Any, ContextManager, Optional
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from core.memory.memory_manager import Message, Session
+from core.memory.journal import SessionJournal
+from config.settings import settings
+from core.utils.logger import logger
+
+# Backend modules are imported by create_session_store, so they can build on
+# SessionStore and importing this module stays cheap
+
+
+class SessionStore(ABC):
+    """Where sessions live; MemoryManager mutates loaded sessions and reports changes back
+
+    ``load`` returns a Session and refreshes its expiry. After MemoryManager has
+    appended messages to it and trimmed messages from its front, ``update``
+    persists exactly that delta so a backend never has to rewrite history.
+    """
+    
+    backend = "base"
+    # True when the backend expires sessions by itself and needs no sweeping
+    native_ttl = False
+    
+    def __init__(self, session_timeout_minutes: int = 30):
+        self.session_timeout_minutes = session_timeout_minutes
+    
+    @abstractmethod
+    def create(self, session: Session):
+        pass
+    
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[Session]:
+        pass
+    
+    @abstractmethod
+    def update(self, session: Session, appended: List[Message], trimmed: int):
+        """Persist messages appended to the session and the number trimmed from its front"""
+    
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        pass
+    
+    def cleanup_expired(self, budget: Optional[int] = None) -> int:
+        """Drop expired sessions, doing at most ``budget`` units of work; returns how many were removed"""
+        return 0
+    
+    def expiry_stats(self) -> Dict[str, Any]:
+        return {}
+    
+    @abstractmethod
+    def count(self) -> int:
+        pass
+    
+    def memory_stats(self) -> Dict[str, Any]:
+        """Session state held in this process"""
+        return {"backend": self.backend, "sessions": self.count()}
+    
+    def lock(self, session_id: str) -> ContextManager:
+        """Held by MemoryManager across a session's load, mutation and update"""
+        return nullcontext()
+    
+    def start(self):
+        """Start background maintenance on the running event loop"""
+        pass
+    
+    def close(self):
+        pass
+
+
+def create_session_store(session_timeout_minutes: int = 30, max_conversation_length: int = 20) -> SessionStore:
+    """Session store selected by ``settings.session_store_type``"""
+    from core.memory.memory_store import InMemorySessionStore
+    from core.memory.sharded_store import ShardedSessionStore
+    from core.memory.tiered_store import TieredSessionStore
+    
+    if settings.session_store_type == "redis":
+        try:
+            from core.memory.redis_store import RedisSessionStore
+            store = RedisSessionStore(settings.session_store_url, session_timeout_minutes,
+                                      key_prefix=settings.session_store_key_prefix,
+                                      max_conversation_length=max_conversation_length,
+                                      count_cache_seconds=settings.session_store_count_cache_seconds)
+            store.client.ping()
+            logger.info(f"Using Redis session store at {settings.session_store_url}")
+            return store
+        except Exception as e:
+            logger.error(f"Failed to connect to Redis session store: {e}")
+            logger.warning("Falling back to in-memory session store; sessions will not be shared between workers")
+    elif settings.session_store_type != "memory":
+        logger.warning(f"Unknown session store type {settings.session_store_type}, using in-memory store")
+    
+    journal = _open_journal()
+    shard_count = max(1, settings.session_store_shards)
+    shards = None
+    if settings.session_memory_budget_mb > 0:
+        try:
+            shards = [
+                TieredSessionStore(
+                    session_timeout_minutes,
+                    max_conversation_length,
+                    memory_budget_bytes=int(settings.session_memory_budget_mb * 1024 * 1024 / shard_count),
+                    hot_fraction=settings.session_hot_fraction,
+                    hot_idle_seconds=settings.session_hot_idle_seconds,
+                    spill_dir=settings.session_spill_dir,
+                    journal=journal,
+                    shard=shard
+                )
+                for shard in range(shard_count)
+            ]
+        except Exception as e:
+            logger.error(f"Failed to open session spill file: {e}")
+            logger.warning("Falling back to an unbounded in-memory session store")
+    if shards is None:
+        shards = [InMemorySessionStore(session_timeout_minutes, max_conversation_length, journal)
+                  for _ in range(shard_count)]
+    store = ShardedSessionStore(shards, journal)
+    
+    if journal:
+        try:
+            store.recover()
+        except Exception as e:
+            logger.error(f"Failed to recover sessions from {settings.session_wal_dir}: {e}")
+            logger.warning("Continuing without a session write-ahead log")
+            store.journal = None
+            for shard in shards:
+                shard.journal = None
+            journal.close()
+    return store
+
+
+def _open_journal() -> Optional[SessionJournal]:
+    """Session journal for the in-process stores, None when disabled or unavailable"""
+    if not settings.session_wal_enabled:
+        return None
+    try:
+        return SessionJournal(
+            settings.session_wal_dir,
+            flush_interval_ms=settings.session_wal_flush_interval_ms,
+            fsync=settings.session_wal_fsync,
+            snapshot_interval_seconds=settings.session_wal_snapshot_interval_seconds,
+            snapshot_min_bytes=settings.session_wal_snapshot_min_bytes
+        )
+    except Exception as e:
+        logger.error(f"Failed to open session write-ahead log: {e}")
+        logger.warning("Sessions will not survive a restart")
+        return None
@@ -0,0 +1,286 @@
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+import asyncio
+import threading
+import time
+from core.memory.memory_manager import Message, Session
+from core.memory.journal import SessionJournal, OP_CREATE, OP_UPDATE, OP_DELETE
+from core.memory.memory_store import InMemorySessionStore
+from core.memory.session_codec import SNAPSHOT_HEADER, decode_session, encode_session, replay_update, split_journal_body
+from core.memory.session_store import SessionStore
+from core.utils.logger import logger
+
+
+class ShardedSessionStore(SessionStore):
+    """Thread-safe in-process store striped over independently locked shards
+
+    A session lives in the shard its id hashes to, each shard being a plain or
+    tiered store guarded by its own lock, so operations on sessions of
+    different shards never contend. MemoryManager holds a session's ``lock``
+    across load, mutation and update. Expiry and counting walk the shards one
+    at a time, and a tiered store's memory budget is split evenly over them.
+
+    The shards share the ``journal``: they log their own creates, updates and
+    deletes (the journal encodes and group-commits them off the request path)
+    and ``recover`` rebuilds the sessions of a previous process from its
+    snapshot and log. Snapshots are taken in the background, a chunk of
+    sessions per event loop iteration. Replay is idempotent: update records
+    carry absolute message positions, so a record already reflected in the
+    snapshot is skipped. Only mutations are logged, so recovered sessions
+    count their idle time from their last change rather than their last read.
+    """
+    
+    # Sessions encoded per event loop iteration while snapshotting
+    SNAPSHOT_CHUNK = 256
+    # How often the snapshot task checks whether the log needs folding
+    SNAPSHOT_CHECK_SECONDS = 5.0
+    
+    def __init__(self, shards: List[InMemorySessionStore], journal: Optional[SessionJournal] = None):
+        super().__init__(shards[0].session_timeout_minutes)
+        self.shards = shards
+        self._locks = [threading.RLock() for _ in shards]
+        self.backend = shards[0].backend
+        self.max_conversation_length = shards[0].max_conversation_length
+        self.timeout = shards[0].timeout
+        self.journal = journal
+        self.recovery: Dict[str, Any] = {}
+        self._snapshot_task: Optional[asyncio.Task] = None
+    
+    def _shard_of(self, session_id: str) -> int:
+        return hash(session_id) % len(self.shards)
+    
+    def lock(self, session_id: str) -> threading.RLock:
+        return self._locks[self._shard_of(session_id)]
+    
+    def create(self, session: Session):
+        shard = self._shard_of(session.id)
+        with self._locks[shard]:
+            self.shards[shard].create(session)
+    
+    def load(self, session_id: str) -> Optional[Session]:
+        shard = self._shard_of(session_id)
+        with self._locks[shard]:
+            return self.shards[shard].load(session_id)
+    
+    def update(self, session: Session, appended: List[Message], trimmed: int):
+        shard = self._shard_of(session.id)
+        with self._locks[shard]:
+            self.shards[shard].update(session, appended, trimmed)
+    
+    def delete(self, session_id: str) -> bool:
+        shard = self._shard_of(session_id)
+        with self._locks[shard]:
+            return self.shards[shard].delete(session_id)
+    
+    def session_ids(self) -> List[str]:
+        """Ids of every session held, across tiers"""
+        ids = []
+        for shard, lock in zip(self.shards, self._locks):
+            with lock:
+                ids.extend(shard._snapshot_ids())
+        return ids
+    
+    def export_session(self, session_id: str, remove: bool = True) -> Optional[bytes]:
+        """Return a session encoded for handing it off to another node, removing it unless ``remove`` is False"""
+        shard = self._shard_of(session_id)
+        with self._locks[shard]:
+            session = self.shards[shard].load(session_id)
+            if session is None:
+                return None
+            blob = encode_session(session, self.shards[shard].compression_level)
+            if remove:
+                self.shards[shard].delete(session_id)
+            return blob
+    
+    def import_session(self, blob: bytes) -> bool:
+        """Adopt a session exported by another node, unless a copy is already held"""
+        session = decode_session(blob, self.max_conversation_length)
+        shard = self._shard_of(session.id)
+        with self._locks[shard]:
+            if self.shards[shard].load(session.id) is not None:
+                return False
+            self.shards[shard].create(session)
+            return True
+    
+    def cleanup_expired(self, budget: Optional[int] = None) -> int:
+        """Sweep shard by shard, each with an even share of ``budget``"""
+        share = None if budget is None else -(-budget // len(self.shards))
+        evicted = 0
+        for shard, lock in zip(self.shards, self._locks):
+            with lock:
+                evicted += shard.cleanup_expired(share)
+        return evicted
+    
+    def expiry_stats(self) -> Dict[str, Any]:
+        stats = []
+        for shard, lock in zip(self.shards, self._locks):
+            with lock:
+                stats.append(shard.expiry_stats())
+        return _merge_stats(stats)
+    
+    def count(self) -> int:
+        return sum(shard.count() for shard in self.shards)
+    
+    def memory_stats(self) -> Dict[str, Any]:
+        stats = []
+        for shard, lock in zip(self.shards, self._locks):
+            with lock:
+                stats.append(shard.memory_stats())
+        merged = _merge_stats(stats)
+        merged["backend"] = self.backend
+        merged["shards"] = len(self.shards)
+        if merged.get("messages"):
+            merged["approx_bytes_per_message"] = round(merged["approx_bytes"] / merged["messages"])
+        if self.journal:
+            merged["journal"] = self._journal_stats()
+        return merged
+    
+    def _journal_stats(self) -> Dict[str, Any]:
+        stats = self.journal.stats()
+        stats["recovery"] = self.recovery
+        return stats
+    
+    def recover(self):
+        """Rebuild sessions from the journal's snapshot and log, then start logging"""
+        journal = self.journal
+        started = time.perf_counter()
+        # Snapshot entries stay encoded unless the log touches them
+        entries: Dict[str, Tuple[float, bytes]] = {}
+        live: Dict[str, Session] = {}
+        snapshot_records = 0
+        log_records = 0
+        
+        for _, body in journal.read_snapshot():
+            session_id, rest = split_journal_body(body)
+            (last_activity,) = SNAPSHOT_HEADER.unpack_from(rest)
+            entries[session_id] = (last_activity, bytes(rest[SNAPSHOT_HEADER.size:]))
+            snapshot_records += 1
+        
+        for op, body in journal.read_log():
+            log_records += 1
+            session_id, rest = split_journal_body(body)
+            if op == OP_DELETE:
+                live.pop(session_id, None)
+                entries.pop(session_id, None)
+                continue
+            session = live.get(session_id)
+            if session is None and session_id in entries:
+                session = live[session_id] = decode_session(entries.pop(session_id)[1], self.max_conversation_length)
+            if op == OP_CREATE:
+                if session is None:
+                    live[session_id] = decode_session(bytes(rest), self.max_conversation_length)
+            elif op == OP_UPDATE and session is not None:
+                replay_update(session, rest)
+        
+        # Oldest first, so least-recently-used order follows activity
+        cutoff = time.time() - self.timeout.total_seconds()
+        restored = [(session.last_activity.timestamp(), session_id, session) for session_id, session in live.items()]
+        restored.extend((last_activity, session_id, blob) for session_id, (last_activity, blob) in entries.items())
+        restored.sort(key=lambda item: item[0])
+        sessions = 0
+        for last_activity, session_id, value in restored:
+            if last_activity <= cutoff:
+                continue
+            shard = self._shard_of(session_id)
+            with self._locks[shard]:
+                if isinstance(value, Session):
+                    self.shards[shard]._restore(value)
+                else:
+                    self.shards[shard]._restore_blob(session_id, last_activity, value)
+            sessions += 1
+        
+        journal.start()
+        elapsed = time.perf_counter() - started
+        records = snapshot_records + log_records
+        self.recovery = {
+            "sessions": sessions,
+            "snapshot_records": snapshot_records,
+            "log_records": log_records,
+            "seconds": round(elapsed, 3),
+            "records_per_second": round(records / elapsed) if elapsed > 0 else 0
+        }
+        logger.info(f"Recovered {sessions} sessions from {snapshot_records} snapshot and {log_records} log records "
+                    f"in {elapsed:.2f}s ({self.recovery['records_per_second']} records/s)")
+    
+    def _snapshot_chunks(self) -> Iterator[List[bytes]]:
+        """Snapshot records a chunk at a time, each chunk encoded under its shard's lock"""
+        for shard, lock in zip(self.shards, self._locks):
+            with lock:
+                ids = shard._snapshot_ids()
+            for index in range(0, len(ids), self.SNAPSHOT_CHUNK):
+                with lock:
+                    bodies = [shard._snapshot_body(session_id) for session_id in ids[index:index + self.SNAPSHOT_CHUNK]]
+                yield [body for body in bodies if body is not None]
+    
+    async def snapshot(self):
+        """Write a snapshot and drop the log it replaces, yielding to the event loop between chunks"""
+        journal = self.journal
+        generation = await asyncio.to_thread(journal.rotate)
+        writer = journal.snapshot_writer(generation)
+        try:
+            for bodies in self._snapshot_chunks():
+                await asyncio.to_thread(writer.write, bodies)
+            await asyncio.to_thread(writer.commit)
+        except BaseException:
+            writer.abort()
+            raise
+        logger.info(f"Session snapshot {generation}: {writer.sessions} sessions in {journal.last_snapshot_ms:.0f}ms")
+    
+    def snapshot_sync(self):
+        """Blocking snapshot, used at shutdown so the next start replays no log"""
+        journal = self.journal
+        writer = journal.snapshot_writer(journal.rotate())
+        try:
+            for bodies in self._snapshot_chunks():
+                writer.write(bodies)
+            writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+    
+    async def _snapshot_periodically(self):
+        while True:
+            await asyncio.sleep(self.SNAPSHOT_CHECK_SECONDS)
+            if self.journal.should_snapshot():
+                try:
+                    await self.snapshot()
+                except Exception as e:
+                    logger.error(f"Session snapshot failed: {e}")
+    
+    def start(self):
+        if self.journal and (self._snapshot_task is None or self._snapshot_task.done()):
+            self._snapshot_task = asyncio.get_running_loop().create_task(self._snapshot_periodically())
+    
+    def close(self):
+        """Snapshot and close the journal, then the shards"""
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            self._snapshot_task = None
+        if self.journal:
+            try:
+                self.journal.flush()
+                if self.journal.log_bytes:
+                    self.snapshot_sync()
+            except Exception as e:
+                logger.error(f"Session snapshot on shutdown failed: {e}")
+            self.journal.close()
+            self.journal = None
+        for shard in self.shards:
+            shard.close()
+
+
+def _merge_stats(stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-shard stats: counts add up, maxima take the max, other floats average"""
+    merged: Dict[str, Any] = {}
+    for key, value in stats[0].items():
+        values = [shard_stats[key] for shard_stats in stats]
+        if isinstance(value, dict):
+            merged[key] = _merge_stats(values)
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            merged[key] = value
+        elif "max" in key or "oldest" in key or key.startswith("last_"):
+            merged[key] = max(values)
+        elif isinstance(value, int):
+            merged[key] = sum(values)
+        else:
+            merged[key] = round(sum(values) / len(values), 3)
+    return merged
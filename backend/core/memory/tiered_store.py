@@ -0,0 +1,292 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import heapq
+import os
+import sqlite3
+import time
+from core.memory.memory_manager import Message, Session
+from core.memory.journal import SessionJournal
+from core.memory.memory_store import InMemorySessionStore
+from core.memory.session_codec import SNAPSHOT_HEADER, decode_session, encode_session, journal_body
+
+
+class TieredSessionStore(InMemorySessionStore):
+    """In-process store that keeps session state within a memory budget
+
+    Three tiers, each in least-recently-used order:
+
+    - hot: live Session objects, as in InMemorySessionStore
+    - warm: zlib-compressed JSON blobs in memory
+    - cold: the same blobs in a SQLite spill file per process and shard
+
+    Sessions idle for ``hot_idle_seconds``, and the least recently used ones
+    whenever hot state exceeds its share of the budget, are compressed into the
+    warm tier; warm blobs beyond the rest of the budget spill to disk. Loading
+    a warm or cold session decompresses it back into the hot tier. Hot sizes are
+    estimated in O(1) from the session's rolling stats, warm sizes are exact.
+
+    Cold sessions cost no memory: their expiry heap entries are dropped (the
+    heap is rebuilt once dead entries dominate) and they are expired by an
+    indexed query on the spill file instead.
+    """
+    
+    backend = "tiered"
+    
+    # Calibrated with tracemalloc against sessions holding analysed user messages
+    SESSION_BYTES = 1700
+    USER_MESSAGE_BYTES = 690
+    ASSISTANT_MESSAGE_BYTES = 170
+    
+    def __init__(self, session_timeout_minutes: int = 30, max_conversation_length: int = 20,
+                 memory_budget_bytes: int = 256 * 1024 * 1024, hot_fraction: float = 0.5,
+                 hot_idle_seconds: float = 120.0, spill_dir: str = "data/session_spill", compression_level: int = 1,
+                 journal: Optional[SessionJournal] = None, shard: int = 0):
+        super().__init__(session_timeout_minutes, max_conversation_length, journal)
+        self.hot_budget = int(memory_budget_bytes * hot_fraction)
+        self.warm_budget = memory_budget_bytes - self.hot_budget
+        self.hot_idle = timedelta(seconds=hot_idle_seconds)
+        self.compression_level = compression_level
+        
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._hot_sizes: Dict[str, int] = {}
+        self.hot_bytes = 0
+        self._warm: "OrderedDict[str, Tuple[bytes, datetime]]" = OrderedDict()
+        self.warm_bytes = 0
+        
+        # The spill file only caches this process's sessions, so durability is not needed
+        os.makedirs(spill_dir, exist_ok=True)
+        self.spill_path = os.path.join(spill_dir, f"sessions-{os.getpid()}-{shard}.sqlite3")
+        if os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+        # Used from whichever thread holds the shard's lock
+        self._spill = sqlite3.connect(self.spill_path, isolation_level=None, check_same_thread=False)
+        self._spill.execute("PRAGMA synchronous=OFF")
+        self._spill.execute("PRAGMA journal_mode=OFF")
+        self._spill.execute("CREATE TABLE sessions (id TEXT PRIMARY KEY, last_activity REAL NOT NULL, blob BLOB NOT NULL)")
+        self._spill.execute("CREATE INDEX sessions_last_activity ON sessions (last_activity)")
+        self._cold_count = 0
+        
+        self.demotions = 0
+        self.spills = 0
+        self._rehydrations = {tier: {"count": 0, "total_ms": 0.0, "max_ms": 0.0} for tier in ("warm", "cold")}
+    
+    def create(self, session: Session):
+        super().create(session)
+        self._account(session)
+        self._enforce_budget()
+    
+    def load(self, session_id: str) -> Optional[Session]:
+        session = self.sessions.get(session_id)
+        if session:
+            session.last_activity = datetime.now()
+            self.sessions.move_to_end(session_id)
+            return session
+        
+        started = time.perf_counter()
+        entry = self._warm.pop(session_id, None)
+        if entry is not None:
+            tier, blob = "warm", entry[0]
+            self.warm_bytes -= len(blob)
+        else:
+            row = self._spill.execute("SELECT blob FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            tier, blob = "cold", row[0]
+            self._spill.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._cold_count -= 1
+        
+        session = decode_session(blob, self.max_conversation_length)
+        now = datetime.now()
+        if session.last_activity + self.timeout <= now:
+            # Expired while compressed; the sweep just has not reached it yet
+            self.evicted_total += 1
+            return None
+        session.last_activity = now
+        self.sessions[session_id] = session
+        self._account(session)
+        if tier == "cold":
+            heapq.heappush(self._expiry_heap, (now + self.timeout, session_id))
+        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stats = self._rehydrations[tier]
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        self._enforce_budget()
+        return session
+    
+    def update(self, session: Session, appended: List[Message], trimmed: int):
+        if session.id not in self.sessions:
+            # Demoted between load and update: the caller's object is now the freshest copy
+            self._discard(session.id)
+            self.sessions[session.id] = session
+            heapq.heappush(self._expiry_heap, (session.last_activity + self.timeout, session.id))
+        self._account(session)
+        self._log_update(session, appended)
+        self._enforce_budget()
+    
+    def delete(self, session_id: str) -> bool:
+        if not self._discard(session_id):
+            return False
+        self._log_delete(session_id)
+        return True
+    
+    def _discard(self, session_id: str) -> bool:
+        """Drop a session from whichever tier holds it"""
+        if session_id in self.sessions:
+            self._evict(session_id)
+            return True
+        entry = self._warm.pop(session_id, None)
+        if entry is not None:
+            self.warm_bytes -= len(entry[0])
+            return True
+        if self._spill.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount:
+            self._cold_count -= 1
+            return True
+        return False
+    
+    def _last_activity(self, session_id: str) -> Optional[datetime]:
+        session = self.sessions.get(session_id)
+        if session is not None:
+            return session.last_activity
+        entry = self._warm.get(session_id)
+        # Cold sessions are not tracked by the heap
+        return entry[1] if entry is not None else None
+    
+    def _evict(self, session_id: str):
+        if self.sessions.pop(session_id, None) is not None:
+            self.hot_bytes -= self._hot_sizes.pop(session_id)
+        else:
+            entry = self._warm.pop(session_id)
+            self.warm_bytes -= len(entry[0])
+    
+    def cleanup_expired(self, budget: Optional[int] = None) -> int:
+        """Expire hot and warm sessions from the heap and cold ones from the spill file, then demote idle sessions"""
+        evicted = super().cleanup_expired(budget)
+        cutoff = (datetime.now() - self.timeout).timestamp()
+        limit = -1 if budget is None else budget
+        cold_expired = self._spill.execute(
+            "DELETE FROM sessions WHERE id IN (SELECT id FROM sessions WHERE last_activity < ? LIMIT ?)",
+            (cutoff, limit)
+        ).rowcount
+        self._cold_count -= cold_expired
+        self.evicted_total += cold_expired
+        
+        self._demote_idle(budget)
+        return evicted + cold_expired
+    
+    def _account(self, session: Session):
+        """Refresh the hot-tier size estimate of a session"""
+        stats = session.stats
+        size = (self.SESSION_BYTES + stats.user_message_count * self.USER_MESSAGE_BYTES
+                + stats.assistant_message_count * self.ASSISTANT_MESSAGE_BYTES + stats.total_length)
+        self.hot_bytes += size - self._hot_sizes.get(session.id, 0)
+        self._hot_sizes[session.id] = size
+    
+    def _demote_idle(self, budget: Optional[int] = None):
+        cutoff = datetime.now() - self.hot_idle
+        demoted = 0
+        while self.sessions and (budget is None or demoted < budget):
+            session_id, session = next(iter(self.sessions.items()))
+            if session.last_activity >= cutoff:
+                break
+            self._demote(session_id)
+            demoted += 1
+        self._enforce_budget()
+    
+    def _enforce_budget(self):
+        # The most recently used session always stays hot
+        while self.hot_bytes > self.hot_budget and len(self.sessions) > 1:
+            self._demote(next(iter(self.sessions)))
+        while self.warm_bytes > self.warm_budget and self._warm:
+            self._spill_coldest()
+        
+        # Heap entries of spilled sessions are dead weight until they come due;
+        # rebuild once they outnumber the live ones
+        tracked = len(self.sessions) + len(self._warm)
+        if len(self._expiry_heap) > 2 * tracked + 1024:
+            self._expiry_heap = [(session.last_activity + self.timeout, session_id)
+                                 for session_id, session in self.sessions.items()]
+            self._expiry_heap.extend((last_activity + self.timeout, session_id)
+                                     for session_id, (_, last_activity) in self._warm.items())
+            heapq.heapify(self._expiry_heap)
+    
+    def _demote(self, session_id: str):
+        """Compress a hot session into the warm tier"""
+        session = self.sessions.pop(session_id)
+        self.hot_bytes -= self._hot_sizes.pop(session_id)
+        blob = encode_session(session, self.compression_level)
+        self._warm[session_id] = (blob, session.last_activity)
+        self.warm_bytes += len(blob)
+        self.demotions += 1
+    
+    def _spill_coldest(self):
+        """Move the least recently used warm blob to the spill file"""
+        session_id, (blob, last_activity) = self._warm.popitem(last=False)
+        self.warm_bytes -= len(blob)
+        self._spill.execute("INSERT OR REPLACE INTO sessions (id, last_activity, blob) VALUES (?, ?, ?)",
+                            (session_id, last_activity.timestamp(), blob))
+        self._cold_count += 1
+        self.spills += 1
+    
+    def _restore(self, session: Session):
+        super()._restore(session)
+        self._account(session)
+        self._enforce_budget()
+    
+    def _restore_blob(self, session_id: str, last_activity: float, blob: bytes):
+        """Recovered sessions the log never touched stay compressed in the warm tier"""
+        last_activity = datetime.fromtimestamp(last_activity)
+        self._warm[session_id] = (blob, last_activity)
+        self.warm_bytes += len(blob)
+        heapq.heappush(self._expiry_heap, (last_activity + self.timeout, session_id))
+        self._enforce_budget()
+    
+    def _snapshot_ids(self) -> List[str]:
+        ids = list(self.sessions)
+        ids.extend(self._warm)
+        ids.extend(row[0] for row in self._spill.execute("SELECT id FROM sessions"))
+        return ids
+    
+    def _snapshot_body(self, session_id: str) -> Optional[bytes]:
+        """Warm and cold sessions are snapshotted from their blobs without decoding them"""
+        if session_id in self.sessions:
+            return super()._snapshot_body(session_id)
+        entry = self._warm.get(session_id)
+        if entry is not None:
+            blob, last_activity = entry[0], entry[1].timestamp()
+        else:
+            row = self._spill.execute("SELECT blob, last_activity FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            blob, last_activity = row
+        return journal_body(session_id, SNAPSHOT_HEADER.pack(last_activity), blob)
+    
+    def count(self) -> int:
+        return len(self.sessions) + len(self._warm) + self._cold_count
+    
+    def memory_stats(self) -> Dict[str, Any]:
+        rehydrations = {
+            tier: {
+                "count": stats["count"],
+                "mean_ms": round(stats["total_ms"] / stats["count"], 3) if stats["count"] else 0.0,
+                "max_ms": round(stats["max_ms"], 3)
+            }
+            for tier, stats in self._rehydrations.items()
+        }
+        return {
+            "backend": self.backend,
+            "sessions": self.count(),
+            "hot": {"sessions": len(self.sessions), "approx_bytes": self.hot_bytes, "budget_bytes": self.hot_budget},
+            "warm": {"sessions": len(self._warm), "bytes": self.warm_bytes, "budget_bytes": self.warm_budget},
+            "cold": {"sessions": self._cold_count, "file_bytes": os.path.getsize(self.spill_path)},
+            "demotions": self.demotions,
+            "spills": self.spills,
+            "rehydrations": rehydrations
+        }
+    
+    def close(self):
+        self._spill.close()
+        if os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
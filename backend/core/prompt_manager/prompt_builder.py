@@ -1,17 +1,39 @@
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Set, Sequence
+from dataclasses import dataclass, field
 from core.utils.logger import logger
+from core.lexicon.registry import lexicon
+from core.memory.memory_manager import Message
+
+
+# Keyword groups used to tag conversation context, registered with the shared lexicon below
+CONTEXT_EMOTION_KEYWORDS = {
+    "confusion": ["confused", "unclear", "don't know", "unsure"],
+    "frustration": ["frustrated", "stuck", "annoyed", "difficult"],
+    "curiosity": ["curious", "interested", "wonder", "explore"],
+    "uncertainty": ["uncertain", "maybe", "perhaps", "not sure"],
+    "reflection": ["think", "feel", "believe", "consider"]
+}
+
+CONTEXT_PATTERN_KEYWORDS = {
+    "pattern_recognition": ["pattern", "always", "never"],
+    "obligation_thinking": ["should", "must", "need"],
+    "hypothetical_thinking": ["if only", "wish", "hope"]
+}
+
+lexicon.register_groups("context.emotion", CONTEXT_EMOTION_KEYWORDS)
+lexicon.register_groups("context.pattern", CONTEXT_PATTERN_KEYWORDS)
 
 
 @dataclass
 class PromptContext:
     """Context data for prompt building"""
     user_message: str
-    conversation_history: List[Dict[str, Any]]
+    conversation_history: Sequence[Message]  # read-only view, see MemoryManager.get_conversation_view
     philosophical_context: str
     emotion_indicators: List[str]
     cognitive_patterns: List[str]
     session_metadata: Dict[str, Any]
+    long_term_memories: List[str] = field(default_factory=list)  # the user's related messages from past sessions
 
 
 class PromptBuilder:
@@ -73,11 +95,16 @@ AVOID:
         if context.conversation_history:
             recent_history = context.conversation_history[-3:]  # Last 3 exchanges
             history_text = "\n".join([
-                f"{'User' if msg['is_user'] else 'LUCID'}: {msg['text']}"
+                f"{'User' if msg.is_user else 'LUCID'}: {msg.text}"
                 for msg in recent_history
             ])
             context_parts.append(f"RECENT CONVERSATION:\n{history_text}")
         
+        # Related moments from the user's earlier sessions
+        if context.long_term_memories:
+            memories_text = "\n".join(f"- {memory}" for memory in context.long_term_memories)
+            context_parts.append(f"FROM EARLIER CONVERSATIONS:\n{memories_text}")
+        
         # Emotional context
         if context.emotion_indicators:
             emotions_text = ", ".join(context.emotion_indicators)
@@ -121,36 +148,34 @@ Generate exactly ONE reflective question (under 150 characters) that encourages
 
 Response:"""
     
-    def extract_metadata_for_context(self, conversation_history: List[Dict[str, Any]]) -> PromptContext:
-        """Extract relevant metadata from conversation for prompt building"""
+    def tag_message(self, text: str) -> List[str]:
+        """Context tags (emotion and pattern categories) found in a single message"""
+        return lexicon.scan(text).categories("context.")
+    
+    def extract_metadata_for_context(self, conversation_history: Sequence[Message],
+                                     context_tags: Optional[Set[str]] = None) -> PromptContext:
+        """Extract relevant metadata from conversation for prompt building
+        
+        ``context_tags`` are the precomputed tags of the recent messages (see
+        MemoryManager.get_context_tags); without them the recent history is rescanned.
+        """
         # Get recent user messages for analysis
         recent_user_messages = [
-            msg["text"] for msg in conversation_history[-5:] 
-            if msg["is_user"]
+            msg.text for msg in conversation_history[-5:] 
+            if msg.is_user
         ]
         
-        # Simple emotion detection (can be enhanced)
-        emotion_keywords = {
-            "confusion": ["confused", "unclear", "don't know", "unsure"],
-            "frustration": ["frustrated", "stuck", "annoyed", "difficult"],
-            "curiosity": ["curious", "interested", "wonder", "explore"],
-            "uncertainty": ["uncertain", "maybe", "perhaps", "not sure"],
-            "reflection": ["think", "feel", "believe", "consider"]
-        }
-        
-        detected_emotions = []
-        for emotion, keywords in emotion_keywords.items():
-            if any(keyword in " ".join(recent_user_messages).lower() for keyword in keywords):
-                detected_emotions.append(emotion)
-        
-        # Simple cognitive pattern detection
-        cognitive_patterns = []
-        if any(word in " ".join(recent_user_messages).lower() for word in ["pattern", "always", "never"]):
-            cognitive_patterns.append("pattern_recognition")
-        if any(word in " ".join(recent_user_messages).lower() for word in ["should", "must", "need"]):
-            cognitive_patterns.append("obligation_thinking")
-        if any(word in " ".join(recent_user_messages).lower() for word in ["if only", "wish", "hope"]):
-            cognitive_patterns.append("hypothetical_thinking")
+        # Simple emotion and cognitive pattern detection (can be enhanced)
+        if context_tags is None:
+            context_tags = set(self.tag_message(" ".join(recent_user_messages)))
+        detected_emotions = [
+            emotion for emotion in CONTEXT_EMOTION_KEYWORDS
+            if f"context.emotion.{emotion}" in context_tags
+        ]
+        cognitive_patterns = [
+            pattern for pattern in CONTEXT_PATTERN_KEYWORDS
+            if f"context.pattern.{pattern}" in context_tags
+        ]
         
         return PromptContext(
             user_message=recent_user_messages[-1] if recent_user_messages else "",
@@ -1,25 +1,78 @@
-from typing import Dict, List, Any, Optional
-from langchain_openai import ChatOpenAI
+from typing import Dict, List, Any, Optional, AsyncIterator
+import asyncio
 from langchain_core.messages import HumanMessage, SystemMessage
 from config.settings import settings
 from core.utils.logger import logger
 from knowledge.embeddings.embedder import Embedder
 from knowledge.vector_store.store import VectorStore
 from core.memory.memory_manager import MemoryManager
+from core.memory.long_term import LongTermMemory
 from core.prompt_manager.prompt_builder import PromptBuilder, PromptContext
 from core.constraint_validator.validator import ConstraintValidator
+from core.constraint_validator.incremental import IncrementalConstraintChecker
 from core.reflection_engine.questioning_strategies import QuestioningStrategies, QuestionStrategy
+from core.reflection_engine.llm_client import ChatCompletionsClient
+from core.lexicon.registry import lexicon, LexiconMatch
+
+
+# Keyword groups used by message analysis, registered with the shared lexicon below
+EMOTION_KEYWORDS = {
+    "confusion": ["confused", "unclear", "don't know", "unsure", "puzzled"],
+    "frustration": ["frustrated", "stuck", "annoyed", "difficult", "hard"],
+    "curiosity": ["curious", "interested", "wonder", "explore", "want to know"],
+    "uncertainty": ["uncertain", "maybe", "perhaps", "not sure", "might"],
+    "reflection": ["think", "feel", "believe", "consider", "reflect"],
+    "hope": ["hope", "wish", "optimistic", "looking forward"],
+    "anxiety": ["worried", "anxious", "concerned", "nervous"]
+}
+
+COGNITIVE_PATTERN_KEYWORDS = {
+    "pattern_recognition": ["pattern", "always", "never", "every time"],
+    "obligation_thinking": ["should", "must", "need to", "have to"],
+    "hypothetical_thinking": ["if only", "wish", "hope", "what if"],
+    "all_or_nothing": ["always", "never", "perfect", "failure"],
+    "overgeneralization": ["always", "never", "everyone", "no one"],
+    "catastrophizing": ["terrible", "awful", "disaster", "worst"]
+}
+
+# Ordered by classification priority
+MESSAGE_TYPE_KEYWORDS = {
+    "seeking_advice": ["help", "advice", "should", "recommend"],
+    "seeking_clarity": ["confused", "unclear", "don't understand"],
+    "emotional_exploration": ["feel", "feeling", "emotion"],
+    "cognitive_exploration": ["think", "believe", "opinion"],
+    "direct_question": ["?"]
+}
+
+SENTIMENT_KEYWORDS = {
+    "positive": ["good", "great", "happy", "excited", "hopeful", "optimistic"],
+    "negative": ["bad", "terrible", "sad", "angry", "frustrated", "worried"]
+}
+
+lexicon.register_groups("analysis.emotion", EMOTION_KEYWORDS)
+lexicon.register_groups("analysis.pattern", COGNITIVE_PATTERN_KEYWORDS)
+lexicon.register_groups("analysis.type", MESSAGE_TYPE_KEYWORDS)
+lexicon.register_groups("analysis.sentiment", SENTIMENT_KEYWORDS)
 
 
 class ReflectionEngine:
     """Core reflection generation engine for LUCID"""
     
-    def __init__(self):
+    def __init__(self, memory_manager: Optional[MemoryManager] = None,
+                 long_term_memory: Optional[LongTermMemory] = None):
         self.llm = None
         self.prompt_builder = PromptBuilder()
         self.constraint_validator = ConstraintValidator()
         self.vector_store = VectorStore()
-        self.memory_manager = MemoryManager()
+        # The single source of session state; ChatService reads and writes the same instance
+        self.memory_manager = memory_manager or MemoryManager(
+            max_conversation_length=settings.max_conversation_length,
+            session_timeout_minutes=settings.session_timeout_minutes
+        )
+        if self.memory_manager.analyzer is None:
+            self.memory_manager.analyzer = self._analyze_for_memory
+        # Shares the knowledge embedder, so a message's query embedding is computed once
+        self.long_term_memory = long_term_memory or self._create_long_term_memory()
         self.questioning_strategies = QuestioningStrategies()
         
         # Initialize LLM
@@ -33,6 +86,23 @@ class ReflectionEngine:
     def _initialize_llm(self):
         """Initialize the language model"""
         try:
+            if settings.llm_client == "http":
+                self.llm = ChatCompletionsClient(
+                    api_key=settings.openai_api_key,
+                    model=settings.openai_model,
+                    base_url=settings.openai_base_url,
+                    temperature=settings.openai_temperature,
+                    max_tokens=settings.openai_max_tokens,
+                    pool_size=settings.llm_pool_size,
+                    connect_timeout_seconds=settings.llm_connect_timeout_seconds,
+                    timeout_seconds=settings.llm_timeout_seconds
+                )
+                logger.info(f"LLM initialized: {settings.openai_model} via {settings.openai_base_url}")
+                return
+            
+            # Imported here so the OpenAI SDK loads during service start-up, not module import
+            from langchain_openai import ChatOpenAI
+            
             self.llm = ChatOpenAI(
                 model=settings.openai_model,
                 temperature=settings.openai_temperature,
@@ -45,39 +115,57 @@ class ReflectionEngine:
             logger.error(f"Failed to initialize LLM: {e}")
             self.llm = None
     
+    def llm_stats(self) -> Dict[str, Any]:
+        """Per-call latency of the LLM client, when it keeps any"""
+        return self.llm.stats() if isinstance(self.llm, ChatCompletionsClient) else {}
+    
+    async def aclose(self):
+        """Release the LLM client's pooled connections"""
+        if isinstance(self.llm, ChatCompletionsClient):
+            await self.llm.aclose()
+    
+    def _create_long_term_memory(self) -> Optional[LongTermMemory]:
+        """Per-user memory across sessions, if enabled in settings"""
+        if not settings.long_term_memory_enabled:
+            return None
+        return LongTermMemory(
+            self.vector_store.embedder,
+            settings.long_term_memory_path,
+            top_k=settings.long_term_memory_top_k,
+            min_score=settings.long_term_memory_min_score,
+            budget_ms=settings.long_term_memory_budget_ms,
+            flush_interval_seconds=settings.long_term_memory_flush_interval_seconds,
+            batch_size=settings.long_term_memory_batch_size,
+            max_pending=settings.long_term_memory_max_pending,
+            max_open_partitions=settings.long_term_memory_max_open_partitions,
+            min_words=settings.long_term_memory_min_words
+        )
+    
     def _initialize_knowledge_base(self):
         """Initialize vector store with sample knowledge"""
         try:
-            # Check if store is empty by attempting a search
-            test_docs = self.vector_store.similarity_search("test", k=1)
-            if not test_docs:
+            # Count documents instead of running a search, which would need an embedding call
+            if self.vector_store.document_count() == 0:
                 logger.info("Initializing empty vector store with sample data")
                 self.vector_store.initialize_sample_data()
         except Exception as e:
             logger.warning(f"Could not check vector store status: {e}")
     
-    def generate_reflection(self, session_id: str, user_message: str) -> Dict[str, Any]:
+    def generate_reflection(self, session_id: str, user_message: str, user_id: Optional[str] = None) -> Dict[str, Any]:
         """Generate a reflective response"""
         try:
             # Validate input
             input_validation = self.constraint_validator.validate_input(user_message)
             if not input_validation.is_valid:
-                return {
-                    "success": False,
-                    "error": "Invalid input",
-                    "violations": input_validation.violations
-                }
+                return self._invalid_input_result(input_validation)
             
-            # Get conversation context
-            conversation_context = self.memory_manager.get_conversation_context(session_id)
+            prompt_context = self._build_prompt_context(session_id, user_message)
             
-            # Extract metadata for prompt building
-            prompt_context = self.prompt_builder.extract_metadata_for_context(conversation_context)
-            prompt_context.user_message = user_message
-            
-            # Retrieve philosophical context
-            philosophical_context = self.vector_store.get_relevant_context(user_message)
-            prompt_context.philosophical_context = philosophical_context
+            # Retrieve philosophical context and the user's related past messages
+            prompt_context.philosophical_context, context_cache_hit = \
+                self.vector_store.lookup_relevant_context(user_message)
+            if self.long_term_memory:
+                prompt_context.long_term_memories = self.long_term_memory.recall(user_id, user_message, session_id)
             
             # Generate reflection
             if settings.test_mode:
@@ -85,56 +173,207 @@ class ReflectionEngine:
             else:
                 response = self._generate_llm_reflection(prompt_context)
             
-            # Validate output
-            output_validation = self.constraint_validator.validate_output(response)
+            return self._finalize_reflection(session_id, user_message, response, prompt_context,
+                                             context_cache_hit=context_cache_hit, user_id=user_id)
             
-            # If validation fails, try fallback
-            if not output_validation.is_valid:
-                logger.warning(f"LLM response failed validation: {output_validation.violations}")
-                response = self._generate_fallback_reflection(prompt_context)
-                # Re-validate fallback
-                output_validation = self.constraint_validator.validate_output(response)
+        except Exception as e:
+            logger.error(f"Error generating reflection: {e}")
+            return self._failure_result(e)
+    
+    async def agenerate_reflection(self, session_id: str, user_message: str,
+                                   user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Generate a reflective response without blocking the event loop
+        
+        Retrieval and the LLM call are awaited; the remaining stages are short
+        CPU-only steps (keyword scans, prompt assembly, validation) that run inline.
+        """
+        try:
+            input_validation = self.constraint_validator.validate_input(user_message)
+            if not input_validation.is_valid:
+                return self._invalid_input_result(input_validation)
             
-            # Store interaction in memory
-            self.memory_manager.add_message(session_id, user_message, is_user=True)
-            self.memory_manager.add_message(session_id, response, is_user=False, 
-                                          metadata={"validation": output_validation.__dict__})
+            prompt_context = self._build_prompt_context(session_id, user_message)
+            context_cache_hit = await self._aretrieve(prompt_context, session_id, user_id)
             
-            return {
-                "success": True,
-                "response": response,
-                "validation": output_validation.__dict__,
-                "session_id": session_id,
-                "metadata": {
-                    "strategy": self.questioning_strategies.select_strategy(prompt_context.__dict__).value,
-                    "philosophical_context_used": bool(philosophical_context),
-                    "test_mode": settings.test_mode
-                }
-            }
+            if settings.test_mode:
+                response = self._generate_test_reflection(prompt_context)
+            else:
+                response = await self._agenerate_llm_reflection(prompt_context)
+            
+            return self._finalize_reflection(session_id, user_message, response, prompt_context,
+                                             context_cache_hit=context_cache_hit, user_id=user_id)
             
         except Exception as e:
             logger.error(f"Error generating reflection: {e}")
-            return {
-                "success": False,
-                "error": "Reflection generation failed",
-                "details": str(e)
+            return self._failure_result(e)
+    
+    async def astream_reflection(self, session_id: str, user_message: str,
+                                 user_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a reflective response as events
+        
+        Yields ``token`` events while the LLM generates, checking constraints on the
+        growing buffer. As soon as a violation is certain the upstream generation is
+        closed, a ``reset`` event is sent and the strategy fallback is streamed instead.
+        The final ``done`` event carries the same payload as agenerate_reflection.
+        """
+        try:
+            input_validation = self.constraint_validator.validate_input(user_message)
+            if not input_validation.is_valid:
+                yield {"event": "error", "data": self._invalid_input_result(input_validation)}
+                return
+            
+            prompt_context = self._build_prompt_context(session_id, user_message)
+            context_cache_hit = await self._aretrieve(prompt_context, session_id, user_id)
+            
+            streamed = ""
+            aborted = False
+            if settings.test_mode:
+                streamed = self._generate_test_reflection(prompt_context)
+                yield {"event": "token", "data": streamed}
+            else:
+                if not self.llm:
+                    raise Exception("LLM not initialized")
+                
+                checker = IncrementalConstraintChecker()
+                stream = self.llm.astream(self._build_llm_messages(prompt_context))
+                try:
+                    async for chunk in stream:
+                        if not chunk.content:
+                            continue
+                        if checker.feed(chunk.content):
+                            aborted = True
+                            break
+                        streamed += chunk.content
+                        yield {"event": "token", "data": chunk.content}
+                finally:
+                    # Closing the generator cancels the upstream HTTP request
+                    await stream.aclose()
+                
+                if aborted:
+                    logger.warning(f"Streaming aborted on constraint violation: {checker.violations}")
+                    streamed = self._generate_fallback_reflection(prompt_context)
+                    yield {"event": "reset", "data": {"violations": checker.violations}}
+                    yield {"event": "token", "data": streamed}
+            
+            result = self._finalize_reflection(session_id, user_message, streamed.strip(), prompt_context,
+                                               context_cache_hit=context_cache_hit, user_id=user_id)
+            if result["response"] != streamed.strip():
+                # Final validation replaced the streamed text with a fallback
+                yield {"event": "reset", "data": {"violations": []}}
+                yield {"event": "token", "data": result["response"]}
+            
+            result["metadata"]["stream_aborted"] = aborted
+            yield {"event": "done", "data": result}
+            
+        except Exception as e:
+            logger.error(f"Error streaming reflection: {e}")
+            yield {"event": "error", "data": self._failure_result(e)}
+    
+    def _build_prompt_context(self, session_id: str, user_message: str) -> PromptContext:
+        """Build prompt context from the session's conversation history"""
+        conversation_context, context_tags = self.memory_manager.get_context_with_tags(session_id)
+        
+        prompt_context = self.prompt_builder.extract_metadata_for_context(conversation_context, context_tags)
+        prompt_context.user_message = user_message
+        return prompt_context
+    
+    async def _aretrieve(self, prompt_context: PromptContext, session_id: str, user_id: Optional[str]) -> bool:
+        """Fill in knowledge context and long-term memories concurrently; returns context_cache_hit"""
+        user_message = prompt_context.user_message
+        if not self.long_term_memory or not user_id:
+            prompt_context.philosophical_context, context_cache_hit = \
+                await self.vector_store.alookup_relevant_context(user_message)
+            return context_cache_hit
+        
+        # Embed the message once for both lookups, so recall's time budget only covers its search
+        try:
+            embedding = await self.vector_store.embedder.aembed_query(user_message)
+        except Exception as e:
+            logger.error(f"Failed to embed message for retrieval: {e}")
+            prompt_context.philosophical_context, context_cache_hit = \
+                await self.vector_store.alookup_relevant_context(user_message)
+            return context_cache_hit
+        
+        (prompt_context.philosophical_context, context_cache_hit), prompt_context.long_term_memories = \
+            await asyncio.gather(
+                self.vector_store.alookup_relevant_context(user_message, embedding=embedding),
+                self.long_term_memory.arecall(user_id, user_message, session_id, embedding=embedding)
+            )
+        return context_cache_hit
+    
+    def _finalize_reflection(self, session_id: str, user_message: str, response: str,
+                             prompt_context: PromptContext, context_cache_hit: bool = False,
+                             user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Validate the generated response, fall back if needed and store the exchange"""
+        output_validation = self.constraint_validator.validate_output(response)
+        
+        # If validation fails, try fallback
+        if not output_validation.is_valid:
+            logger.warning(f"LLM response failed validation: {output_validation.violations}")
+            response = self._generate_fallback_reflection(prompt_context)
+            # Re-validate fallback
+            output_validation = self.constraint_validator.validate_output(response)
+        
+        # Store interaction in memory
+        self.memory_manager.add_messages(session_id, [
+            (user_message, True, None),
+            (response, False, {"validation": output_validation.__dict__})
+        ])
+        if self.long_term_memory:
+            self.long_term_memory.remember(user_id, session_id, user_message)
+        
+        return {
+            "success": True,
+            "response": response,
+            "validation": output_validation.__dict__,
+            "session_id": session_id,
+            "metadata": {
+                "strategy": self.questioning_strategies.select_strategy(prompt_context.__dict__).value,
+                "philosophical_context_used": bool(prompt_context.philosophical_context),
+                "context_cache_hit": context_cache_hit,
+                "long_term_memories_used": len(prompt_context.long_term_memories),
+                "test_mode": settings.test_mode
             }
+        }
+    
+    def _invalid_input_result(self, input_validation) -> Dict[str, Any]:
+        """Result returned when the user message fails input validation"""
+        return {
+            "success": False,
+            "error": "Invalid input",
+            "violations": input_validation.violations
+        }
+    
+    def _failure_result(self, error: Exception) -> Dict[str, Any]:
+        """Result returned when reflection generation raises"""
+        return {
+            "success": False,
+            "error": "Reflection generation failed",
+            "details": str(error)
+        }
+    
+    def _build_llm_messages(self, context: PromptContext) -> List[Any]:
+        """Build chat messages for the LLM call"""
+        prompt = self.prompt_builder.build_reflection_prompt(context)
+        return [
+            SystemMessage(content=prompt),
+            HumanMessage(content=f"User message: {context.user_message}")
+        ]
     
     def _generate_llm_reflection(self, context: PromptContext) -> str:
         """Generate reflection using LLM"""
         if not self.llm:
             raise Exception("LLM not initialized")
         
-        # Build prompt
-        prompt = self.prompt_builder.build_reflection_prompt(context)
-        
-        # Generate response
-        messages = [
-            SystemMessage(content=prompt),
-            HumanMessage(content=f"User message: {context.user_message}")
-        ]
+        response = self.llm.invoke(self._build_llm_messages(context))
+        return response.content.strip()
+    
+    async def _agenerate_llm_reflection(self, context: PromptContext) -> str:
+        """Generate reflection using the LLM's async API"""
+        if not self.llm:
+            raise Exception("LLM not initialized")
         
-        response = self.llm(messages)
+        response = await self.llm.ainvoke(self._build_llm_messages(context))
         return response.content.strip()
     
     def _generate_test_reflection(self, context: PromptContext) -> str:
@@ -156,85 +395,45 @@ class ReflectionEngine:
     def analyze_message(self, message: str) -> Dict[str, Any]:
         """Analyze user message for metadata"""
         # Simple analysis - can be enhanced with more sophisticated NLP
-        emotions = self._detect_emotions(message)
-        cognitive_patterns = self._detect_cognitive_patterns(message)
-        question_type = self._classify_message(message)
+        match = lexicon.scan(message)
+        emotions = self._detect_emotions(match)
+        cognitive_patterns = self._detect_cognitive_patterns(match)
+        question_type = self._classify_message(match)
         
         return {
             "emotions": emotions,
             "cognitive_patterns": cognitive_patterns,
             "question_type": question_type,
             "complexity": len(message.split()),
-            "sentiment": self._analyze_sentiment(message)
+            "sentiment": self._analyze_sentiment(match)
         }
     
-    def _detect_emotions(self, message: str) -> List[str]:
+    def _analyze_for_memory(self, message: str) -> Dict[str, Any]:
+        """Ingest-time analysis stored with each user message"""
+        analysis = self.analyze_message(message)
+        analysis["context_tags"] = self.prompt_builder.tag_message(message)
+        return analysis
+    
+    def _detect_emotions(self, match: LexiconMatch) -> List[str]:
         """Detect emotional indicators in message"""
-        emotion_keywords = {
-            "confusion": ["confused", "unclear", "don't know", "unsure", "puzzled"],
-            "frustration": ["frustrated", "stuck", "annoyed", "difficult", "hard"],
-            "curiosity": ["curious", "interested", "wonder", "explore", "want to know"],
-            "uncertainty": ["uncertain", "maybe", "perhaps", "not sure", "might"],
-            "reflection": ["think", "feel", "believe", "consider", "reflect"],
-            "hope": ["hope", "wish", "optimistic", "looking forward"],
-            "anxiety": ["worried", "anxious", "concerned", "nervous"]
-        }
-        
-        detected = []
-        message_lower = message.lower()
-        
-        for emotion, keywords in emotion_keywords.items():
-            if any(keyword in message_lower for keyword in keywords):
-                detected.append(emotion)
-        
-        return detected
+        return [emotion for emotion in EMOTION_KEYWORDS if match.has(f"analysis.emotion.{emotion}")]
     
-    def _detect_cognitive_patterns(self, message: str) -> List[str]:
+    def _detect_cognitive_patterns(self, match: LexiconMatch) -> List[str]:
         """Detect cognitive patterns in message"""
-        patterns = {
-            "pattern_recognition": ["pattern", "always", "never", "every time"],
-            "obligation_thinking": ["should", "must", "need to", "have to"],
-            "hypothetical_thinking": ["if only", "wish", "hope", "what if"],
-            "all_or_nothing": ["always", "never", "perfect", "failure"],
-            "overgeneralization": ["always", "never", "everyone", "no one"],
-            "catastrophizing": ["terrible", "awful", "disaster", "worst"]
-        }
-        
-        detected = []
-        message_lower = message.lower()
-        
-        for pattern, keywords in patterns.items():
-            if any(keyword in message_lower for keyword in keywords):
-                detected.append(pattern)
-        
-        return detected
+        return [pattern for pattern in COGNITIVE_PATTERN_KEYWORDS if match.has(f"analysis.pattern.{pattern}")]
     
-    def _classify_message(self, message: str) -> str:
+    def _classify_message(self, match: LexiconMatch) -> str:
         """Classify the type of user message"""
-        message_lower = message.lower()
-        
-        if any(word in message_lower for word in ["help", "advice", "should", "recommend"]):
-            return "seeking_advice"
-        elif any(word in message_lower for word in ["confused", "unclear", "don't understand"]):
-            return "seeking_clarity"
-        elif any(word in message_lower for word in ["feel", "feeling", "emotion"]):
-            return "emotional_exploration"
-        elif any(word in message_lower for word in ["think", "believe", "opinion"]):
-            return "cognitive_exploration"
-        elif "?" in message:
-            return "direct_question"
-        else:
-            return "general_reflection"
+        # Message types are checked in priority order
+        for message_type in MESSAGE_TYPE_KEYWORDS:
+            if match.has(f"analysis.type.{message_type}"):
+                return message_type
+        return "general_reflection"
     
-    def _analyze_sentiment(self, message: str) -> str:
+    def _analyze_sentiment(self, match: LexiconMatch) -> str:
         """Simple sentiment analysis"""
-        positive_words = ["good", "great", "happy", "excited", "hopeful", "optimistic"]
-        negative_words = ["bad", "terrible", "sad", "angry", "frustrated", "worried"]
-        
-        message_lower = message.lower()
-        
-        positive_count = sum(1 for word in positive_words if word in message_lower)
-        negative_count = sum(1 for word in negative_words if word in message_lower)
+        positive_count = match.count("analysis.sentiment.positive")
+        negative_count = match.count("analysis.sentiment.negative")
         
         if positive_count > negative_count:
             return "positive"
@@ -249,24 +448,15 @@ class ReflectionEngine:
         if not session_data:
             return None
         
-        messages = session_data["messages"]
-        user_messages = [msg for msg in messages if msg["is_user"]]
-        
-        # Analyze patterns across conversation
-        all_emotions = []
-        all_patterns = []
-        
-        for msg in user_messages:
-            analysis = self.analyze_message(msg["text"])
-            all_emotions.extend(analysis["emotions"])
-            all_patterns.extend(analysis["cognitive_patterns"])
+        # Patterns across the conversation come from the ingest-time aggregates
+        stats = self.memory_manager.get_session_stats(session_id)
         
         return {
             "session_id": session_id,
-            "message_count": len(messages),
-            "user_message_count": len(user_messages),
+            "message_count": stats.message_count,
+            "user_message_count": stats.user_message_count,
             "duration_minutes": (session_data["last_activity"], session_data["created_at"]),
-            "common_emotions": list(set(all_emotions)),
-            "common_patterns": list(set(all_patterns)),
+            "common_emotions": list(stats.emotion_counts),
+            "common_patterns": list(stats.pattern_counts),
             "session_data": session_data
         }
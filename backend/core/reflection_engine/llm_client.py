@@ -0,0 +1,151 @@
+from typing import Any, AsyncIterator, Dict, List, Optional
+import json
+import time
+import httpx
+from core.utils.logger import logger
+
+
+# LangChain message types to chat-completions roles
+_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+class ChatCompletion:
+    """Text of a completion, with the same ``content`` attribute as a LangChain message"""
+    
+    __slots__ = ("content", "latency_ms", "usage")
+    
+    def __init__(self, content: str, latency_ms: float = 0.0, usage: Optional[Dict[str, Any]] = None):
+        self.content = content
+        self.latency_ms = latency_ms
+        self.usage = usage
+
+
+class ChatCompletionsClient:
+    """Minimal client for OpenAI-compatible ``/chat/completions`` endpoints
+
+    A drop-in for the ``invoke``/``ainvoke``/``astream`` calls the reflection
+    engine makes on ChatOpenAI. Messages may be LangChain messages or
+    ``{"role", "content"}`` dicts. Requests go through one sync and one async
+    httpx client, each with a pool of ``pool_size`` keep-alive connections,
+    so calls skip LangChain's per-call callback and message object churn and
+    reuse warm connections. Per-call latency is kept for ``stats``.
+    """
+    
+    def __init__(self, api_key: str, model: str, base_url: str = "https://api.openai.com/v1",
+                 temperature: float = 0.6, max_tokens: Optional[int] = None, pool_size: int = 20,
+                 connect_timeout_seconds: float = 5.0, timeout_seconds: float = 30.0):
+        if not api_key:
+            raise ValueError("An API key is required")
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        headers = {"Authorization": f"Bearer {api_key}"}
+        timeout = httpx.Timeout(timeout_seconds, connect=connect_timeout_seconds)
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self._client = httpx.Client(headers=headers, timeout=timeout, limits=limits)
+        self._aclient = httpx.AsyncClient(headers=headers, timeout=timeout, limits=limits)
+        
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.streams = 0
+        self.first_token_ms_total = 0.0
+    
+    def _payload(self, messages: List[Any], stream: bool = False) -> Dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "messages": [_message_dict(message) for message in messages],
+            "temperature": self.temperature
+        }
+        if self.max_tokens:
+            payload["max_tokens"] = self.max_tokens
+        if stream:
+            payload["stream"] = True
+        return payload
+    
+    def _record(self, started: float, failed: bool = False) -> float:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.calls += 1
+        self.errors += failed
+        self.total_ms += elapsed_ms
+        self.last_ms = elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        return elapsed_ms
+    
+    def _completion(self, response: httpx.Response, started: float) -> ChatCompletion:
+        response.raise_for_status()
+        data = response.json()
+        content = data["choices"][0]["message"].get("content") or ""
+        return ChatCompletion(content, self._record(started), data.get("usage"))
+    
+    def invoke(self, messages: List[Any]) -> ChatCompletion:
+        started = time.perf_counter()
+        try:
+            return self._completion(self._client.post(self.url, json=self._payload(messages)), started)
+        except Exception:
+            self._record(started, failed=True)
+            raise
+    
+    async def ainvoke(self, messages: List[Any]) -> ChatCompletion:
+        started = time.perf_counter()
+        try:
+            return self._completion(await self._aclient.post(self.url, json=self._payload(messages)), started)
+        except Exception:
+            self._record(started, failed=True)
+            raise
+    
+    async def astream(self, messages: List[Any]) -> AsyncIterator[ChatCompletion]:
+        """Yield completion deltas as they arrive; closing the generator closes the request"""
+        started = time.perf_counter()
+        first_token = True
+        failed = True
+        try:
+            async with self._aclient.stream("POST", self.url, json=self._payload(messages, stream=True)) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices")
+                    content = choices[0].get("delta", {}).get("content") if choices else None
+                    if not content:
+                        continue
+                    if first_token:
+                        first_token = False
+                        self.streams += 1
+                        self.first_token_ms_total += (time.perf_counter() - started) * 1000
+                    yield ChatCompletion(content)
+            failed = False
+        except GeneratorExit:
+            # Closed early by the caller, e.g. on a constraint violation
+            failed = False
+            raise
+        finally:
+            self._record(started, failed=failed)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "calls": self.calls,
+            "errors": self.errors,
+            "mean_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "last_ms": round(self.last_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+            "mean_first_token_ms": round(self.first_token_ms_total / self.streams, 3) if self.streams else 0.0
+        }
+    
+    async def aclose(self):
+        self._client.close()
+        await self._aclient.aclose()
+        logger.info("LLM client closed")
+
+
+def _message_dict(message: Any) -> Dict[str, str]:
+    if isinstance(message, dict):
+        return message
+    return {"role": _ROLES.get(message.type, message.type), "content": message.content}
@@ -0,0 +1,42 @@
+from typing import Dict, List, Tuple
+import time
+from core.utils.logger import logger
+
+
+class StartupTimer:
+    """Records the duration of consecutive start-up phases
+
+    Each ``mark`` closes the phase that began at the previous mark (or when the
+    timer was created), so importing this module first makes the first phase
+    cover the application's own imports.
+    """
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases: List[Tuple[str, float]] = []
+    
+    def mark(self, phase: str) -> float:
+        """End the current phase under the given name; returns its duration in seconds"""
+        now = time.perf_counter()
+        duration = now - self._last
+        self._last = now
+        self.phases.append((phase, duration))
+        return duration
+    
+    def report(self) -> Dict[str, float]:
+        """Phase durations in milliseconds, in order, plus the total"""
+        report = {phase: round(duration * 1000, 1) for phase, duration in self.phases}
+        report["total"] = round((self._last - self.started) * 1000, 1)
+        return report
+    
+    def log_report(self):
+        """Log a per-phase breakdown"""
+        report = self.report()
+        width = max(len(phase) for phase in report)
+        lines = [f"  {phase.ljust(width)}  {ms:>9.1f} ms" for phase, ms in report.items()]
+        logger.info("Startup timing:\n" + "\n".join(lines))
+
+
+# Global timer started when the application first imports this module
+startup_timer = StartupTimer()
@@ -0,0 +1,89 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Any
+import asyncio
+from core.utils.logger import logger
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embedding requests into batched calls
+
+    Requests arriving within ``window_ms`` of the first pending one (or until
+    ``max_batch_size`` distinct texts are pending) are deduplicated and sent as
+    one ``embed_batch`` call; each caller then receives its own vector. A batcher
+    belongs to the event loop it was first used on.
+    """
+    
+    def __init__(self, embed_batch: Callable[[List[str]], Awaitable[List[List[float]]]],
+                 window_ms: float = 5.0, max_batch_size: int = 64):
+        self.embed_batch = embed_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        
+        self.requests = 0
+        self.batches = 0
+        self.batched_texts = 0
+    
+    async def embed(self, text: str) -> List[float]:
+        """Embed one text, sharing the upstream call with concurrent requests"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(text, []).append(future)
+        self.requests += 1
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        
+        return await future
+    
+    def _flush(self):
+        """Send everything pending as one batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        
+        batch, self._pending = self._pending, {}
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+    
+    async def _run(self, batch: Dict[str, List[asyncio.Future]]):
+        texts = list(batch)
+        self.batches += 1
+        self.batched_texts += len(texts)
+        
+        try:
+            vectors = await self.embed_batch(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"Embedding backend returned {len(vectors)} vectors for {len(texts)} texts")
+            for text, vector in zip(texts, vectors):
+                for future in batch[text]:
+                    if not future.done():
+                        future.set_result(vector)
+        except Exception as e:
+            logger.error(f"Batched embedding of {len(texts)} texts failed: {e}")
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+        finally:
+            # Cancelled, e.g. with its event loop: callers still waiting must not hang
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.cancel()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Request and batch counters"""
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "batched_texts": self.batched_texts,
+            "average_batch_size": self.batched_texts / self.batches if self.batches else 0.0
+        }
@@ -0,0 +1,232 @@
+from typing import List, Optional, Dict, Any, Sequence
+from collections import OrderedDict
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from core.utils.logger import logger
+
+
+class EmbeddingCache:
+    """Two-level cache of embedding vectors keyed on (model, normalized text hash)
+
+    Level one is an in-memory LRU bounded by a byte budget; level two is a SQLite
+    file that survives restarts. Vectors are stored as float32 in both levels.
+    The model name is part of the key, so switching embedding models never
+    returns vectors from the previous one.
+    """
+    
+    def __init__(self, model_name: str, max_bytes: int = 64 * 1024 * 1024,
+                 path: Optional[str] = None, max_disk_entries: int = 100_000):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_inserts = 0
+        
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize unicode form and whitespace so trivially different inputs share a key"""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+    
+    def key(self, text: str) -> str:
+        """Cache key for a text under this cache's model"""
+        payload = f"{self.model_name}\0{self.normalize(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+    
+    def get(self, text: str) -> Optional[List[float]]:
+        """Look up a vector, promoting disk hits into memory"""
+        return self.get_many([text])[0]
+    
+    def put(self, text: str, vector: Sequence[float]) -> List[float]:
+        """Store a vector in both levels, returning it as stored (float32 precision)"""
+        return self.put_many([text], [vector])[0]
+    
+    def get_many(self, texts: List[str], include_disk: bool = True) -> List[Optional[List[float]]]:
+        """Look up several vectors; missing entries are None
+        
+        With ``include_disk=False`` only the memory level is consulted (no I/O),
+        and misses are not counted so a follow-up full lookup can count them.
+        """
+        keys = [self.key(text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        missing = []
+        
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    results[i] = vector.tolist()
+                else:
+                    missing.append(i)
+        
+        if missing and include_disk:
+            found = self._disk_get([keys[i] for i in missing])
+            with self._lock:
+                for i in missing:
+                    vector = found.get(keys[i])
+                    if vector is not None:
+                        self.disk_hits += 1
+                        self._memory_put(keys[i], vector)
+                        results[i] = vector.tolist()
+                    else:
+                        self.misses += 1
+        
+        return results
+    
+    def put_many(self, texts: List[str], vectors: Sequence[Sequence[float]]) -> List[List[float]]:
+        """Store several vectors in both levels, returning them as stored (float32 precision)"""
+        entries = [
+            (self.key(text), np.asarray(vector, dtype=np.float32))
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            for key, vector in entries:
+                self._memory_put(key, vector)
+        self._disk_put(entries)
+        return [vector.tolist() for _, vector in entries]
+    
+    def _memory_put(self, key: str, vector: np.ndarray):
+        """Insert into the LRU level, evicting least recently used entries over budget"""
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.nbytes
+        self._memory[key] = vector
+        self._memory_bytes += vector.nbytes
+        
+        while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+            self.evictions += 1
+    
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """Open the on-disk level lazily"""
+        if self._db is None and self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+    
+    def _disk_get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Read vectors for the given keys from disk"""
+        try:
+            with self._disk_lock:
+                db = self._connection()
+                if db is None:
+                    return {}
+                placeholders = ",".join("?" * len(keys))
+                rows = db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys
+                ).fetchall()
+            return {key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows}
+        except Exception as e:
+            logger.warning(f"Embedding cache disk read failed: {e}")
+            return {}
+    
+    def _disk_put(self, entries: List[tuple]):
+        """Write vectors to disk, pruning the oldest rows past the entry limit"""
+        try:
+            with self._disk_lock:
+                db = self._connection()
+                if db is None:
+                    return
+                db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                    [(key, self.model_name, vector.tobytes()) for key, vector in entries]
+                )
+                self._disk_inserts += len(entries)
+                if self._disk_inserts >= 1000:
+                    self._disk_inserts = 0
+                    db.execute(
+                        "DELETE FROM embeddings WHERE rowid <= "
+                        "(SELECT MAX(rowid) FROM embeddings) - ?", (self.max_disk_entries,)
+                    )
+                db.commit()
+        except Exception as e:
+            logger.warning(f"Embedding cache disk write failed: {e}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and memory usage"""
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "memory_hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that consults an EmbeddingCache before calling the model"""
+    
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+    
+    def embed_query(self, text: str) -> List[float]:
+        cached = self.cache.get(text)
+        if cached is not None:
+            return cached
+        return self.cache.put(text, self.embeddings.embed_query(text))
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        results = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(results) if vector is None]
+        if missing:
+            vectors = self.embeddings.embed_documents([texts[i] for i in missing])
+            vectors = self.cache.put_many([texts[i] for i in missing], vectors)
+            for i, vector in zip(missing, vectors):
+                results[i] = vector
+        return results
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        async def embed_missing(missing_texts: List[str]) -> List[List[float]]:
+            return [await self.embeddings.aembed_query(missing_texts[0])]
+        return (await self._aembed([text], embed_missing))[0]
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._aembed(texts, self.embeddings.aembed_documents)
+    
+    async def _aembed(self, texts: List[str], embed_missing) -> List[List[float]]:
+        # Memory hits are served inline; disk lookups and writes run in a worker thread
+        results = self.cache.get_many(texts, include_disk=False)
+        pending = [i for i, vector in enumerate(results) if vector is None]
+        if pending:
+            found = await asyncio.to_thread(self.cache.get_many, [texts[i] for i in pending])
+            for i, vector in zip(pending, found):
+                results[i] = vector
+        missing = [i for i, vector in enumerate(results) if vector is None]
+        if missing:
+            vectors = await embed_missing([texts[i] for i in missing])
+            vectors = await asyncio.to_thread(self.cache.put_many, [texts[i] for i in missing], vectors)
+            for i, vector in zip(missing, vectors):
+                results[i] = vector
+        return results
@@ -1,9 +1,11 @@
-from typing import List, Optional
-import numpy as np
-from langchain_openai import OpenAIEmbeddings
+from typing import List, Optional, Dict, Any
+import asyncio
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from config.settings import settings
 from core.utils.logger import logger
+from knowledge.embeddings.cache import EmbeddingCache, CachedEmbeddings
+from knowledge.embeddings.batcher import EmbeddingBatcher
 
 
 class Embedder:
@@ -12,6 +14,16 @@ class Embedder:
     def __init__(self, model_name: Optional[str] = None):
         self.model_name = model_name or settings.embedding_model
         self._embeddings = None
+        self.cache: Optional[EmbeddingCache] = None
+        if settings.embedding_cache_enabled:
+            self.cache = EmbeddingCache(
+                model_name=self.model_name,
+                max_bytes=settings.embedding_cache_max_bytes,
+                path=settings.embedding_cache_path,
+                max_disk_entries=settings.embedding_cache_max_disk_entries
+            )
+        self._batcher: Optional[EmbeddingBatcher] = None
+        self._batcher_loop = None
         logger.info(f"Embedder initialized with model: {self.model_name}")
     
     @property
@@ -19,10 +31,15 @@ class Embedder:
         """Lazy initialization of embeddings"""
         if self._embeddings is None:
             try:
+                # Imported on first use: langchain_openai pulls in the whole OpenAI SDK
+                from langchain_openai import OpenAIEmbeddings
+                
                 self._embeddings = OpenAIEmbeddings(
                     model=self.model_name,
                     openai_api_key=settings.openai_api_key
                 )
+                if self.cache:
+                    self._embeddings = CachedEmbeddings(self._embeddings, self.cache)
                 logger.info("OpenAI embeddings initialized successfully")
             except Exception as e:
                 logger.error(f"Failed to initialize OpenAI embeddings: {e}")
@@ -48,13 +65,63 @@ class Embedder:
             logger.error(f"Failed to embed texts: {e}")
             return [[0.0] * 1536 for _ in texts]  # Default embedding dimension
     
+    async def aembed_text(self, text: str) -> List[float]:
+        """Embed a single text without blocking the event loop"""
+        try:
+            return await self.aembed_query(text)
+        except Exception as e:
+            logger.error(f"Failed to embed text: {e}")
+            return [0.0] * 1536  # Default embedding dimension
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a query text, coalescing concurrent requests into batched calls
+        
+        Unlike aembed_text, errors are raised to the caller.
+        """
+        if self.cache:
+            cached = self.cache.get_many([text], include_disk=False)[0]
+            if cached is not None:
+                return cached
+        
+        if not settings.embedding_batching_enabled:
+            return await self.embeddings.aembed_query(text)
+        return await self._get_batcher().embed(text)
+    
+    def _get_batcher(self) -> EmbeddingBatcher:
+        """Batcher bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._batcher is None or self._batcher_loop is not loop:
+            self._batcher = EmbeddingBatcher(
+                lambda texts: self.embeddings.aembed_documents(texts),
+                window_ms=settings.embedding_batch_window_ms,
+                max_batch_size=settings.embedding_batch_max_size
+            )
+            self._batcher_loop = loop
+        return self._batcher
+    
+    async def aembed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed multiple texts without blocking the event loop"""
+        try:
+            return await self.embeddings.aembed_documents(texts)
+        except Exception as e:
+            logger.error(f"Failed to embed texts: {e}")
+            return [[0.0] * 1536 for _ in texts]  # Default embedding dimension
+    
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Embedding cache counters, or None when caching is disabled"""
+        return self.cache.stats() if self.cache else None
+    
+    def batch_stats(self) -> Optional[Dict[str, Any]]:
+        """Request coalescing counters, or None before the first batched request"""
+        return self._batcher.stats() if self._batcher else None
+    
     def embed_documents(self, documents: List[Document]) -> List[List[float]]:
         """Embed documents with metadata"""
         texts = [doc.page_content for doc in documents]
         return self.embed_texts(texts)
 
 
-class DummyEmbeddings:
+class DummyEmbeddings(Embeddings):
     """Dummy embeddings for testing when OpenAI is unavailable"""
     
     def __init__(self, dimension: int = 1536):
@@ -0,0 +1,63 @@
+from typing import Iterator, List
+import re
+
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def chunk_text(text: str, max_chars: int) -> Iterator[str]:
+    """Split text into chunks of at most ``max_chars`` characters
+
+    Paragraphs are packed together while they fit; longer paragraphs are split
+    at sentence boundaries, and sentences that are still too long at word
+    boundaries. Whitespace inside a chunk is collapsed.
+    """
+    pieces: List[str] = []
+    size = 0
+    
+    for piece in _pieces(text, max_chars):
+        added = len(piece) + (1 if pieces else 0)
+        if pieces and size + added > max_chars:
+            yield " ".join(pieces)
+            pieces, size = [], 0
+            added = len(piece)
+        pieces.append(piece)
+        size += added
+    
+    if pieces:
+        yield " ".join(pieces)
+
+
+def _pieces(text: str, max_chars: int) -> Iterator[str]:
+    """Paragraphs, sentences or word runs, each no longer than max_chars"""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            yield paragraph
+            continue
+        
+        for sentence in SENTENCE_BOUNDARY.split(paragraph):
+            if len(sentence) <= max_chars:
+                yield sentence
+                continue
+            
+            words: List[str] = []
+            size = 0
+            for word in sentence.split(" "):
+                while len(word) > max_chars:
+                    if words:
+                        yield " ".join(words)
+                        words, size = [], 0
+                    yield word[:max_chars]
+                    word = word[max_chars:]
+                if not word:
+                    continue
+                if words and size + 1 + len(word) > max_chars:
+                    yield " ".join(words)
+                    words, size = [], 0
+                size += len(word) + (1 if words else 0)
+                words.append(word)
+            if words:
+                yield " ".join(words)
@@ -0,0 +1,255 @@
+from typing import List, Dict, Any, Optional, Iterator, Set, Tuple
+from dataclasses import dataclass, asdict
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from langchain_core.documents import Document
+from config.settings import settings
+from core.utils.logger import logger
+from knowledge.ingest.chunker import chunk_text
+from knowledge.ingest.sources import iter_corpus
+from knowledge.vector_store.store import VectorStore
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+@dataclass
+class IngestReport:
+    """Counters for one ingest run"""
+    records: int = 0
+    chunks: int = 0
+    duplicates: int = 0
+    indexed: int = 0
+    failed: int = 0
+    batches: int = 0
+    resumed_from: int = 0
+    elapsed_seconds: float = 0.0
+    docs_per_second: float = 0.0
+    chunks_per_second: float = 0.0
+    peak_memory_mb: Optional[float] = None
+
+
+@dataclass
+class _Batch:
+    """Chunks embedded and written together, and the source position they complete"""
+    chunks: List[Tuple[bytes, str, Dict[str, Any]]]
+    position: int
+
+
+class IngestCheckpoint:
+    """SQLite record of ingest progress and of every chunk hash already indexed
+
+    Hashes live on disk rather than in a Python set, so deduplication does not
+    grow memory with the corpus and carries over to resumed runs.
+    """
+    
+    def __init__(self, path: str, corpus: str):
+        self.corpus = os.path.abspath(corpus)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS chunks (hash BLOB PRIMARY KEY)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS progress (corpus TEXT PRIMARY KEY, position INTEGER NOT NULL)")
+        self._db.commit()
+    
+    def position(self) -> int:
+        """Number of source records fully indexed by previous runs"""
+        row = self._db.execute("SELECT position FROM progress WHERE corpus = ?", (self.corpus,)).fetchone()
+        return row[0] if row else 0
+    
+    def seen(self, chunk_hash: bytes) -> bool:
+        return self._db.execute("SELECT 1 FROM chunks WHERE hash = ?", (chunk_hash,)).fetchone() is not None
+    
+    def commit(self, hashes: List[bytes], position: Optional[int]):
+        """Record indexed chunk hashes and, if given, the new contiguous position"""
+        with self._db:
+            self._db.executemany("INSERT OR IGNORE INTO chunks (hash) VALUES (?)", [(h,) for h in hashes])
+            if position is not None:
+                self._db.execute(
+                    "INSERT INTO progress (corpus, position) VALUES (?, ?) "
+                    "ON CONFLICT(corpus) DO UPDATE SET position = excluded.position",
+                    (self.corpus, position)
+                )
+    
+    def reset(self):
+        """Forget progress for this corpus (indexed hashes are kept for deduplication)"""
+        with self._db:
+            self._db.execute("DELETE FROM progress WHERE corpus = ?", (self.corpus,))
+    
+    def close(self):
+        self._db.close()
+
+
+class IngestPipeline:
+    """Streams a corpus into the vector store in bounded, concurrent batches
+
+    Records are read lazily, chunked to ``chunk_max_chars`` and deduplicated by
+    content hash. At most ``max_concurrency`` batches are embedding at once;
+    finished batches are written to the index one at a time as they complete.
+    Progress only advances over a contiguous prefix of finished batches, so a
+    resumed run restarts after the last record whose chunks are all indexed and
+    skips anything a later batch already wrote.
+    """
+    
+    def __init__(self, vector_store: VectorStore, batch_size: int = 64, max_concurrency: int = 4,
+                 chunk_max_chars: int = 320, checkpoint_path: Optional[str] = None):
+        self.vector_store = vector_store
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.chunk_max_chars = chunk_max_chars
+        self.checkpoint_path = checkpoint_path or settings.ingest_checkpoint_path
+    
+    async def run(self, corpus_path: str, resume: bool = True) -> IngestReport:
+        """Ingest a JSONL or Markdown file, or a directory of them"""
+        report = IngestReport()
+        checkpoint = IngestCheckpoint(self.checkpoint_path, corpus_path)
+        if not resume:
+            checkpoint.reset()
+        report.resumed_from = checkpoint.position()
+        if report.resumed_from:
+            logger.info(f"Resuming ingest of {corpus_path} after record {report.resumed_from}")
+        
+        started = time.perf_counter()
+        slots = asyncio.Semaphore(self.max_concurrency)
+        write_lock = asyncio.Lock()
+        in_flight: Set[bytes] = set()
+        finished: Dict[int, Optional[int]] = {}
+        next_to_commit = [0]
+        tasks: Set[asyncio.Task] = set()
+        
+        try:
+            for batch_number, batch in enumerate(self._batches(corpus_path, report, checkpoint, in_flight)):
+                await slots.acquire()
+                task = asyncio.create_task(self._process(
+                    batch_number, batch, report, checkpoint, write_lock, in_flight, finished, next_to_commit
+                ))
+                task.add_done_callback(lambda _: slots.release())
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+            
+            if not report.failed:
+                # Records after the last batch (empty or all duplicates) are complete too
+                checkpoint.commit([], report.resumed_from + report.records)
+        finally:
+            checkpoint.close()
+        
+        report.elapsed_seconds = time.perf_counter() - started
+        if report.elapsed_seconds > 0:
+            report.docs_per_second = report.records / report.elapsed_seconds
+            report.chunks_per_second = report.indexed / report.elapsed_seconds
+        report.peak_memory_mb = _peak_memory_mb()
+        logger.info(f"Ingest finished: {report.records} records, {report.indexed} chunks indexed, "
+                    f"{report.duplicates} duplicates, {report.docs_per_second:.1f} docs/s, "
+                    f"peak memory {report.peak_memory_mb} MB")
+        return report
+    
+    def _batches(self, corpus_path: str, report: IngestReport, checkpoint: IngestCheckpoint,
+                 in_flight: Set[bytes]) -> Iterator[_Batch]:
+        """Lazily chunk and deduplicate records into batches"""
+        chunks: List[Tuple[bytes, str, Dict[str, Any]]] = []
+        position = report.resumed_from
+        
+        for index, (text, metadata) in enumerate(iter_corpus(corpus_path)):
+            if index < report.resumed_from:
+                continue
+            report.records += 1
+            
+            for chunk_index, chunk in enumerate(chunk_text(text, self.chunk_max_chars)):
+                report.chunks += 1
+                chunk_hash = hashlib.sha256(chunk.encode("utf-8")).digest()
+                if chunk_hash in in_flight or checkpoint.seen(chunk_hash):
+                    report.duplicates += 1
+                    continue
+                in_flight.add(chunk_hash)
+                chunks.append((chunk_hash, chunk, dict(metadata, chunk=chunk_index)))
+                
+                if len(chunks) >= self.batch_size:
+                    # The current record may continue into the next batch
+                    yield _Batch(chunks, position)
+                    chunks = []
+            
+            position = index + 1
+        
+        if chunks:
+            yield _Batch(chunks, position)
+    
+    async def _process(self, batch_number: int, batch: _Batch, report: IngestReport,
+                       checkpoint: IngestCheckpoint, write_lock: asyncio.Lock, in_flight: Set[bytes],
+                       finished: Dict[int, Optional[int]], next_to_commit: List[int]):
+        """Embed one batch, write it to the index and advance the checkpoint"""
+        hashes = [chunk_hash for chunk_hash, _, _ in batch.chunks]
+        documents = [Document(page_content=text, metadata=metadata) for _, text, metadata in batch.chunks]
+        written = False
+        try:
+            vectors = await self.vector_store.embedder.embeddings.aembed_documents(
+                [doc.page_content for doc in documents]
+            )
+            async with write_lock:
+                written = await asyncio.to_thread(self.vector_store.add_embeddings, documents, vectors)
+        except Exception as e:
+            logger.error(f"Ingest batch {batch_number} failed: {e}")
+        
+        report.batches += 1
+        if written:
+            report.indexed += len(documents)
+        else:
+            report.failed += len(documents)
+        
+        # Progress only moves over a contiguous run of finished batches; a failed
+        # batch holds it back so the next run retries from there
+        finished[batch_number] = batch.position if written else None
+        position = None
+        while finished.get(next_to_commit[0]) is not None:
+            position = finished.pop(next_to_commit[0])
+            next_to_commit[0] += 1
+        checkpoint.commit(hashes if written else [], position)
+        in_flight.difference_update(hashes)
+
+
+def _peak_memory_mb() -> Optional[float]:
+    """Peak resident set size of this process"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest a JSONL or Markdown corpus into the knowledge base")
+    parser.add_argument("corpus", help="JSONL file, Markdown file or directory of them")
+    parser.add_argument("--batch-size", type=int, default=settings.ingest_batch_size)
+    parser.add_argument("--concurrency", type=int, default=settings.ingest_max_concurrency)
+    parser.add_argument("--chunk-chars", type=int, default=settings.ingest_chunk_max_chars)
+    parser.add_argument("--checkpoint", default=settings.ingest_checkpoint_path)
+    parser.add_argument("--restart", action="store_true", help="Ignore saved progress for this corpus")
+    args = parser.parse_args()
+    
+    pipeline = IngestPipeline(
+        VectorStore(),
+        batch_size=args.batch_size,
+        max_concurrency=args.concurrency,
+        chunk_max_chars=args.chunk_chars,
+        checkpoint_path=args.checkpoint
+    )
+    try:
+        report = asyncio.run(pipeline.run(args.corpus, resume=not args.restart))
+    finally:
+        pipeline.vector_store.close()
+    print(json.dumps(asdict(report), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+from typing import Dict, Any, Iterator, List, Tuple
+import json
+import os
+from core.utils.logger import logger
+
+
+# A source record: text plus the metadata stored with each of its chunks
+Record = Tuple[str, Dict[str, Any]]
+
+JSONL_TEXT_FIELDS = ("text", "content", "page_content")
+MARKDOWN_EXTENSIONS = (".md", ".markdown")
+
+
+def iter_jsonl(path: str) -> Iterator[Record]:
+    """Stream records from a JSONL file, one line at a time
+
+    The text is taken from the first of ``text``, ``content`` or ``page_content``;
+    remaining scalar fields become metadata. Malformed lines are skipped.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Skipping malformed JSONL line {line_number} in {path}: {e}")
+                continue
+            
+            text = next((item[field] for field in JSONL_TEXT_FIELDS if isinstance(item.get(field), str)), None)
+            if text is None:
+                logger.warning(f"Skipping JSONL line {line_number} in {path}: no text field")
+                continue
+            
+            metadata = {
+                key: value for key, value in item.items()
+                if key not in JSONL_TEXT_FIELDS and isinstance(value, (str, int, float, bool))
+            }
+            metadata.setdefault("source", os.path.basename(path))
+            yield text, metadata
+
+
+def iter_markdown(path: str) -> Iterator[Record]:
+    """Stream one record per heading section of a Markdown file"""
+    source = os.path.basename(path)
+    heading = ""
+    lines: List[str] = []
+    in_fence = False
+    
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.lstrip().startswith("```"):
+                in_fence = not in_fence
+            if line.startswith("#") and not in_fence:
+                text = "".join(lines).strip()
+                if text:
+                    yield text, {"source": source, "heading": heading}
+                heading = line.lstrip("#").strip()
+                lines = []
+            else:
+                lines.append(line)
+    
+    text = "".join(lines).strip()
+    if text:
+        yield text, {"source": source, "heading": heading}
+
+
+def iter_corpus(path: str) -> Iterator[Record]:
+    """Stream records from a JSONL file, a Markdown file or a directory of them
+
+    Directory entries are visited in sorted order so record positions are stable
+    across runs, which checkpoint resumption relies on.
+    """
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                if name.endswith(".jsonl") or name.endswith(MARKDOWN_EXTENSIONS):
+                    yield from iter_corpus(file_path)
+    elif path.endswith(".jsonl"):
+        yield from iter_jsonl(path)
+    elif path.endswith(MARKDOWN_EXTENSIONS):
+        yield from iter_markdown(path)
+    else:
+        raise ValueError(f"Unsupported corpus format: {path}")
@@ -0,0 +1,71 @@
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import threading
+import time
+
+
+class ContextCache:
+    """LRU cache of assembled retrieval context with a time-to-live
+
+    Entries are keyed on the normalized query and the context length budget, and
+    remember the store version they were computed against; an entry from an
+    older version is treated as a miss, so bumping the version invalidates
+    everything without walking the cache.
+    """
+    
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[str, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Case- and whitespace-insensitive form of a query"""
+        return " ".join(query.lower().split())
+    
+    def get(self, query: str, max_context_length: int, version: int) -> Optional[str]:
+        """Cached context for the query, or None if absent, expired or stale"""
+        key = (self.normalize(query), max_context_length)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                context, expires_at, entry_version = entry
+                if entry_version == version and expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return context
+                del self._entries[key]
+            self.misses += 1
+            return None
+    
+    def put(self, query: str, max_context_length: int, version: int, context: str):
+        """Store assembled context computed against the given store version"""
+        key = (self.normalize(query), max_context_length)
+        with self._lock:
+            self._entries[key] = (context, time.monotonic() + self.ttl_seconds, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries
+            }
@@ -0,0 +1,283 @@
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import json
+import os
+import threading
+import time
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from core.utils.logger import logger
+
+
+class NumpyVectorStore:
+    """Brute-force cosine index over a memory-mapped float32 matrix
+
+    Layout of the store directory:
+
+    - ``vectors.f32``: row-major normalized float32 vectors, opened read-only with
+      ``np.memmap`` so loading is instant and worker processes share page cache
+    - ``documents.jsonl``: one ``{"text", "metadata"}`` record per vector row
+    - ``offsets.i64``: end byte offset of each record, also memory-mapped, so a hit
+      is fetched with one ``pread`` and nothing is parsed at load time
+    - ``meta.json``: dimension and committed row count, replaced atomically
+
+    Only the first ``count`` rows of the data files are considered committed, so an
+    interrupted append is ignored on the next load. A single writer is assumed;
+    readers in other processes pick up new rows when ``meta.json`` changes, which
+    searches check at most every ``REFRESH_INTERVAL_SECONDS``.
+    """
+    
+    VECTORS_FILE = "vectors.f32"
+    DOCUMENTS_FILE = "documents.jsonl"
+    OFFSETS_FILE = "offsets.i64"
+    META_FILE = "meta.json"
+    # How stale a reader may be about rows committed by another process
+    REFRESH_INTERVAL_SECONDS = 1.0
+    
+    def __init__(self, path: str, embeddings: Embeddings):
+        self.path = path
+        self.embeddings = embeddings
+        self.dimension: Optional[int] = None
+        # (vectors, offsets, documents file) of the committed rows, published as one tuple
+        self._maps: Optional[Tuple[np.ndarray, np.ndarray, "_DocumentsFile"]] = None
+        self.count = 0
+        self._meta_version_seen: Optional[Tuple[int, int]] = None
+        self._refreshed_at = 0.0
+        
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+    
+    def _load(self):
+        """Map the committed vectors and record offsets"""
+        meta_path = self._file(self.META_FILE)
+        self._refreshed_at = time.monotonic()
+        if not os.path.exists(meta_path):
+            self._publish(None)
+            self.count = 0
+            self.dimension = None
+            self._meta_version_seen = None
+            return
+        
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        version = self._meta_version(meta_path)
+        dimension = meta["dimension"]
+        count = meta["count"]
+        
+        maps = None
+        if count:
+            vectors = np.memmap(
+                self._file(self.VECTORS_FILE), dtype=np.float32, mode="r", shape=(count, dimension)
+            )
+            offsets = np.memmap(self._file(self.OFFSETS_FILE), dtype=np.int64, mode="r", shape=(count,))
+            maps = (vectors, offsets, self._documents_file())
+        
+        self._publish(maps)
+        self.count = count
+        self.dimension = dimension
+        self._meta_version_seen = version
+    
+    def _documents_file(self) -> "_DocumentsFile":
+        """Read handle of the side table, reused while the file is the same one"""
+        current = self._maps[2] if self._maps else None
+        path = self._file(self.DOCUMENTS_FILE)
+        if current is not None and os.stat(path).st_ino == current.inode:
+            return current
+        return _DocumentsFile(path)
+    
+    def _publish(self, maps: Optional[Tuple[np.ndarray, np.ndarray, "_DocumentsFile"]]):
+        """Swap in new maps with one assignment, so a concurrent search sees either the old or the new ones"""
+        replaced = self._maps
+        self._maps = maps
+        if replaced is not None and (maps is None or maps[2] is not replaced[2]):
+            # Closed once the last search still reading it is done
+            replaced[2].retire()
+    
+    def _acquire_maps(self) -> Optional[Tuple[np.ndarray, np.ndarray, "_DocumentsFile"]]:
+        """Current maps with their documents file held open until released"""
+        while True:
+            maps = self._maps
+            if maps is None or maps[2].acquire():
+                return maps
+    
+    @staticmethod
+    def _document(offsets: np.ndarray, documents_file: "_DocumentsFile", row: int) -> Document:
+        """Read one record from the side table"""
+        start = int(offsets[row - 1]) if row else 0
+        end = int(offsets[row])
+        record = json.loads(os.pread(documents_file.fd, end - start, start))
+        return Document(page_content=record["text"], metadata=record["metadata"])
+    
+    def _refresh(self, force: bool = False):
+        """Reload if another process committed new rows, checking at most every REFRESH_INTERVAL_SECONDS"""
+        if not force and time.monotonic() - self._refreshed_at < self.REFRESH_INTERVAL_SECONDS:
+            return
+        self._refreshed_at = time.monotonic()
+        try:
+            version = self._meta_version(self._file(self.META_FILE))
+        except FileNotFoundError:
+            version = None
+        if version != self._meta_version_seen:
+            self._load()
+    
+    @staticmethod
+    def _meta_version(meta_path: str) -> Tuple[int, int]:
+        # meta.json is replaced, never rewritten in place, so a new inode means new rows
+        stat = os.stat(meta_path)
+        return stat.st_ino, stat.st_mtime_ns
+    
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+    
+    def add_documents(self, documents: List[Document]) -> List[int]:
+        """Embed and append documents, returning their row ids"""
+        vectors = self.embeddings.embed_documents([doc.page_content for doc in documents])
+        return self.add_embeddings(documents, vectors)
+    
+    def add_embeddings(self, documents: List[Document], vectors: List[List[float]]) -> List[int]:
+        """Append documents with precomputed vectors, returning their row ids"""
+        if not documents:
+            return []
+        
+        matrix = self._normalize(np.asarray(vectors, dtype=np.float32))
+        if matrix.ndim != 2 or matrix.shape[0] != len(documents):
+            raise ValueError("Expected one vector per document")
+        
+        self._refresh(force=True)
+        if self.dimension is None:
+            self.dimension = matrix.shape[1]
+        elif matrix.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {matrix.shape[1]} does not match store dimension {self.dimension}")
+        
+        maps = self._maps
+        start = len(maps[0]) if maps else 0
+        base = int(maps[1][-1]) if start else 0
+        records = [
+            json.dumps({"text": doc.page_content, "metadata": doc.metadata}).encode("utf-8") + b"\n"
+            for doc in documents
+        ]
+        ends = base + np.cumsum([len(record) for record in records], dtype=np.int64)
+        
+        # Each file is first cut back to its committed length, dropping any tail
+        # left by an interrupted append
+        self._append(self.VECTORS_FILE, start * self.dimension * 4, matrix.tobytes())
+        self._append(self.DOCUMENTS_FILE, base, b"".join(records))
+        self._append(self.OFFSETS_FILE, start * 8, ends.tobytes())
+        
+        self._write_meta(start + len(documents))
+        self._load()
+        return list(range(start, start + len(documents)))
+    
+    def _append(self, name: str, committed_size: int, data: bytes):
+        with open(self._file(name), "ab") as f:
+            f.truncate(committed_size)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _write_meta(self, count: int):
+        """Commit the row count by atomically replacing meta.json"""
+        tmp_path = self._file(self.META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dimension": self.dimension, "count": count}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._file(self.META_FILE))
+    
+    def similarity_search(self, query: str, k: int = 5) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
+    
+    def similarity_search_with_score(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        """Top-k documents with cosine similarity (higher is more similar)"""
+        return self.similarity_search_by_vector_with_score(self.embeddings.embed_query(query), k=k)
+    
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 5) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k)]
+    
+    async def asimilarity_search_by_vector(self, embedding: List[float], k: int = 5) -> List[Document]:
+        # The matrix product releases the GIL, so large stores do not stall the event loop
+        return await asyncio.to_thread(self.similarity_search_by_vector, embedding, k)
+    
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 5) -> List[Tuple[Document, float]]:
+        """One matrix-vector product, then argpartition for the top k rows"""
+        self._refresh()
+        if k <= 0:
+            return []
+        maps = self._acquire_maps()
+        if maps is None:
+            return []
+        vectors, offsets, documents_file = maps
+        try:
+            query = self._normalize(np.asarray(embedding, dtype=np.float32))
+            if query.shape[0] != vectors.shape[1]:
+                raise ValueError(f"Query dimension {query.shape[0]} does not match store dimension {vectors.shape[1]}")
+            
+            scores = vectors @ query
+            k = min(k, scores.shape[0])
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            
+            return [(self._document(offsets, documents_file, row), float(scores[row])) for row in top]
+        finally:
+            documents_file.release()
+    
+    def clear(self):
+        """Remove every document and vector"""
+        for name in (self.META_FILE, self.VECTORS_FILE, self.DOCUMENTS_FILE, self.OFFSETS_FILE):
+            try:
+                os.remove(self._file(name))
+            except FileNotFoundError:
+                pass
+        self._load()
+        logger.info(f"Cleared numpy vector store at {self.path}")
+    
+    def close(self):
+        """Release the documents file once no search reads it"""
+        self._publish(None)
+
+
+class _DocumentsFile:
+    """Read-only descriptor of documents.jsonl shared by searches
+
+    A replaced one is retired rather than closed, and closes when the last
+    search still reading from it releases it.
+    """
+    
+    def __init__(self, path: str):
+        self.fd = os.open(path, os.O_RDONLY)
+        self.inode = os.fstat(self.fd).st_ino
+        self._lock = threading.Lock()
+        self._readers = 0
+        self._retired = False
+    
+    def acquire(self) -> bool:
+        """Hold the descriptor open; False if it is already retired"""
+        with self._lock:
+            if self._retired:
+                return False
+            self._readers += 1
+            return True
+    
+    def release(self):
+        with self._lock:
+            self._readers -= 1
+            if self._retired and not self._readers:
+                os.close(self.fd)
+    
+    def retire(self):
+        with self._lock:
+            if self._retired:
+                return
+            self._retired = True
+            if not self._readers:
+                os.close(self.fd)
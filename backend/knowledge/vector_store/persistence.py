@@ -0,0 +1,252 @@
+from typing import List, Dict, Any, Optional
+import base64
+import os
+import pickle
+import shutil
+import threading
+import time
+import uuid
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+from core.utils.logger import logger
+from knowledge.vector_store.segments import SegmentLog, fsync_directory
+
+
+class SegmentedFaissPersistence:
+    """Write-behind persistence for an in-memory FAISS store
+
+    Writes are appended to a SegmentLog (vectors included, so recovery never
+    re-embeds) and applied to the in-memory index; the full index is only
+    written by compaction, which snapshots it as a new base checkpoint in the
+    background once the segments exceed a size or age threshold. The thresholds
+    are checked after every write and every ``compact_check_interval_seconds``,
+    so a store that has gone idle still compacts its old segments. Deletes are
+    logged as tombstones. Recovery loads the newest base and replays the
+    segments listed in the manifest.
+
+    Directory layout under ``path``: ``segments/`` (log and manifest) and
+    ``bases/base-<seq>-<ns>/`` (``index.faiss`` + ``index.pkl``, the save_local format).
+    """
+    
+    def __init__(self, path: str, embeddings: Embeddings, fsync_policy: str = "always",
+                 fsync_interval_ms: int = 1000, segment_max_bytes: int = 16 * 1024 * 1024,
+                 compact_min_bytes: int = 64 * 1024 * 1024, compact_max_age_seconds: float = 3600.0,
+                 compact_check_interval_seconds: float = 60.0):
+        self.path = path
+        self.embeddings = embeddings
+        self.compact_min_bytes = compact_min_bytes
+        self.compact_max_age_seconds = compact_max_age_seconds
+        self.compact_check_interval = compact_check_interval_seconds
+        self.bases_path = os.path.join(path, "bases")
+        self.log = SegmentLog(
+            os.path.join(path, "segments"),
+            fsync_policy=fsync_policy,
+            fsync_interval_ms=fsync_interval_ms,
+            segment_max_bytes=segment_max_bytes
+        )
+        self.store: Optional[FAISS] = None
+        
+        # Guards the in-memory index against concurrent mutation and snapshotting
+        self._lock = threading.RLock()
+        # Compactions run one at a time so checkpoints are recorded in order
+        self._compact_lock = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        self._compaction_timer: Optional[threading.Thread] = None
+        self.compactions = 0
+    
+    def recover(self) -> Optional[FAISS]:
+        """Load the base checkpoint and replay newer segments"""
+        with self._lock:
+            if self.log.base:
+                self.store = FAISS.load_local(
+                    os.path.join(self.bases_path, self.log.base),
+                    self.embeddings,
+                    allow_dangerous_deserialization=True
+                )
+            elif self.log.is_new and os.path.exists(os.path.join(self.path, "index.faiss")):
+                # Index written by save_local before segment persistence existed
+                logger.info("Migrating legacy FAISS index to segment persistence")
+                self.store = FAISS.load_local(self.path, self.embeddings, allow_dangerous_deserialization=True)
+            
+            replayed = 0
+            for record in self.log.replay():
+                self._apply(record)
+                replayed += 1
+            
+            logger.info(f"Recovered FAISS store: base={self.log.base}, replayed {replayed} records, "
+                        f"{self.document_count()} documents")
+        
+        if self.store is not None and self.log.is_new:
+            self.compact()
+        if self.compact_check_interval > 0 and self._compaction_timer is None:
+            self._compaction_timer = threading.Thread(target=self._compact_periodically,
+                                                      name="faiss-compaction-timer", daemon=True)
+            self._compaction_timer.start()
+        return self.store
+    
+    def document_count(self) -> int:
+        return len(self.store.index_to_docstore_id) if self.store is not None else 0
+    
+    def add_documents(self, documents: List[Document]) -> List[str]:
+        """Embed, log and index documents; returns their ids once the log write is durable"""
+        vectors = self.embeddings.embed_documents([doc.page_content for doc in documents])
+        return self.add_embeddings(documents, vectors)
+    
+    def add_embeddings(self, documents: List[Document], vectors: List[List[float]]) -> List[str]:
+        """Log and index documents with precomputed vectors"""
+        ids = [doc.id or uuid.uuid4().hex for doc in documents]
+        record = {
+            "op": "add",
+            "docs": [
+                {
+                    "id": doc_id,
+                    "text": doc.page_content,
+                    "metadata": doc.metadata,
+                    "vector": base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+                }
+                for doc_id, doc, vector in zip(ids, documents, vectors)
+            ]
+        }
+        with self._lock:
+            self.log.append(record)
+            self._apply(record)
+        self._maybe_compact()
+        return ids
+    
+    def delete(self, ids: List[str]) -> bool:
+        """Log a tombstone for the ids and drop them from the index"""
+        record = {"op": "delete", "ids": list(ids)}
+        with self._lock:
+            self.log.append(record)
+            self._apply(record)
+        self._maybe_compact()
+        return True
+    
+    def _apply(self, record: Dict[str, Any]):
+        """Apply one logged mutation to the in-memory index"""
+        if record["op"] == "add":
+            docs = record["docs"]
+            text_embeddings = [
+                (doc["text"], np.frombuffer(base64.b64decode(doc["vector"]), dtype=np.float32).tolist())
+                for doc in docs
+            ]
+            metadatas = [doc["metadata"] for doc in docs]
+            ids = [doc["id"] for doc in docs]
+            if self.store is None:
+                self.store = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas, ids=ids)
+            else:
+                self.store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+            
+        elif record["op"] == "delete" and self.store is not None:
+            known = set(self.store.index_to_docstore_id.values())
+            ids = [doc_id for doc_id in record["ids"] if doc_id in known]
+            if ids:
+                self.store.delete(ids)
+    
+    def _maybe_compact(self):
+        """Start background compaction once segments pass the size or age threshold"""
+        stats = self.log.stats()
+        if stats["last_seq"] == stats["base_seq"]:
+            return
+        if (stats["segment_bytes"] < self.compact_min_bytes
+                and stats["oldest_segment_age_seconds"] < self.compact_max_age_seconds):
+            return
+        with self._lock:
+            # Writers and the timer may both get here; only one compaction is started
+            if self._closed.is_set() or (self._compaction is not None and self._compaction.is_alive()):
+                return
+            self._compaction = threading.Thread(target=self.compact, name="faiss-compaction", daemon=True)
+            self._compaction.start()
+    
+    def _compact_periodically(self):
+        while not self._closed.wait(self.compact_check_interval):
+            try:
+                self._maybe_compact()
+            except Exception as e:
+                logger.error(f"Periodic compaction check failed: {e}")
+    
+    def compact(self):
+        """Snapshot the index as a new base and drop the segments it covers"""
+        with self._compact_lock:
+            self._compact()
+    
+    def _compact(self):
+        try:
+            started = time.perf_counter()
+            with self._lock:
+                segments = self.log.rotate()
+                base_seq = self.log.last_seq
+                if base_seq == self.log.base_seq and not segments and self.store is not None and self.log.base:
+                    return
+                snapshot = None
+                if self.store is not None:
+                    # Serializing in memory keeps the lock short; disk writes happen after
+                    import faiss
+                    snapshot = (
+                        faiss.serialize_index(self.store.index).tobytes(),
+                        pickle.dumps((self.store.docstore, self.store.index_to_docstore_id))
+                    )
+            
+            base = None
+            if snapshot is not None:
+                base = f"base-{base_seq:012d}-{time.time_ns()}"
+                self._write_base(base, *snapshot)
+            
+            previous = self.log.checkpoint(base, base_seq, segments)
+            if previous and previous != base:
+                shutil.rmtree(os.path.join(self.bases_path, previous), ignore_errors=True)
+            
+            self.compactions += 1
+            logger.info(f"Compacted {len(segments)} segments into {base} "
+                        f"in {time.perf_counter() - started:.2f}s")
+            
+        except Exception as e:
+            logger.error(f"Vector store compaction failed: {e}")
+    
+    def _write_base(self, name: str, index_bytes: bytes, docstore_bytes: bytes):
+        """Write a base checkpoint in the save_local layout via a temporary directory"""
+        final_path = os.path.join(self.bases_path, name)
+        tmp_path = final_path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        
+        for filename, data in (("index.faiss", index_bytes), ("index.pkl", docstore_bytes)):
+            with open(os.path.join(tmp_path, filename), "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        fsync_directory(tmp_path)
+        
+        shutil.rmtree(final_path, ignore_errors=True)
+        os.replace(tmp_path, final_path)
+        fsync_directory(self.bases_path)
+    
+    def clear(self):
+        """Drop every document: an empty base replaces all segments"""
+        # Same lock order as background compaction: _compact_lock, then _lock
+        with self._compact_lock:
+            with self._lock:
+                self.store = None
+                self._compact()
+    
+    def close(self):
+        """Stop the compaction timer, wait for a running compaction and make all appends durable"""
+        self._closed.set()
+        if self._compaction_timer is not None:
+            self._compaction_timer.join()
+        if self._compaction is not None:
+            self._compaction.join()
+        self.log.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Segment log counters plus document and compaction counts"""
+        stats = self.log.stats()
+        stats.update({
+            "base": self.log.base,
+            "documents": self.document_count(),
+            "compactions": self.compactions
+        })
+        return stats
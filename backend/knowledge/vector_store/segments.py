@@ -0,0 +1,242 @@
+from typing import List, Dict, Any, Optional, Iterator
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from core.utils.logger import logger
+
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+def fsync_directory(path: str):
+    """Make renames and file creations in a directory durable"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SegmentLog:
+    """Append-only log of store mutations split into segment files
+
+    Each record is a JSON payload framed by its length and CRC32 and carries a
+    monotonically increasing sequence number. ``manifest.json`` (replaced
+    atomically) lists the live segments and the base checkpoint they apply on
+    top of; records with ``seq <= base_seq`` are already in the checkpoint.
+
+    Durability follows ``fsync_policy``:
+
+    - ``always``: every append is fsynced before it returns
+    - ``interval``: a background thread fsyncs every ``fsync_interval_ms``
+    - ``never``: flushing to disk is left to the operating system
+
+    A record torn by a crash fails its length or checksum test on replay and is
+    truncated away; with ``always`` such a record was never acknowledged.
+    """
+    
+    MANIFEST = "manifest.json"
+    HEADER = struct.Struct("<II")
+    
+    def __init__(self, path: str, fsync_policy: str = "always", fsync_interval_ms: int = 1000,
+                 segment_max_bytes: int = 16 * 1024 * 1024):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unsupported fsync policy: {fsync_policy}")
+        self.path = path
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval_ms / 1000.0
+        self.segment_max_bytes = segment_max_bytes
+        
+        self.manifest: Dict[str, Any] = {"base": None, "base_seq": 0, "segments": [], "next_segment": 1}
+        self.last_seq = 0
+        self._active = None
+        self._active_bytes = 0
+        self._segment_bytes: Dict[str, int] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        
+        os.makedirs(self.path, exist_ok=True)
+        self._load_manifest()
+        
+        if self.fsync_policy == "interval":
+            self._flusher = threading.Thread(target=self._flush_periodically, name="segment-fsync", daemon=True)
+            self._flusher.start()
+    
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+    
+    def _load_manifest(self):
+        manifest_path = self._file(self.MANIFEST)
+        # False once anything has been recorded, even if every segment was later compacted
+        self.is_new = not os.path.exists(manifest_path)
+        if not self.is_new:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        self.last_seq = self.manifest["base_seq"]
+        for segment in self.manifest["segments"]:
+            segment_path = self._file(segment["name"])
+            self._segment_bytes[segment["name"]] = os.path.getsize(segment_path) if os.path.exists(segment_path) else 0
+    
+    def _write_manifest(self):
+        """Atomically replace the manifest"""
+        tmp_path = self._file(self.MANIFEST + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._file(self.MANIFEST))
+        fsync_directory(self.path)
+    
+    @property
+    def base(self) -> Optional[str]:
+        return self.manifest["base"]
+    
+    @property
+    def base_seq(self) -> int:
+        return self.manifest["base_seq"]
+    
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        """Yield every record newer than the base checkpoint, in order
+
+        Must run before the first append. Torn tails are truncated.
+        """
+        for segment in self.manifest["segments"]:
+            segment_path = self._file(segment["name"])
+            if not os.path.exists(segment_path):
+                logger.error(f"Segment listed in manifest is missing: {segment['name']}")
+                continue
+            
+            with open(segment_path, "r+b") as f:
+                data = f.read()
+                offset = 0
+                while offset < len(data):
+                    record = self._decode(data, offset)
+                    if record is None:
+                        logger.warning(f"Truncating torn tail of {segment['name']} at byte {offset}")
+                        f.truncate(offset)
+                        os.fsync(f.fileno())
+                        self._segment_bytes[segment["name"]] = offset
+                        break
+                    payload, offset = record
+                    self.last_seq = max(self.last_seq, payload["seq"])
+                    if payload["seq"] > self.base_seq:
+                        yield payload
+    
+    def _decode(self, data: bytes, offset: int):
+        """Decode the record at offset, or None if it is incomplete or corrupt"""
+        end = offset + self.HEADER.size
+        if end > len(data):
+            return None
+        length, checksum = self.HEADER.unpack_from(data, offset)
+        body = data[end:end + length]
+        if len(body) < length or zlib.crc32(body) != checksum:
+            return None
+        return json.loads(body), end + length
+    
+    def append(self, record: Dict[str, Any]) -> int:
+        """Append a record, durably if the fsync policy is ``always``; returns its sequence number"""
+        with self._lock:
+            self.last_seq += 1
+            record = dict(record, seq=self.last_seq)
+            body = json.dumps(record).encode("utf-8")
+            frame = self.HEADER.pack(len(body), zlib.crc32(body)) + body
+            
+            if self._active is None or self._active_bytes >= self.segment_max_bytes:
+                self._open_segment()
+            self._active.write(frame)
+            self._active.flush()
+            self._active_bytes += len(frame)
+            self._segment_bytes[self.manifest["segments"][-1]["name"]] = self._active_bytes
+            
+            if self.fsync_policy == "always":
+                os.fsync(self._active.fileno())
+            else:
+                self._dirty = True
+            return self.last_seq
+    
+    def _open_segment(self):
+        """Seal the active segment and start a new one"""
+        self._seal_active()
+        name = f"segment-{self.manifest['next_segment']:08d}.log"
+        self.manifest["next_segment"] += 1
+        self.manifest["segments"].append({"name": name, "created_at": time.time()})
+        self._active = open(self._file(name), "ab")
+        self._active_bytes = 0
+        self._segment_bytes[name] = 0
+        self._write_manifest()
+    
+    def _seal_active(self):
+        if self._active is not None:
+            self._active.flush()
+            os.fsync(self._active.fileno())
+            self._active.close()
+            self._active = None
+            self._dirty = False
+    
+    def rotate(self) -> List[str]:
+        """Seal the active segment; returns every segment written so far
+
+        The next append starts a new segment, so the returned segments hold
+        exactly the records up to the current ``last_seq``.
+        """
+        with self._lock:
+            self._seal_active()
+            return [segment["name"] for segment in self.manifest["segments"]]
+    
+    def checkpoint(self, base: Optional[str], base_seq: int, segments: List[str]) -> Optional[str]:
+        """Record a new base covering ``segments`` and delete them; returns the replaced base"""
+        with self._lock:
+            previous = self.manifest["base"]
+            covered = set(segments)
+            self.manifest["base"] = base
+            self.manifest["base_seq"] = base_seq
+            self.manifest["segments"] = [
+                segment for segment in self.manifest["segments"] if segment["name"] not in covered
+            ]
+            self._write_manifest()
+        
+        for name in segments:
+            self._segment_bytes.pop(name, None)
+            try:
+                os.remove(self._file(name))
+            except FileNotFoundError:
+                pass
+        return previous
+    
+    def sync(self):
+        """Fsync the active segment if it has unsynced appends"""
+        with self._lock:
+            if self._dirty and self._active is not None:
+                os.fsync(self._active.fileno())
+                self._dirty = False
+    
+    def _flush_periodically(self):
+        while not self._closed.wait(self.fsync_interval):
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Periodic segment fsync failed: {e}")
+    
+    def close(self):
+        """Stop the flusher and make every appended record durable"""
+        self._closed.set()
+        with self._lock:
+            self._seal_active()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Segment counts, sizes and age"""
+        with self._lock:
+            segments = self.manifest["segments"]
+            return {
+                "segments": len(segments),
+                "segment_bytes": sum(self._segment_bytes.values()),
+                "oldest_segment_age_seconds": time.time() - segments[0]["created_at"] if segments else 0.0,
+                "last_seq": self.last_seq,
+                "base_seq": self.base_seq,
+                "fsync_policy": self.fsync_policy
+            }
@@ -0,0 +1,190 @@
+from typing import List, Dict, Any, Optional, Tuple
+import argparse
+import hashlib
+import json
+import os
+import struct
+import time
+import numpy as np
+from langchain_core.documents import Document
+from config.settings import settings
+from core.utils.logger import logger
+
+
+SNAPSHOT_MAGIC = b"LUCIDKB\0"
+SNAPSHOT_FORMAT = 1
+SECTION_ALIGNMENT = 64
+PREAMBLE = struct.Struct("<8sII")  # magic, format, header length
+
+
+def _align(offset: int) -> int:
+    return (offset + SECTION_ALIGNMENT - 1) // SECTION_ALIGNMENT * SECTION_ALIGNMENT
+
+
+class KnowledgeSnapshot:
+    """Read-only, precomputed knowledge base memory-mapped from a single file
+
+    File layout: a preamble (magic, format version, header length), a JSON header
+    (embedding model, dimension, count, content version, section offsets) and
+    three 64-byte aligned sections: normalized float32 vectors, int64 record end
+    offsets and UTF-8 JSONL records. Every section is an ``np.memmap`` view of
+    the file, so loading reads only the header and pages are shared between
+    processes; a search touches the vectors plus the records of its hits.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, file_format, header_length = PREAMBLE.unpack(f.read(PREAMBLE.size))
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"Not a knowledge snapshot: {path}")
+            if file_format != SNAPSHOT_FORMAT:
+                raise ValueError(f"Unsupported snapshot format {file_format} (expected {SNAPSHOT_FORMAT})")
+            self.header: Dict[str, Any] = json.loads(f.read(header_length))
+        
+        self.embedding_model: str = self.header["embedding_model"]
+        self.version: str = self.header["version"]
+        self.dimension: int = self.header["dimension"]
+        self.count: int = self.header["count"]
+        
+        sections = self.header["sections"]
+        self._vectors = np.memmap(path, dtype=np.float32, mode="r", offset=sections["vectors"],
+                                  shape=(self.count, self.dimension)) if self.count else None
+        self._offsets = np.memmap(path, dtype=np.int64, mode="r", offset=sections["offsets"],
+                                  shape=(self.count,)) if self.count else None
+        self._records = np.memmap(path, dtype=np.uint8, mode="r", offset=sections["records"],
+                                  shape=(sections["records_length"],)) if self.count else None
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def _document(self, row: int) -> Document:
+        start = int(self._offsets[row - 1]) if row else 0
+        record = json.loads(self._records[start:int(self._offsets[row])].tobytes())
+        return Document(page_content=record["text"], metadata=record["metadata"])
+    
+    def search_by_vector(self, embedding: List[float], k: int = 5) -> List[Tuple[Document, float]]:
+        """Top-k documents with cosine similarity"""
+        if not self.count or k <= 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        
+        scores = self._vectors @ query
+        k = min(k, self.count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self._document(row), float(scores[row])) for row in top]
+    
+    @staticmethod
+    def write(path: str, documents: List[Document], vectors: List[List[float]], embedding_model: str) -> str:
+        """Write a snapshot atomically; returns its content version"""
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(documents), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms
+        
+        records = [
+            json.dumps({"text": doc.page_content, "metadata": doc.metadata}, sort_keys=True).encode("utf-8")
+            for doc in documents
+        ]
+        offsets = np.cumsum([len(record) for record in records], dtype=np.int64)
+        records_blob = b"".join(records)
+        
+        digest = hashlib.sha256(embedding_model.encode("utf-8"))
+        digest.update(matrix.tobytes())
+        digest.update(records_blob)
+        version = digest.hexdigest()[:16]
+        
+        header = {
+            "embedding_model": embedding_model,
+            "version": version,
+            "dimension": int(matrix.shape[1]) if len(documents) else 0,
+            "count": len(documents),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "sections": {}
+        }
+        # Section offsets depend on the header length, which depends on the offsets;
+        # reserve digits generously so one pass is enough
+        header["sections"] = {"vectors": 10 ** 12, "offsets": 10 ** 12, "records": 10 ** 12,
+                              "records_length": len(records_blob)}
+        header_length = len(json.dumps(header).encode("utf-8"))
+        vectors_at = _align(PREAMBLE.size + header_length)
+        offsets_at = _align(vectors_at + matrix.nbytes)
+        records_at = _align(offsets_at + offsets.nbytes)
+        header["sections"].update({"vectors": vectors_at, "offsets": offsets_at, "records": records_at})
+        header_bytes = json.dumps(header).encode("utf-8").ljust(header_length)
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, header_length))
+            f.write(header_bytes)
+            for offset, data in ((vectors_at, matrix.tobytes()), (offsets_at, offsets.tobytes()),
+                                 (records_at, records_blob)):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return version
+
+
+def load_snapshot(path: str, embedding_model: str) -> Optional[KnowledgeSnapshot]:
+    """Open the snapshot if it exists and was built with the given embedding model"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        snapshot = KnowledgeSnapshot(path)
+    except Exception as e:
+        logger.error(f"Failed to open knowledge snapshot {path}: {e}")
+        return None
+    if snapshot.embedding_model != embedding_model:
+        logger.warning(f"Ignoring knowledge snapshot built with {snapshot.embedding_model}; "
+                       f"the configured embedding model is {embedding_model}")
+        return None
+    logger.info(f"Loaded knowledge snapshot {snapshot.version}: {len(snapshot)} documents")
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed knowledge snapshot")
+    parser.add_argument("--corpus", help="JSONL/Markdown corpus to chunk and embed (default: built-in sample knowledge)")
+    parser.add_argument("--output", default=settings.knowledge_snapshot_path)
+    parser.add_argument("--batch-size", type=int, default=settings.ingest_batch_size)
+    args = parser.parse_args()
+    
+    from knowledge.embeddings.embedder import Embedder, DummyEmbeddings
+    from knowledge.vector_store.store import VectorStore
+    
+    if args.corpus:
+        from knowledge.ingest.chunker import chunk_text
+        from knowledge.ingest.sources import iter_corpus
+        
+        # A snapshot is loaded whole at build time, so corpora here are expected to be small
+        documents = [
+            Document(page_content=chunk, metadata=dict(metadata, chunk=index))
+            for text, metadata in iter_corpus(args.corpus)
+            for index, chunk in enumerate(chunk_text(text, settings.ingest_chunk_max_chars))
+        ]
+    else:
+        documents = VectorStore.sample_documents()
+    
+    embedder = Embedder()
+    if isinstance(embedder.embeddings, DummyEmbeddings):
+        raise SystemExit("Embeddings client unavailable; refusing to write a snapshot of placeholder vectors")
+    vectors: List[List[float]] = []
+    for start in range(0, len(documents), args.batch_size):
+        batch = documents[start:start + args.batch_size]
+        vectors.extend(embedder.embeddings.embed_documents([doc.page_content for doc in batch]))
+    
+    version = KnowledgeSnapshot.write(args.output, documents, vectors, embedder.model_name)
+    print(f"Wrote {len(documents)} documents to {args.output} (version {version}, model {embedder.model_name})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,18 @@
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+import asyncio
 import os
-import json
 from langchain_core.documents import Document
-from langchain_community.vectorstores import FAISS
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
 from config.settings import settings
 from core.utils.logger import logger
 from knowledge.embeddings.embedder import Embedder
+from knowledge.vector_store.context_cache import ContextCache
+
+if TYPE_CHECKING:
+    from knowledge.vector_store.persistence import SegmentedFaissPersistence
+    from knowledge.vector_store.snapshot import KnowledgeSnapshot
+
+# Backend modules (FAISS, Chroma, NumPy) are imported when their store type is
+# initialized, so importing this module stays cheap
 
 
 class VectorStore:
@@ -18,8 +23,20 @@ class VectorStore:
         self.store_path = store_path or settings.vector_store_path
         self.embedder = Embedder()
         self._store = None
+        self._persistence: Optional["SegmentedFaissPersistence"] = None
+        # Read-only precomputed knowledge searched alongside the live store
+        self.snapshot: Optional["KnowledgeSnapshot"] = None
         self._initialized = False
         
+        # Bumped on every content change; cached context from older versions is stale
+        self.version = 0
+        self.context_cache = None
+        if settings.context_cache_enabled:
+            self.context_cache = ContextCache(
+                max_entries=settings.context_cache_max_entries,
+                ttl_seconds=settings.context_cache_ttl_seconds
+            )
+        
         logger.info(f"VectorStore initialized with type: {self.store_type}")
     
     @property
@@ -33,11 +50,14 @@ class VectorStore:
         """Initialize the vector store"""
         try:
             os.makedirs(self.store_path, exist_ok=True)
+            self._load_snapshot()
             
             if self.store_type.lower() == "faiss":
                 self._initialize_faiss()
             elif self.store_type.lower() == "chroma":
                 self._initialize_chroma()
+            elif self.store_type.lower() == "numpy":
+                self._initialize_numpy()
             else:
                 raise ValueError(f"Unsupported vector store type: {self.store_type}")
             
@@ -50,63 +70,99 @@ class VectorStore:
             self._store = self._create_empty_store()
             self._initialized = True
     
+    def _load_snapshot(self):
+        """Open the shipped knowledge snapshot if one matches the embedding model"""
+        if settings.knowledge_snapshot_path and os.path.exists(settings.knowledge_snapshot_path):
+            from knowledge.vector_store.snapshot import load_snapshot
+            
+            self.snapshot = load_snapshot(settings.knowledge_snapshot_path, self.embedder.model_name)
+    
     def _initialize_faiss(self):
-        """Initialize FAISS vector store"""
-        index_path = os.path.join(self.store_path, "faiss.index")
+        """Initialize FAISS vector store from its base checkpoint and segment log"""
+        from knowledge.vector_store.persistence import SegmentedFaissPersistence
         
-        if os.path.exists(index_path):
-            logger.info("Loading existing FAISS index")
-            self._store = FAISS.load_local(
-                self.store_path,
-                self.embedder.embeddings,
-                allow_dangerous_deserialization=True
-            )
-        else:
-            logger.info("Creating new FAISS index")
-            self._store = self._create_empty_store()
+        self._persistence = SegmentedFaissPersistence(
+            self.store_path,
+            self.embedder.embeddings,
+            fsync_policy=settings.vector_store_fsync_policy,
+            fsync_interval_ms=settings.vector_store_fsync_interval_ms,
+            segment_max_bytes=settings.vector_store_segment_max_bytes,
+            compact_min_bytes=settings.vector_store_compact_min_bytes,
+            compact_max_age_seconds=settings.vector_store_compact_max_age_seconds,
+            compact_check_interval_seconds=settings.vector_store_compact_check_interval_seconds
+        )
+        self._store = self._persistence.recover()
     
     def _initialize_chroma(self):
         """Initialize Chroma vector store"""
-        chroma_path = os.path.join(self.store_path, "chroma")
+        self._store = self._open_chroma()
+    
+    def _initialize_numpy(self):
+        """Initialize memory-mapped NumPy vector store"""
+        self._store = self._open_numpy()
+        logger.info(f"Loaded numpy index with {len(self._store)} documents")
+    
+    def _open_chroma(self):
+        from langchain_community.vectorstores import Chroma
         
-        self._store = Chroma(
-            persist_directory=chroma_path,
+        return Chroma(
+            persist_directory=os.path.join(self.store_path, "chroma"),
             embedding_function=self.embedder.embeddings
         )
     
+    def _open_numpy(self):
+        from knowledge.vector_store.numpy_store import NumpyVectorStore
+        
+        return NumpyVectorStore(
+            os.path.join(self.store_path, "numpy"),
+            self.embedder.embeddings
+        )
+    
     def _create_empty_store(self):
         """Create empty vector store"""
         if self.store_type.lower() == "faiss":
-            # Create dummy document and index
-            dummy_doc = Document(page_content="dummy", metadata={"source": "dummy"})
-            dummy_embedding = self.embedder.embed_text("dummy")
-            
-            # Create FAISS index with dummy data
-            self._store = FAISS.from_documents([dummy_doc], self.embedder.embeddings)
-            
-            # Remove dummy document
-            self._store.delete([dummy_doc.metadata.get("id", "dummy")])
+            # Never write over data that failed to recover; the index is created
+            # by the persistence layer on the first add, once the dimension is known
+            self._persistence = None
+            self._store = None
             
         elif self.store_type.lower() == "chroma":
-            chroma_path = os.path.join(self.store_path, "chroma")
-            self._store = Chroma(
-                persist_directory=chroma_path,
-                embedding_function=self.embedder.embeddings
-            )
+            self._store = self._open_chroma()
+            
+        elif self.store_type.lower() == "numpy":
+            self._store = self._open_numpy()
         
         return self._store
     
+    def document_count(self) -> int:
+        """Number of indexed documents (snapshot included), without embedding anything"""
+        store = self.store
+        count = len(self.snapshot) if self.snapshot else 0
+        if store is None:
+            return count
+        if self.store_type.lower() == "faiss":
+            return count + len(store.index_to_docstore_id)
+        if self.store_type.lower() == "numpy":
+            return count + len(store)
+        return count + store._collection.count()
+    
     def add_documents(self, documents: List[Document]) -> bool:
         """Add documents to vector store"""
         try:
             if self.store_type.lower() == "faiss":
-                self._store.add_documents(documents)
-                # Save FAISS index
-                self._store.save_local(self.store_path)
-            else:  # Chroma
-                self._store.add_documents(documents)
-                self._store.persist()
+                # Logged to an append-only segment; compaction rewrites the index in the background
+                self.store
+                if self._persistence is None:
+                    raise RuntimeError("FAISS persistence is unavailable")
+                self._persistence.add_documents(documents)
+                self._store = self._persistence.store
+            elif self.store_type.lower() == "numpy":
+                # Appends are persisted by the store itself
+                self.store.add_documents(documents)
+            else:  # Chroma persists each write itself
+                self.store.add_documents(documents)
             
+            self._bump_version()
             logger.info(f"Added {len(documents)} documents to {self.store_type}")
             return True
             
@@ -114,51 +170,220 @@ class VectorStore:
             logger.error(f"Failed to add documents: {e}")
             return False
     
+    def add_embeddings(self, documents: List[Document], vectors: List[List[float]]) -> bool:
+        """Add documents whose vectors were already computed, skipping the embedding call"""
+        try:
+            if self.store_type.lower() == "faiss":
+                self.store
+                if self._persistence is None:
+                    raise RuntimeError("FAISS persistence is unavailable")
+                self._persistence.add_embeddings(documents, vectors)
+                self._store = self._persistence.store
+            elif self.store_type.lower() == "numpy":
+                self.store.add_embeddings(documents, vectors)
+            else:  # Chroma embeds on insert; repeated texts are served by the embedding cache
+                self.store.add_documents(documents)
+            
+            self._bump_version()
+            logger.info(f"Added {len(documents)} embedded documents to {self.store_type}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to add embedded documents: {e}")
+            return False
+    
+    def delete_documents(self, ids: List[str]) -> bool:
+        """Delete documents by id"""
+        try:
+            if self.store_type.lower() == "faiss":
+                self.store
+                if self._persistence is None:
+                    raise RuntimeError("FAISS persistence is unavailable")
+                # Recorded as a tombstone; compaction drops it from the next base
+                self._persistence.delete(ids)
+            elif self.store_type.lower() == "chroma":
+                self.store.delete(ids)
+            else:
+                raise ValueError(f"Deletes are not supported by the {self.store_type} store")
+            
+            self._bump_version()
+            logger.info(f"Deleted {len(ids)} documents from {self.store_type}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to delete documents: {e}")
+            return False
+    
     def similarity_search(self, query: str, k: int = 5) -> List[Document]:
         """Search for similar documents"""
         try:
-            return self.store.similarity_search(query, k=k)
+            return self._search(query, k)
         except Exception as e:
             logger.error(f"Failed to perform similarity search: {e}")
             return []
     
+    def _search(self, query: str, k: int) -> List[Document]:
+        store = self.store
+        if self.snapshot:
+            embedding = self.embedder.embeddings.embed_query(query)
+            return [doc for doc, _ in self._layered_search(embedding, k)]
+        if store is None:
+            return []
+        return store.similarity_search(query, k=k)
+    
+    async def asimilarity_search(self, query: str, k: int = 5) -> List[Document]:
+        """Search for similar documents without blocking the event loop"""
+        try:
+            return await self._asearch(query, k)
+        except Exception as e:
+            logger.error(f"Failed to perform similarity search: {e}")
+            return []
+    
+    async def _asearch(self, query: str, k: int, embedding: Optional[List[float]] = None) -> List[Document]:
+        store = await self._aget_store()
+        if store is None and not self.snapshot:
+            return []
+        if embedding is None:
+            # Embed through the Embedder so concurrent queries share batched calls
+            embedding = await self.embedder.aembed_query(query)
+        if self.snapshot:
+            return [doc for doc, _ in await asyncio.to_thread(self._layered_search, embedding, k)]
+        return await store.asimilarity_search_by_vector(embedding, k=k)
+    
+    def _layered_search(self, embedding: List[float], k: int) -> List[Tuple[Document, float]]:
+        """Merge snapshot and live-store hits by cosine similarity"""
+        hits = self.snapshot.search_by_vector(embedding, k)
+        store = self._store
+        if store is not None:
+            if self.store_type.lower() == "numpy":
+                hits.extend(store.similarity_search_by_vector_with_score(embedding, k=k))
+            else:
+                if self.store_type.lower() == "faiss":
+                    scored = store.similarity_search_with_score_by_vector(embedding, k=k)
+                else:  # Chroma
+                    scored = store.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+                # Both return squared L2 distance d; for unit-length embeddings cosine = 1 - d / 2
+                hits.extend((doc, 1.0 - float(distance) / 2.0) for doc, distance in scored)
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return hits[:k]
+    
+    async def _aget_store(self):
+        """Initialize the store off the event loop on first use"""
+        if not self._initialized:
+            await asyncio.to_thread(lambda: self.store)
+        return self._store
+    
     def similarity_search_with_score(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
-        """Search with similarity scores"""
+        """Search with similarity scores (cosine similarity when a snapshot is loaded)"""
         try:
-            return self.store.similarity_search_with_score(query, k=k)
+            store = self.store
+            if self.snapshot:
+                return self._layered_search(self.embedder.embeddings.embed_query(query), k)
+            if store is None:
+                return []
+            return store.similarity_search_with_score(query, k=k)
         except Exception as e:
             logger.error(f"Failed to perform similarity search with score: {e}")
             return []
     
     def get_relevant_context(self, query: str, max_context_length: int = 1000) -> str:
         """Get relevant context for query"""
+        return self.lookup_relevant_context(query, max_context_length)[0]
+    
+    async def aget_relevant_context(self, query: str, max_context_length: int = 1000) -> str:
+        """Get relevant context for query without blocking the event loop"""
+        return (await self.alookup_relevant_context(query, max_context_length))[0]
+    
+    def lookup_relevant_context(self, query: str, max_context_length: int = 1000) -> Tuple[str, bool]:
+        """Get relevant context for query and whether it was served from the cache"""
+        version = self.version
+        if self.context_cache:
+            cached = self.context_cache.get(query, max_context_length, version)
+            if cached is not None:
+                return cached, True
+        
         try:
-            docs = self.similarity_search(query, k=3)
-            
-            context_parts = []
-            current_length = 0
-            
-            for doc in docs:
-                content = doc.page_content
-                if current_length + len(content) <= max_context_length:
-                    context_parts.append(content)
-                    current_length += len(content)
-                else:
-                    # Add partial content if space allows
-                    remaining_space = max_context_length - current_length
-                    if remaining_space > 50:  # Only add if meaningful space remains
-                        context_parts.append(content[:remaining_space] + "...")
-                    break
-            
-            return " ".join(context_parts)
-            
+            docs = self._search(query, 3)
+            context = self._assemble_context(docs, max_context_length)
+        except Exception as e:
+            logger.error(f"Failed to get relevant context: {e}")
+            return "", False
+        
+        if self.context_cache:
+            self.context_cache.put(query, max_context_length, version, context)
+        return context, False
+    
+    async def alookup_relevant_context(self, query: str, max_context_length: int = 1000,
+                                       embedding: Optional[List[float]] = None) -> Tuple[str, bool]:
+        """Async lookup_relevant_context; failed searches are not cached
+        
+        ``embedding`` is the query's embedding, if the caller already has it.
+        """
+        version = self.version
+        if self.context_cache:
+            cached = self.context_cache.get(query, max_context_length, version)
+            if cached is not None:
+                return cached, True
+        
+        try:
+            docs = await self._asearch(query, 3, embedding)
+            context = self._assemble_context(docs, max_context_length)
         except Exception as e:
             logger.error(f"Failed to get relevant context: {e}")
-            return ""
+            return "", False
+        
+        if self.context_cache:
+            self.context_cache.put(query, max_context_length, version, context)
+        return context, False
+    
+    def _bump_version(self):
+        """Invalidate cached context after the store contents change"""
+        self.version += 1
+        if self.context_cache:
+            self.context_cache.clear()
+    
+    def persistence_stats(self) -> Optional[Dict[str, Any]]:
+        """Segment log and compaction counters, or None for backends without segment persistence"""
+        return self._persistence.stats() if self._persistence else None
+    
+    def close(self):
+        """Flush pending writes and stop background persistence work"""
+        if self._persistence:
+            self._persistence.close()
+        if self.store_type.lower() == "numpy" and self._store is not None:
+            self._store.close()
+    
+    def context_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Context cache counters, or None when caching is disabled"""
+        return self.context_cache.stats() if self.context_cache else None
+    
+    def _assemble_context(self, docs: List[Document], max_context_length: int) -> str:
+        """Join retrieved documents into a context string within the length budget"""
+        context_parts = []
+        current_length = 0
+        
+        for doc in docs:
+            content = doc.page_content
+            if current_length + len(content) <= max_context_length:
+                context_parts.append(content)
+                current_length += len(content)
+            else:
+                # Add partial content if space allows
+                remaining_space = max_context_length - current_length
+                if remaining_space > 50:  # Only add if meaningful space remains
+                    context_parts.append(content[:remaining_space] + "...")
+                break
+        
+        return " ".join(context_parts)
     
     def initialize_sample_data(self) -> bool:
         """Initialize with sample reflection knowledge"""
-        sample_documents = [
+        return self.add_documents(self.sample_documents())
+    
+    @staticmethod
+    def sample_documents() -> List[Document]:
+        """Built-in seed knowledge, also the default content of the knowledge snapshot"""
+        return [
             Document(
                 page_content="Reflection is the process of looking inward to understand one's thoughts and feelings.",
                 metadata={"category": "reflection", "source": "philosophy"}
@@ -180,22 +405,24 @@ class VectorStore:
                 metadata={"category": "technique", "source": "coaching"}
             )
         ]
-        
-        return self.add_documents(sample_documents)
     
     def clear_store(self) -> bool:
         """Clear all documents from store"""
         try:
             if self.store_type.lower() == "faiss":
-                # Recreate empty FAISS index
-                self._store = self._create_empty_store()
+                # Checkpoint an empty base over every segment
+                self.store
+                if self._persistence is None:
+                    raise RuntimeError("FAISS persistence is unavailable")
+                self._persistence.clear()
+                self._store = None
+            elif self.store_type.lower() == "numpy":
+                self.store.clear()
             else:  # Chroma
                 self._store.delete_collection()
-                self._store = Chroma(
-                    persist_directory=os.path.join(self.store_path, "chroma"),
-                    embedding_function=self.embedder.embeddings
-                )
+                self._store = self._open_chroma()
             
+            self._bump_version()
             logger.info(f"Cleared {self.store_type} store")
             return True
             
@@ -1,19 +1,47 @@
+from core.utils.startup import startup_timer
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from api.routes import router
+from api.dependencies import get_chat_service
+from services.session_router import SessionAffinityMiddleware, create_session_router
 from config.settings import settings
 from core.utils.logger import logger
 
 # Load environment variables
 load_dotenv()
+startup_timer.mark("imports")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build and warm the chat service before the server accepts requests"""
+    startup_timer.mark("server_setup")
+    chat_service = get_chat_service()
+    startup_timer.mark("chat_service")
+    chat_service.warm_up()
+    chat_service.start_background_tasks()
+    app.state.session_router = create_session_router(chat_service.memory_manager)
+    startup_timer.mark("warm_up")
+    if settings.startup_timing_report:
+        startup_timer.log_report()
+    
+    yield
+    
+    if app.state.session_router:
+        await app.state.session_router.close()
+    await chat_service.reflection_engine.aclose()
+    chat_service.shutdown()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title=settings.app_name,
     description="Reflection-first AI companion API",
     version=settings.app_version,
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -25,6 +53,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Send each session's requests to the node that holds it (no-op unless clustered)
+app.add_middleware(SessionAffinityMiddleware)
+
 # Include API router
 app.include_router(router)
 
@@ -1,9 +1,12 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator, Tuple
 from pydantic import BaseModel
 from core.reflection_engine.engine import ReflectionEngine
 from core.memory.memory_manager import MemoryManager
+from core.memory.expiry import SessionExpiryWorker
 from core.constraint_validator.validator import ConstraintValidator
+from services.session_scheduler import SessionScheduler, SessionBusyError
 from core.utils.logger import logger
+from core.lexicon.registry import lexicon
 from config.settings import settings
 
 
@@ -11,6 +14,7 @@ class ChatRequest(BaseModel):
     """Request model for chat interactions"""
     message: str
     session_id: Optional[str] = None
+    user_id: Optional[str] = None  # enables recall from the user's earlier sessions
 
 
 class ChatResponse(BaseModel):
@@ -34,15 +38,48 @@ class ChatService:
     """Orchestrates the complete reflection pipeline"""
     
     def __init__(self):
-        self.reflection_engine = ReflectionEngine()
         self.memory_manager = MemoryManager(
             max_conversation_length=settings.max_conversation_length,
             session_timeout_minutes=settings.session_timeout_minutes
         )
+        # Shares the memory manager, so prompts and the API see the same sessions
+        self.reflection_engine = ReflectionEngine(memory_manager=self.memory_manager)
+        self.expiry_worker = SessionExpiryWorker(
+            self.memory_manager,
+            interval_seconds=settings.session_expiry_interval_seconds,
+            batch_budget=settings.session_expiry_batch_size
+        )
         self.constraint_validator = ConstraintValidator()
+        # One reflection at a time per session, so concurrent requests cannot interleave its history
+        self.scheduler = SessionScheduler(max_depth=settings.session_max_queued_requests)
         
         logger.info("ChatService initialized")
     
+    def warm_up(self):
+        """Load everything the first request would otherwise initialize"""
+        lexicon.compile()
+        vector_store = self.reflection_engine.vector_store
+        vector_store.store
+        vector_store.embedder.embeddings
+        logger.info(f"ChatService warmed up ({vector_store.document_count()} knowledge documents)")
+    
+    def start_background_tasks(self):
+        """Start background maintenance on the running event loop"""
+        if not self.memory_manager.store.native_ttl:
+            self.expiry_worker.start()
+        self.memory_manager.store.start()
+        if self.reflection_engine.long_term_memory:
+            self.reflection_engine.long_term_memory.start()
+    
+    def shutdown(self):
+        """Flush pending writes before the process exits"""
+        self.expiry_worker.stop()
+        if self.reflection_engine.long_term_memory:
+            self.reflection_engine.long_term_memory.close()
+        self.reflection_engine.vector_store.close()
+        self.memory_manager.close()
+        logger.info("ChatService shut down")
+    
     async def chat(self, request: ChatRequest) -> ChatResponse:
         """Process a chat request through the complete pipeline"""
         try:
@@ -57,15 +94,16 @@ class ChatService:
                 )
             
             # Step 2: Get or create session
-            session_id = request.session_id
-            if not session_id or not self.memory_manager.get_session(session_id):
-                session_id = self.memory_manager.create_session()
-                logger.info(f"Created new session: {session_id}")
+            session_id, user_id = self._resolve_session(request)
             
-            # Step 3: Generate reflection
-            reflection_result = self.reflection_engine.generate_reflection(
-                session_id=session_id,
-                user_message=request.message
+            # Step 3: Generate reflection, after any earlier request of the session
+            reflection_result = await self.scheduler.run(
+                session_id,
+                lambda: self.reflection_engine.agenerate_reflection(
+                    session_id=session_id,
+                    user_message=request.message,
+                    user_id=user_id
+                )
             )
             
             if not reflection_result["success"]:
@@ -87,6 +125,8 @@ class ChatService:
             logger.info(f"Chat completed successfully for session {session_id}")
             return response
             
+        except SessionBusyError:
+            raise
         except Exception as e:
             logger.error(f"Error in chat service: {e}")
             return ChatResponse(
@@ -96,6 +136,67 @@ class ChatService:
                 error="Service temporarily unavailable"
             )
     
+    async def chat_stream(self, request: ChatRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Process a chat request, yielding reflection events as they are generated
+        
+        SessionBusyError is raised before the first event, so callers can
+        reject the request before starting a response.
+        """
+        try:
+            input_validation = self.constraint_validator.validate_input(request.message)
+            if not input_validation.is_valid:
+                yield {
+                    "event": "error",
+                    "data": {
+                        "session_id": request.session_id or "",
+                        "success": False,
+                        "error": f"Invalid input: {', '.join(input_validation.violations)}"
+                    }
+                }
+                return
+            
+            session_id, user_id = self._resolve_session(request)
+            ticket = self.scheduler.reserve(session_id)
+            try:
+                yield {"event": "session", "data": {"session_id": session_id}}
+                
+                async with ticket:
+                    async for event in self.reflection_engine.astream_reflection(
+                        session_id=session_id,
+                        user_message=request.message,
+                        user_id=user_id
+                    ):
+                        yield event
+            finally:
+                # Also gives up the place if the client disconnects while queued
+                ticket.release()
+            
+            logger.info(f"Chat stream completed for session {session_id}")
+            
+        except SessionBusyError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in chat stream: {e}")
+            yield {
+                "event": "error",
+                "data": {
+                    "session_id": request.session_id or "",
+                    "success": False,
+                    "error": "Service temporarily unavailable"
+                }
+            }
+    
+    def _resolve_session(self, request: ChatRequest) -> Tuple[str, Optional[str]]:
+        """Return the request's session id, creating a new session if it is unknown, and its user id
+        
+        The user id is remembered with the session, so later requests may omit it.
+        """
+        session = self.memory_manager.get_session(request.session_id) if request.session_id else None
+        if not session:
+            user_context = {"user_id": request.user_id} if request.user_id else None
+            return self.memory_manager.create_session(user_context), request.user_id
+        return session.id, request.user_id or session.user_context.get("user_id")
+    
     async def get_session_info(self, session_id: str) -> Optional[SessionInfo]:
         """Get information about a session"""
         try:
@@ -116,21 +217,23 @@ class ChatService:
     
     async def get_conversation_history(self, session_id: str, max_messages: int = 10) -> list:
         """Get conversation history for a session"""
+        page = await self.get_history_page(session_id, max_messages)
+        return page["messages"] if page else []
+    
+    async def get_history_page(self, session_id: str, limit: int = 10, after: Optional[int] = None,
+                               before: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Get a cursor-addressed page of conversation history"""
         try:
-            context = self.memory_manager.get_conversation_context(session_id, max_messages)
-            return context[-max_messages:]  # Return most recent messages
+            return self.memory_manager.get_history_page(session_id, limit, after=after, before=before)
             
         except Exception as e:
             logger.error(f"Error getting conversation history: {e}")
-            return []
+            return None
     
     async def clear_session(self, session_id: str) -> bool:
         """Clear conversation history for a session"""
         try:
-            success = self.memory_manager.clear_session(session_id)
-            if success:
-                logger.info(f"Cleared session: {session_id}")
-            return success
+            return self.memory_manager.clear_session(session_id)
             
         except Exception as e:
             logger.error(f"Error clearing session: {e}")
@@ -139,10 +242,7 @@ class ChatService:
     async def delete_session(self, session_id: str) -> bool:
         """Delete a session entirely"""
         try:
-            success = self.memory_manager.delete_session(session_id)
-            if success:
-                logger.info(f"Deleted session: {session_id}")
-            return success
+            return self.memory_manager.delete_session(session_id)
             
         except Exception as e:
             logger.error(f"Error deleting session: {e}")
@@ -151,11 +251,7 @@ class ChatService:
     async def get_active_sessions_count(self) -> int:
         """Get count of active sessions"""
         try:
-            # Cleanup expired sessions first
-            cleaned_count = self.memory_manager.cleanup_expired_sessions()
-            if cleaned_count > 0:
-                logger.info(f"Cleaned up {cleaned_count} expired sessions")
-            
+            # Expired sessions are evicted by the background expiry worker
             return self.memory_manager.get_session_count()
             
         except Exception as e:
@@ -179,7 +275,7 @@ class ChatService:
             try:
                 # Simple test reflection
                 test_session = self.memory_manager.create_session()
-                test_result = self.reflection_engine.generate_reflection(
+                test_result = await self.reflection_engine.agenerate_reflection(
                     session_id=test_session,
                     user_message="Hello"
                 )
@@ -200,7 +296,9 @@ class ChatService:
                 session_count = self.memory_manager.get_session_count()
                 health_status["components"]["memory_manager"] = {
                     "status": "healthy",
-                    "active_sessions": session_count
+                    "active_sessions": session_count,
+                    "memory": self.memory_manager.get_memory_stats(),
+                    "expiry": self.expiry_worker.stats()
                 }
             except Exception as e:
                 health_status["components"]["memory_manager"] = {
@@ -208,6 +306,30 @@ class ChatService:
                     "error": str(e)
                 }
             
+            health_status["scheduler"] = self.scheduler.stats()
+            llm_stats = self.reflection_engine.llm_stats()
+            if llm_stats:
+                health_status["llm"] = llm_stats
+            
+            long_term_memory = self.reflection_engine.long_term_memory
+            if long_term_memory:
+                health_status["long_term_memory"] = long_term_memory.stats()
+            
+            # Embedding, retrieval cache and persistence counters
+            embedder = self.reflection_engine.vector_store.embedder
+            cache_stats = embedder.cache_stats()
+            if cache_stats:
+                health_status["embedding_cache"] = cache_stats
+            batch_stats = embedder.batch_stats()
+            if batch_stats:
+                health_status["embedding_batching"] = batch_stats
+            context_cache_stats = self.reflection_engine.vector_store.context_cache_stats()
+            if context_cache_stats:
+                health_status["context_cache"] = context_cache_stats
+            persistence_stats = self.reflection_engine.vector_store.persistence_stats()
+            if persistence_stats:
+                health_status["vector_store_persistence"] = persistence_stats
+            
             # Check constraint validator
             try:
                 test_validation = self.constraint_validator.validate_output("What feels unclear right now?")
@@ -247,9 +369,10 @@ class ChatService:
             # Add additional analytics
             session = self.memory_manager.get_session(session_id)
             if session:
+                stats = session.stats
                 summary["analytics"] = {
-                    "average_message_length": sum(len(msg.text) for msg in session.messages) / len(session.messages) if session.messages else 0,
-                    "user_to_lucid_ratio": len([m for m in session.messages if m.is_user]) / len([m for m in session.messages if not m.is_user]) if len([m for m in session.messages if not m.is_user]) > 0 else 0,
+                    "average_message_length": stats.total_length / stats.message_count if stats.message_count else 0,
+                    "user_to_lucid_ratio": stats.user_message_count / stats.assistant_message_count if stats.assistant_message_count > 0 else 0,
                     "session_duration_minutes": (session.last_activity - session.created_at).total_seconds() / 60
                 }
             
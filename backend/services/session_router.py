@@ -0,0 +1,400 @@
+from typing import Any, Dict, List, Optional
+from bisect import bisect
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import re
+import time
+import uuid
+from pydantic import BaseModel
+from core.memory.memory_manager import MemoryManager
+from core.memory.sharded_store import ShardedSessionStore
+from config.settings import settings
+from core.utils.logger import logger
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to node URLs
+
+    Every node is placed at ``virtual_nodes`` points on a 64-bit ring and a key
+    belongs to the first point at or after its own hash. Adding or removing one
+    of N nodes therefore moves only about 1/N of the keys.
+    """
+    
+    def __init__(self, nodes: List[str], virtual_nodes: int = 128):
+        self.nodes = sorted(set(nodes))
+        points = sorted((self._hash(f"{node}#{index}"), node) for node in self.nodes for index in range(virtual_nodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+    
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+    
+    def owner(self, key: str) -> str:
+        index = bisect(self._hashes, self._hash(key))
+        return self._owners[index % len(self._owners)]
+
+
+class ClusterNodes(BaseModel):
+    """New node list of the cluster"""
+    nodes: List[str]
+
+
+class SessionIds(BaseModel):
+    """Sessions another node asks to take over"""
+    session_ids: List[str]
+
+
+class SessionBlobs(BaseModel):
+    """Handed-off sessions as base64 blobs by session id"""
+    sessions: Dict[str, str]
+
+
+# Requests that name their session in the path, and those that carry it in a JSON body
+_SESSION_PATH = re.compile(r"^/api/v1/session/([^/]+)")
+_SESSION_BODY_PATHS = {"/api/v1/chat", "/api/v1/chat/stream"}
+# Hop-by-hop headers are not forwarded in either direction
+_HOP_HEADERS = {b"connection", b"keep-alive", b"transfer-encoding", b"te", b"upgrade", b"host", b"content-length"}
+# Set by the forwarding node itself, never copied from the client
+_CLUSTER_HEADERS = {b"x-lucid-forwarded", b"x-cluster-token"}
+
+
+class SessionRouter:
+    """Keeps every session on one owner node of a horizontally scaled deployment
+
+    Each node runs one, configured with the same node list. The owner of a
+    session is chosen on a HashRing; requests for sessions owned elsewhere are
+    forwarded over a pooled keep-alive client and streamed back. New sessions
+    get ids this node owns, so they never need to move.
+
+    When the node list changes, sessions whose owner changed are handed off
+    rather than recreated: this node pushes its moved sessions to their new
+    owners in the background, and a session requested from its new owner
+    before the push arrives is pulled from its previous owner on demand.
+    Either way a session is copied first and only released on the old node
+    once the new owner has acknowledged it. Pulls are tried for
+    ``handoff_window_seconds`` after the last change and after the local
+    handoff has finished, against every node list seen in between.
+    """
+    
+    FORWARDED_HEADER = "x-lucid-forwarded"
+    TOKEN_HEADER = "x-cluster-token"
+    # Sessions per handoff request
+    HANDOFF_BATCH = 100
+    
+    def __init__(self, memory_manager: MemoryManager, node_url: str, nodes: List[str], virtual_nodes: int = 128,
+                 timeout_seconds: float = 60.0, max_connections: int = 100, token: str = "",
+                 handoff_window_seconds: float = 60.0):
+        import httpx
+        self.memory_manager = memory_manager
+        self.store = memory_manager.store
+        self.node_url = node_url.rstrip("/")
+        self.virtual_nodes = virtual_nodes
+        if not token:
+            # Cluster endpoints export and delete other users' sessions, so they are never left open
+            raise ValueError("A cluster token is required when cluster nodes are configured")
+        self.token = token
+        self.ring = HashRing([node.rstrip("/") for node in nodes], virtual_nodes)
+        if self.node_url not in self.ring.nodes:
+            raise ValueError(f"Node {self.node_url} is not in the cluster node list")
+        self.handoff_window_seconds = handoff_window_seconds
+        # Node lists since the last settled one, oldest first; empty once handoff is over
+        self.previous_rings: List[HashRing] = []
+        self.client = httpx.AsyncClient(
+            timeout=timeout_seconds,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self._handoff_task: Optional[asyncio.Task] = None
+        memory_manager.session_id_factory = self.new_session_id
+        
+        self.forwarded = 0
+        self.forward_errors = 0
+        self.forward_ms_total = 0.0
+        self.handed_off = 0
+        self.received = 0
+        self.pulled = 0
+        logger.info(f"Session router for {self.node_url} across {len(self.ring.nodes)} nodes")
+    
+    def owns(self, session_id: str) -> bool:
+        return self.ring.owner(session_id) == self.node_url
+    
+    def new_session_id(self) -> str:
+        """A fresh session id owned by this node (about N draws for N nodes)"""
+        if self.node_url not in self.ring.nodes:
+            # Being drained: new sessions are only served until their next request
+            return str(uuid.uuid4())
+        while True:
+            session_id = str(uuid.uuid4())
+            if self.owns(session_id):
+                return session_id
+    
+    def authorized(self, token: Optional[str]) -> bool:
+        """Whether ``token`` is the cluster token"""
+        return bool(self.token) and token is not None and hmac.compare_digest(token, self.token)
+    
+    def _headers(self) -> Dict[str, str]:
+        headers = {self.FORWARDED_HEADER: self.node_url, self.TOKEN_HEADER: self.token}
+        return headers
+    
+    async def forward(self, owner: str, scope: Dict[str, Any], body: bytes, send):
+        """Replay a request on its owner node and stream the response back"""
+        url = owner + scope["path"] + (f"?{scope['query_string'].decode('latin-1')}" if scope["query_string"] else "")
+        headers = [(name.decode("latin-1"), value.decode("latin-1"))
+                   for name, value in scope["headers"] if name not in _HOP_HEADERS and name not in _CLUSTER_HEADERS]
+        headers.extend(self._headers().items())
+        started = time.perf_counter()
+        try:
+            request = self.client.build_request(scope["method"], url, headers=headers, content=body)
+            response = await self.client.send(request, stream=True)
+        except Exception as e:
+            self.forward_errors += 1
+            logger.error(f"Failed to forward {scope['path']} to {owner}: {e}")
+            await _send_json(send, 503, {"detail": "Session owner is unavailable"})
+            return
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [(name, value) for name, value in response.headers.raw if name.lower() not in _HOP_HEADERS]
+            })
+            async for chunk in response.aiter_raw():
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            await response.aclose()
+            self.forwarded += 1
+            self.forward_ms_total += (time.perf_counter() - started) * 1000
+    
+    async def ensure_local(self, session_id: str):
+        """Pull a session this node has just taken over from a previous owner"""
+        if not self.previous_rings or self.memory_manager.get_session(session_id) is not None:
+            return
+        tried = {self.node_url}
+        # Newest first: an older owner may already have pushed the session to a newer one
+        for previous in reversed(self.previous_rings):
+            previous_owner = previous.owner(session_id)
+            if previous_owner in tried:
+                continue
+            tried.add(previous_owner)
+            if await self._pull(previous_owner, session_id):
+                return
+    
+    async def _pull(self, previous_owner: str, session_id: str) -> bool:
+        try:
+            response = await self.client.post(f"{previous_owner}/api/v1/cluster/sessions/export",
+                                              json={"session_ids": [session_id]}, headers=self._headers())
+            response.raise_for_status()
+            sessions = response.json()["sessions"]
+            if not sessions:
+                return False
+            self.pulled += self.import_sessions(sessions)
+        except Exception as e:
+            logger.error(f"Failed to pull session {session_id} from {previous_owner}: {e}")
+            return False
+        try:
+            response = await self.client.post(f"{previous_owner}/api/v1/cluster/sessions/release",
+                                              json={"session_ids": list(sessions)}, headers=self._headers())
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Pulled session {session_id} but {previous_owner} did not release it: {e}")
+        return True
+    
+    def export_sessions(self, session_ids: List[str]) -> Dict[str, str]:
+        """Copies of the given sessions held here as base64 blobs"""
+        sessions = {}
+        for session_id in session_ids:
+            blob = self.store.export_session(session_id, remove=False)
+            if blob is not None:
+                sessions[session_id] = base64.b64encode(blob).decode("ascii")
+        return sessions
+    
+    def release_sessions(self, session_ids: List[str]) -> int:
+        """Remove sessions another node has acknowledged taking over"""
+        released = sum(self.store.delete(session_id) for session_id in session_ids)
+        self.handed_off += released
+        return released
+    
+    def import_sessions(self, sessions: Dict[str, str]) -> int:
+        imported = sum(self.store.import_session(base64.b64decode(blob)) for blob in sessions.values())
+        self.received += imported
+        return imported
+    
+    def set_nodes(self, nodes: List[str]):
+        """Adopt a new node list and start handing off sessions that now belong elsewhere"""
+        ring = HashRing([node.rstrip("/") for node in nodes], self.virtual_nodes)
+        self.previous_rings.append(self.ring)
+        self.ring = ring
+        logger.info(f"Cluster is now {len(ring.nodes)} nodes: {', '.join(ring.nodes)}")
+        if self._handoff_task is not None:
+            self._handoff_task.cancel()
+        self._handoff_task = asyncio.get_running_loop().create_task(self._hand_off())
+    
+    async def _hand_off(self):
+        moved: Dict[str, List[str]] = {}
+        for session_id in self.store.session_ids():
+            owner = self.ring.owner(session_id)
+            if owner != self.node_url:
+                moved.setdefault(owner, []).append(session_id)
+        started = time.monotonic()
+        results = await asyncio.gather(*(self._push(owner, session_ids) for owner, session_ids in moved.items()))
+        if moved:
+            logger.info(f"Handed off {sum(results)} of {sum(len(ids) for ids in moved.values())} moved sessions")
+        # Other nodes may still be pushing; keep pulling from them until the window closes
+        await asyncio.sleep(max(0.0, self.handoff_window_seconds - (time.monotonic() - started)))
+        self.previous_rings = []
+    
+    async def _push(self, owner: str, session_ids: List[str]) -> int:
+        pushed = 0
+        for index in range(0, len(session_ids), self.HANDOFF_BATCH):
+            # Copies: until the new owner has them, they can still be pulled from here
+            sessions = self.export_sessions(session_ids[index:index + self.HANDOFF_BATCH])
+            if not sessions:
+                continue
+            try:
+                response = await self.client.post(f"{owner}/api/v1/cluster/sessions/import",
+                                                  json={"sessions": sessions}, headers=self._headers())
+                response.raise_for_status()
+            except Exception as e:
+                logger.error(f"Failed to hand off {len(sessions)} sessions to {owner}: {e}")
+                continue
+            pushed += self.release_sessions(list(sessions))
+        return pushed
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "node": self.node_url,
+            "nodes": self.ring.nodes,
+            "handing_off": bool(self.previous_rings),
+            "forwarded": self.forwarded,
+            "forward_errors": self.forward_errors,
+            "mean_forward_ms": round(self.forward_ms_total / self.forwarded, 3) if self.forwarded else 0.0,
+            "handed_off": self.handed_off,
+            "received": self.received,
+            "pulled": self.pulled
+        }
+    
+    async def close(self):
+        if self._handoff_task is not None:
+            self._handoff_task.cancel()
+        await self.client.aclose()
+
+
+class SessionAffinityMiddleware:
+    """ASGI middleware sending each session's requests to its owner node
+
+    Uses the SessionRouter at ``app.state.session_router``; without one every
+    request is served locally, and requests are forwarded at most once. The
+    forwarded header is honoured only with a valid cluster token and is
+    stripped from any other request.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        router = getattr(scope["app"].state, "session_router", None) if scope["type"] == "http" else None
+        if router is None:
+            await self.app(scope, receive, send)
+            return
+        
+        body = None
+        match = _SESSION_PATH.match(scope["path"])
+        if match:
+            session_id = match.group(1)
+        elif scope["method"] == "POST" and scope["path"] in _SESSION_BODY_PATHS:
+            body = await _read_body(receive)
+            session_id = _body_session_id(body)
+        else:
+            session_id = None
+        
+        forwarded = _header(scope, SessionRouter.FORWARDED_HEADER.encode()) is not None
+        if forwarded:
+            token = _header(scope, SessionRouter.TOKEN_HEADER.encode())
+            if not router.authorized(token.decode("latin-1") if token is not None else None):
+                forwarded = False
+                scope = dict(scope, headers=[(name, value) for name, value in scope["headers"]
+                                             if name != SessionRouter.FORWARDED_HEADER.encode()])
+        
+        if session_id:
+            # A request another node forwarded is served here even if the rings disagree
+            owner = router.ring.owner(session_id)
+            if owner != router.node_url and not forwarded:
+                await router.forward(owner, scope, body if body is not None else await _read_body(receive), send)
+                return
+            await router.ensure_local(session_id)
+        await self.app(scope, _replay(body, receive) if body is not None else receive, send)
+
+
+def _header(scope: Dict[str, Any], name: bytes) -> Optional[bytes]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+def _body_session_id(body: bytes) -> Optional[str]:
+    try:
+        session_id = json.loads(body).get("session_id")
+    except (ValueError, AttributeError):
+        return None
+    return session_id if isinstance(session_id, str) else None
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+def _replay(body: bytes, receive):
+    """An ASGI receive that yields an already read body, then defers to the original"""
+    sent = False
+    
+    async def replay() -> Dict[str, Any]:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+    return replay
+
+
+async def _send_json(send, status: int, payload: Dict[str, Any]):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_session_router(memory_manager: MemoryManager) -> Optional[SessionRouter]:
+    """Session router from ``settings.cluster_*``, None when not clustered"""
+    nodes = [node.strip() for node in settings.cluster_nodes.split(",") if node.strip()]
+    if not nodes:
+        return None
+    if not isinstance(memory_manager.store, ShardedSessionStore):
+        logger.info("Sessions are shared through the session store; cluster routing is not needed")
+        return None
+    try:
+        return SessionRouter(
+            memory_manager,
+            settings.cluster_node_url,
+            nodes,
+            virtual_nodes=settings.cluster_virtual_nodes,
+            timeout_seconds=settings.cluster_forward_timeout_seconds,
+            max_connections=settings.cluster_max_connections,
+            token=settings.cluster_token,
+            handoff_window_seconds=settings.cluster_handoff_window_seconds
+        )
+    except Exception as e:
+        logger.error(f"Failed to start session router: {e}")
+        logger.warning("Serving every session locally")
+        return None
@@ -0,0 +1,154 @@
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+from collections import deque
+import asyncio
+import time
+from core.utils.logger import logger
+
+
+T = TypeVar("T")
+
+
+class SessionBusyError(Exception):
+    """Raised when a session already has as many requests queued as it may"""
+    
+    def __init__(self, session_id: str, depth: int):
+        super().__init__(f"Session {session_id} already has {depth} requests in flight")
+        self.session_id = session_id
+        self.depth = depth
+
+
+class _SessionQueue:
+    """Requests of one session: the running one plus those waiting, in arrival order"""
+    
+    __slots__ = ("waiters", "busy", "depth")
+    
+    def __init__(self):
+        self.waiters: deque = deque()
+        self.busy = False
+        self.depth = 0
+
+
+class SessionTicket:
+    """A reserved place in a session's queue; ``async with`` waits for its turn"""
+    
+    def __init__(self, scheduler: "SessionScheduler", session_id: str, turn: asyncio.Future):
+        self.scheduler = scheduler
+        self.session_id = session_id
+        self._turn = turn
+        self._reserved_at = time.perf_counter()
+        self._released = False
+    
+    async def __aenter__(self) -> "SessionTicket":
+        try:
+            await self._turn
+        except BaseException:
+            # Cancelled while queued: give up the place without running
+            self.release()
+            raise
+        self.scheduler._record_wait(time.perf_counter() - self._reserved_at)
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+    
+    def release(self):
+        """Leave the queue, handing the turn to the next request if this one held it"""
+        if not self._released:
+            self._released = True
+            self.scheduler._release(self.session_id, self._turn)
+
+
+class SessionScheduler:
+    """Runs each session's requests one at a time, in arrival order
+
+    Requests of different sessions run concurrently. A session admits at most
+    ``max_depth`` requests (the running one included); ``reserve`` rejects any
+    more right away with SessionBusyError rather than letting one noisy client
+    pile up work. Queues exist only while a session has requests in flight.
+    """
+    
+    def __init__(self, max_depth: int = 4):
+        self.max_depth = max_depth
+        self._queues: Dict[str, _SessionQueue] = {}
+        
+        self.admitted = 0
+        self.rejected = 0
+        self.queued = 0  # admitted requests that had to wait for an earlier one
+        self.max_depth_seen = 0
+        self.wait_ms_total = 0.0
+        self.max_wait_ms = 0.0
+        self._waits = 0
+    
+    def reserve(self, session_id: str) -> SessionTicket:
+        """Take the next place in the session's queue, or raise SessionBusyError"""
+        queue = self._queues.get(session_id)
+        if queue is None:
+            queue = self._queues[session_id] = _SessionQueue()
+        if queue.depth >= self.max_depth:
+            self.rejected += 1
+            logger.warning(f"Rejected request for session {session_id}: {queue.depth} already in flight")
+            raise SessionBusyError(session_id, queue.depth)
+        
+        turn = asyncio.get_running_loop().create_future()
+        if queue.busy:
+            queue.waiters.append(turn)
+            self.queued += 1
+        else:
+            queue.busy = True
+            turn.set_result(None)
+        queue.depth += 1
+        self.admitted += 1
+        self.max_depth_seen = max(self.max_depth_seen, queue.depth)
+        return SessionTicket(self, session_id, turn)
+    
+    async def run(self, session_id: str, work: Callable[[], Awaitable[T]]) -> T:
+        """Await ``work()`` once every earlier request of the session has finished"""
+        async with self.reserve(session_id):
+            return await work()
+    
+    def _release(self, session_id: str, turn: asyncio.Future):
+        queue = self._queues[session_id]
+        queue.depth -= 1
+        if turn.done() and not turn.cancelled():
+            # This request held the turn; pass it to the oldest live waiter
+            queue.busy = False
+            while queue.waiters:
+                waiter = queue.waiters.popleft()
+                if not waiter.done():
+                    queue.busy = True
+                    waiter.set_result(None)
+                    break
+        else:
+            try:
+                queue.waiters.remove(turn)
+            except ValueError:
+                pass
+        if queue.depth == 0:
+            del self._queues[session_id]
+    
+    def _record_wait(self, seconds: float):
+        wait_ms = seconds * 1000
+        self._waits += 1
+        self.wait_ms_total += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+    
+    def depth(self, session_id: str) -> int:
+        """Requests of the session running or waiting"""
+        queue = self._queues.get(session_id)
+        return queue.depth if queue else 0
+    
+    def stats(self) -> Dict[str, Any]:
+        depths = [queue.depth for queue in self._queues.values()]
+        return {
+            "max_depth": self.max_depth,
+            "active_sessions": len(depths),
+            "in_flight": sum(depths),
+            "waiting": sum(depth - 1 for depth in depths),
+            "deepest_queue": max(depths, default=0),
+            "max_depth_seen": self.max_depth_seen,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "mean_wait_ms": round(self.wait_ms_total / self._waits, 3) if self._waits else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 3)
+        }
@@ -0,0 +1,18 @@
+import os
+import sys
+import pytest
+
+# Modules import each other from the backend directory, as when the server runs there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import settings
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory, so data/ paths from settings never touch the checkout"""
+    monkeypatch.chdir(tmp_path)
+    # No credentials: embeddings fall back to DummyEmbeddings and nothing calls the API
+    monkeypatch.setattr(settings, "openai_api_key", None)
+    monkeypatch.setattr(settings, "startup_timing_report", False)
+    return tmp_path
@@ -0,0 +1,58 @@
+import asyncio
+import time
+import httpx
+from langchain_core.messages import AIMessage
+from config.settings import settings
+from api.dependencies import get_chat_service
+from main import app
+
+
+class SleepingLLM:
+    """Stands in for ChatOpenAI: every call takes ``latency`` seconds without blocking the loop"""
+    
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+    
+    async def ainvoke(self, messages):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return AIMessage(content="What feels most important to you right now?")
+
+
+async def _chat_concurrently(count: int, llm: SleepingLLM):
+    async with app.router.lifespan_context(app):
+        get_chat_service().reflection_engine.llm = llm
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # First request pays for lazy initialization; only the concurrent ones are timed
+            await client.post("/api/v1/chat", json={"message": "I feel stuck at work lately"})
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.post("/api/v1/chat", json={"message": f"I keep worrying about my plans {index}"})
+                for index in range(count)
+            ))
+            return responses, time.perf_counter() - started
+
+
+def test_concurrent_chats_finish_in_about_one_llm_latency(workdir, monkeypatch):
+    monkeypatch.setattr(settings, "test_mode", False)
+    get_chat_service.cache_clear()
+    count, latency = 10, 0.5
+    llm = SleepingLLM(latency)
+    
+    responses, elapsed = asyncio.run(_chat_concurrently(count, llm))
+    get_chat_service.cache_clear()
+    
+    bodies = [response.json() for response in responses]
+    assert all(response.status_code == 200 for response in responses)
+    assert all(body["success"] for body in bodies), bodies
+    assert len({body["session_id"] for body in bodies}) == count
+    assert llm.max_in_flight == count
+    # About max(latency), far from the count * latency of serialized calls
+    assert latency <= elapsed < 2 * latency, f"{count} calls took {elapsed:.2f}s"
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import random
+import httpx
+from langchain_core.messages import AIMessageChunk
+from config.settings import settings
+from api.dependencies import get_chat_service
+from core.constraint_validator.incremental import IncrementalConstraintChecker
+from core.constraint_validator.rules import ConstraintRules
+from main import app
+
+RESPONSES = [
+    "What feels most uncertain about that choice for you?",
+    "It sounds like you should rest. What would that give you?",
+    "Maybe you could talk to them. Have you thought about it?",
+    "What does being stuck at work look like day to day?",
+    "I recommend writing it down first, then what comes next?"
+]
+
+
+def _chunks(text: str, rng: random.Random):
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 6)
+        yield text[position:position + size]
+        position += size
+
+
+def test_chunked_checks_match_whole_text_checks():
+    rng = random.Random(7)
+    for text in RESPONSES:
+        expected = (ConstraintRules.validate_no_directive(text).violations
+                    + ConstraintRules.validate_reflective_only(text).violations)
+        for _ in range(20):
+            checker = IncrementalConstraintChecker()
+            for chunk in _chunks(text, rng):
+                if checker.feed(chunk):
+                    break
+            # Streaming stops at the first certain violation, which the whole-text check also reports
+            assert set(checker.violations) <= set(expected), (text, checker.violations)
+            assert bool(checker.violations) == bool(expected), text
+
+
+def test_questions_and_length_are_checked_as_text_arrives():
+    checker = IncrementalConstraintChecker()
+    assert checker.feed("What is it? ") == []
+    assert checker.feed("And why?") == ["Multiple questions found: 2"]
+    
+    checker = IncrementalConstraintChecker(max_length=12)
+    assert checker.feed("   What is ") == []
+    # Leading and trailing whitespace does not count, as validate_output strips it
+    assert checker.feed("it?     ") == []
+    assert checker.feed("x") == ["Response too long: 17 > 12"]
+    assert IncrementalConstraintChecker().max_length == ConstraintRules.MAX_LENGTH
+
+
+class StreamingLLM:
+    """Stands in for ChatOpenAI's astream, yielding fixed chunks"""
+    
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+    
+    async def astream(self, messages):
+        try:
+            for chunk in self.chunks:
+                await asyncio.sleep(0)
+                yield AIMessageChunk(content=chunk)
+        finally:
+            self.closed = True
+
+
+async def _stream(llm: StreamingLLM):
+    async with app.router.lifespan_context(app):
+        get_chat_service().reflection_engine.llm = llm
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/api/v1/chat/stream", json={"message": "I feel stuck at work lately"})
+    assert response.status_code == 200
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        name, data = block.split("\n")
+        events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def _run(llm: StreamingLLM, monkeypatch):
+    monkeypatch.setattr(settings, "test_mode", False)
+    get_chat_service.cache_clear()
+    try:
+        return asyncio.run(_stream(llm))
+    finally:
+        get_chat_service.cache_clear()
+
+
+def test_stream_is_reset_to_the_fallback_on_a_violation(workdir, monkeypatch):
+    llm = StreamingLLM(["What keeps ", "you there? ", "You sh", "ould quit.", " Then rest."])
+    events = _run(llm, monkeypatch)
+    
+    names = [name for name, _ in events]
+    # "You sh" went out before the pattern was complete; the reset withdraws it
+    assert names == ["session", "token", "token", "token", "reset", "token", "done"]
+    assert events[4][1] == {"violations": ["Directive language detected: 'you should'"]}
+    fallback = events[5][1]
+    done = events[-1][1]
+    assert done["response"] == fallback and done["validation"]["is_valid"]
+    assert done["metadata"]["stream_aborted"]
+    assert llm.closed
+
+
+def test_final_validation_replaces_a_stream_without_a_question(workdir, monkeypatch):
+    llm = StreamingLLM(["It sounds like ", "work feels heavy ", "right now."])
+    events = _run(llm, monkeypatch)
+    
+    names = [name for name, _ in events]
+    assert names == ["session", "token", "token", "token", "reset", "token", "done"]
+    assert events[4][1] == {"violations": []}
+    done = events[-1][1]
+    assert done["response"] == events[5][1] != "It sounds like work feels heavy right now."
+    assert not done["metadata"]["stream_aborted"]
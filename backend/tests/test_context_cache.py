@@ -0,0 +1,52 @@
+from langchain_core.documents import Document
+from knowledge.embeddings.embedder import DummyEmbeddings
+from knowledge.vector_store import context_cache
+from knowledge.vector_store.context_cache import ContextCache
+from knowledge.vector_store.store import VectorStore
+
+
+def test_entries_are_versioned_expire_and_stay_bounded(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(context_cache.time, "monotonic", lambda: now[0])
+    cache = ContextCache(max_entries=2, ttl_seconds=60.0)
+    
+    cache.put("What is Stoicism?", 1000, 1, "stoic context")
+    assert cache.get("  what is   stoicism? ", 1000, 1) == "stoic context"
+    # Another length budget is another entry, a newer store version a miss
+    assert cache.get("what is stoicism?", 500, 1) is None
+    assert cache.get("what is stoicism?", 1000, 2) is None
+    assert cache.stats()["entries"] == 0
+    
+    cache.put("a", 1000, 2, "context a")
+    now[0] += 61.0
+    assert cache.get("a", 1000, 2) is None
+    
+    for query in ("b", "c", "d"):
+        cache.put(query, 1000, 2, f"context {query}")
+    assert cache.get("b", 1000, 2) is None and cache.get("d", 1000, 2) == "context d"
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["evictions"] == 1 and stats["entries"] == 2
+
+
+def test_store_writes_invalidate_cached_context(workdir):
+    store = VectorStore(store_type="numpy", store_path=str(workdir / "vector_store"))
+    store.embedder._embeddings = DummyEmbeddings()
+    documents = VectorStore.sample_documents()
+    store.add_documents(documents)
+    query = documents[0].page_content
+    
+    context, cached = store.lookup_relevant_context(query)
+    assert not cached and context.startswith(query)
+    assert store.lookup_relevant_context(query.upper()) == (context, True)
+    
+    version = store.version
+    store.add_documents([Document(page_content=query + " Revisited.", metadata={"source": "test"})])
+    assert store.version == version + 1
+    refreshed, cached = store.lookup_relevant_context(query)
+    assert not cached
+    assert store.lookup_relevant_context(query) == (refreshed, True)
+    
+    # A lookup that began before the write stores its result under the old version, which is never served
+    store.context_cache.put(query, 1000, version, "stale")
+    assert store.lookup_relevant_context(query) == (refreshed, False)
+    store.close()
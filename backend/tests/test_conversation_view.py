@@ -0,0 +1,44 @@
+from core.memory.history import ConversationView, Message, MessageRing
+from core.memory.memory_manager import MemoryManager
+from core.memory.memory_store import InMemorySessionStore
+
+
+def test_view_is_a_window_over_the_ring():
+    ring = MessageRing(4, (Message(text=f"m{index}", is_user=index % 2 == 0) for index in range(3)))
+    view = ConversationView(ring)
+    ring.append(Message(text="m3", is_user=False))
+    # Later appends are not visible, evicted messages drop off the front
+    assert [msg.text for msg in view] == ["m0", "m1", "m2"]
+    ring.append(Message(text="m4"))
+    assert [msg.text for msg in view] == ["m1", "m2"] and view.start == 1
+    
+    latest = ConversationView(ring)
+    assert [msg.text for msg in latest[-2:]] == ["m3", "m4"]
+    assert latest[-1].text == "m4" and len(latest[1:3]) == 2
+    assert [msg.text for msg in latest.after(2, 2)] == ["m2", "m3"]
+    assert [msg.text for msg in latest.before(4, 2)] == ["m2", "m3"]
+    assert [msg.text for msg in latest.last_user_messages(2)] == ["m2", "m4"]
+
+
+def test_history_pages_follow_cursors_across_eviction():
+    memory = MemoryManager(max_conversation_length=6, store=InMemorySessionStore())
+    session_id = memory.create_session()
+    for index in range(10):
+        memory.add_message(session_id, f"m{index}", is_user=index % 2 == 0)
+    
+    newest = memory.get_history_page(session_id, limit=4)
+    assert [msg["cursor"] for msg in newest["messages"]] == [6, 7, 8, 9]
+    assert (newest["start"], newest["end"]) == (6, 10)
+    assert newest["has_more_before"] and not newest["has_more_after"]
+    
+    older = memory.get_history_page(session_id, limit=4, before=newest["start"])
+    # Only positions 4 and 5 are still retained
+    assert [msg["text"] for msg in older["messages"]] == ["m4", "m5"]
+    assert not older["has_more_before"] and older["has_more_after"]
+    
+    memory.add_message(session_id, "m10")
+    newer = memory.get_history_page(session_id, limit=4, after=newest["end"])
+    assert [(msg["cursor"], msg["text"]) for msg in newer["messages"]] == [(10, "m10")]
+    # A cursor that has been evicted resumes at the oldest retained message
+    assert memory.get_history_page(session_id, limit=1, after=0)["messages"][0]["cursor"] == 5
+    assert memory.get_history_page("missing") is None
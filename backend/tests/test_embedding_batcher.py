@@ -0,0 +1,49 @@
+import asyncio
+from knowledge.embeddings.batcher import EmbeddingBatcher
+
+
+class Backend:
+    """Records batches and answers each text with a one-element vector"""
+    
+    def __init__(self, drop: int = 0, delay: float = 0.0):
+        self.batches = []
+        self.drop = drop
+        self.delay = delay
+    
+    async def embed(self, texts):
+        self.batches.append(list(texts))
+        await asyncio.sleep(self.delay)
+        return [[float(len(text))] for text in texts][self.drop:]
+
+
+def test_concurrent_requests_share_one_deduplicated_batch():
+    backend = Backend()
+    
+    async def scenario():
+        batcher = EmbeddingBatcher(backend.embed, window_ms=5.0)
+        return await asyncio.gather(*(batcher.embed(text) for text in ["a", "bb", "a", "ccc"]))
+    
+    assert asyncio.run(scenario()) == [[1.0], [2.0], [1.0], [3.0]]
+    assert backend.batches == [["a", "bb", "ccc"]]
+
+
+def test_short_answer_fails_every_caller():
+    async def scenario():
+        batcher = EmbeddingBatcher(Backend(drop=1).embed, window_ms=1.0)
+        return await asyncio.gather(batcher.embed("a"), batcher.embed("bb"), return_exceptions=True)
+    
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_batch_does_not_leave_callers_waiting():
+    async def scenario():
+        batcher = EmbeddingBatcher(Backend(delay=10.0).embed, window_ms=1.0)
+        callers = [asyncio.ensure_future(batcher.embed(text)) for text in ["a", "bb"]]
+        await asyncio.sleep(0.05)
+        for task in list(batcher._in_flight):
+            task.cancel()
+        return await asyncio.wait_for(asyncio.gather(*callers, return_exceptions=True), timeout=1.0)
+    
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
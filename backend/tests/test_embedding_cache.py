@@ -0,0 +1,60 @@
+import asyncio
+import sqlite3
+from langchain_core.embeddings import Embeddings
+from knowledge.embeddings.cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings(Embeddings):
+    """Answers each text with a two-element vector and records what it was asked"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+    
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_normalized_texts_share_entries_per_model(workdir):
+    cache = EmbeddingCache("model-a", path=str(workdir / "cache.sqlite3"))
+    cache.put("café  au\tlait", [1.0, 2.0])
+    
+    # NFD spelling and different whitespace map to the same key
+    assert cache.get(" cafe\u0301 au lait\n") == [1.0, 2.0]
+    assert EmbeddingCache("model-b", path=str(workdir / "cache.sqlite3")).get("café au lait") is None
+    
+    restarted = EmbeddingCache("model-a", path=str(workdir / "cache.sqlite3"))
+    assert restarted.get("café au lait") == [1.0, 2.0]
+    assert restarted.stats()["disk_hits"] == 1 and restarted.stats()["memory_entries"] == 1
+
+
+def test_memory_level_evicts_by_bytes_and_disk_level_is_pruned(workdir):
+    path = str(workdir / "cache.sqlite3")
+    # Two float32 vectors of four elements fit in memory
+    cache = EmbeddingCache("model", max_bytes=32, path=path, max_disk_entries=100)
+    for index in range(3):
+        cache.put(f"text {index}", [float(index)] * 4)
+    stats = cache.stats()
+    assert stats["memory_entries"] == 2 and stats["memory_bytes"] == 32 and stats["evictions"] == 1
+    assert cache.get("text 0") == [0.0] * 4
+    assert cache.stats()["disk_hits"] == 1
+    
+    cache.put_many([f"bulk {index}" for index in range(1000)], [[1.0]] * 1000)
+    rows = sqlite3.connect(path).execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    assert rows == 100
+    # The newest rows survive the prune
+    assert cache.get("bulk 999") == [1.0]
+
+
+def test_cached_embeddings_only_embed_misses(workdir):
+    backend = CountingEmbeddings()
+    embeddings = CachedEmbeddings(backend, EmbeddingCache("model", path=str(workdir / "cache.sqlite3")))
+    
+    assert embeddings.embed_documents(["a", "bb"]) == [[1.0, 0.5], [2.0, 0.5]]
+    assert embeddings.embed_documents(["bb", "ccc", "a "]) == [[2.0, 0.5], [3.0, 0.5], [1.0, 0.5]]
+    assert asyncio.run(embeddings.aembed_query("dddd")) == [4.0, 0.5]
+    assert asyncio.run(embeddings.aembed_documents(["a", "dddd", "eeeee"])) == [[1.0, 0.5], [4.0, 0.5], [5.0, 0.5]]
+    assert backend.calls == [["a", "bb"], ["ccc"], ["dddd"], ["eeeee"]]
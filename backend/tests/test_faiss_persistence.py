@@ -0,0 +1,32 @@
+import time
+import pytest
+from langchain_core.documents import Document
+from knowledge.embeddings.embedder import DummyEmbeddings
+
+pytest.importorskip("faiss")
+
+from knowledge.vector_store.persistence import SegmentedFaissPersistence
+
+
+def test_idle_store_compacts_old_segments_on_the_timer(workdir):
+    persistence = SegmentedFaissPersistence(str(workdir / "faiss"), DummyEmbeddings(),
+                                            compact_max_age_seconds=0.2, compact_check_interval_seconds=0.05)
+    persistence.recover()
+    persistence.add_documents([Document(page_content="I feel stuck at work")])
+    compactions = persistence.compactions
+    
+    # No further writes: only the timer can notice the segment has aged
+    deadline = time.monotonic() + 5.0
+    while persistence.compactions == compactions and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert persistence.compactions > compactions
+    assert persistence.stats()["segment_bytes"] == 0
+    
+    persistence.close()
+    assert not persistence._compaction_timer.is_alive()
+    
+    reopened = SegmentedFaissPersistence(str(workdir / "faiss"), DummyEmbeddings(), compact_check_interval_seconds=0)
+    assert reopened.recover() is not None
+    assert reopened.document_count() == 1
+    assert reopened._compaction_timer is None
+    reopened.close()
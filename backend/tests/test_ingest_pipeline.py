@@ -0,0 +1,54 @@
+import asyncio
+import json
+from knowledge.embeddings.embedder import DummyEmbeddings
+from knowledge.ingest.pipeline import IngestCheckpoint, IngestPipeline
+from knowledge.vector_store.store import VectorStore
+
+
+def _corpus(workdir, count: int) -> str:
+    path = workdir / "corpus.jsonl"
+    lines = [json.dumps({"text": f"Reflection note number {index}.", "topic": "notes"}) for index in range(count)]
+    # A repeated record is indexed once
+    lines.append(json.dumps({"text": "Reflection note number 0."}))
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def _pipeline(workdir, store: VectorStore) -> IngestPipeline:
+    return IngestPipeline(store, batch_size=2, max_concurrency=1, checkpoint_path=str(workdir / "ingest.sqlite3"))
+
+
+def test_resume_after_a_failed_batch_indexes_each_chunk_once(workdir):
+    store = VectorStore(store_type="numpy", store_path=str(workdir / "vector_store"))
+    store.embedder._embeddings = DummyEmbeddings()
+    corpus = _corpus(workdir, 10)
+    
+    add_embeddings = store.add_embeddings
+    calls = []
+    
+    def failing_third_batch(documents, vectors):
+        calls.append(len(documents))
+        return False if len(calls) == 3 else add_embeddings(documents, vectors)
+    store.add_embeddings = failing_third_batch
+    
+    report = asyncio.run(_pipeline(workdir, store).run(corpus))
+    assert (report.records, report.batches, report.indexed, report.failed, report.duplicates) == (11, 5, 8, 2, 1)
+    assert store.document_count() == 8
+    checkpoint = IngestCheckpoint(str(workdir / "ingest.sqlite3"), corpus)
+    # Batches after the failed one were written, but progress stops before it. A
+    # batch that fills up on a record's last chunk does not yet count the record
+    # as complete, so the first two batches only cover records 0 to 2
+    assert checkpoint.position() == 3
+    checkpoint.close()
+    
+    store.add_embeddings = add_embeddings
+    report = asyncio.run(_pipeline(workdir, store).run(corpus))
+    assert report.resumed_from == 3
+    assert (report.records, report.indexed, report.failed, report.duplicates) == (8, 2, 0, 6)
+    assert store.document_count() == 10
+    texts = {doc.page_content for doc in store.similarity_search("Reflection note", k=20)}
+    assert texts == {f"Reflection note number {index}." for index in range(10)}
+    
+    report = asyncio.run(_pipeline(workdir, store).run(corpus))
+    assert report.resumed_from == 11 and report.records == 0
+    store.close()
@@ -0,0 +1,19 @@
+from app.safety_layer import SafetyLayer
+from core.lexicon.automaton import AhoCorasick, _CharClasses
+from core.lexicon.registry import lexicon
+
+
+def test_unmatched_characters_do_not_grow_the_class_table():
+    automaton = AhoCorasick(["you should", "café"])
+    size = len(automaton._classes)
+    text = "".join(chr(codepoint) for codepoint in range(0x4e00, 0x5e00)) + " café "
+    assert automaton.find_all(text)
+    assert len(automaton._classes) <= size + _CharClasses.CACHED_CODEPOINTS
+
+
+def test_safety_layer_registers_its_terms_once():
+    lexicon.compile()
+    compiled = lexicon._automaton
+    result = SafetyLayer().check_message("Just tell me what I should do")
+    assert lexicon._automaton is compiled
+    assert result.requires_redirection and result.risk_level == "low"
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import httpx
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+from core.reflection_engine.llm_client import ChatCompletionsClient
+
+MESSAGES = [SystemMessage(content="Reflect the user's words back"), HumanMessage(content="I feel stuck at work")]
+
+
+def _client(handler) -> ChatCompletionsClient:
+    """A client whose requests are answered by ``handler`` instead of the network"""
+    client = ChatCompletionsClient("test-key", "test-model", base_url="http://llm.test/v1", max_tokens=64)
+    headers = client._client.headers
+    client._client = httpx.Client(headers=headers, transport=httpx.MockTransport(handler))
+    client._aclient = httpx.AsyncClient(headers=headers, transport=httpx.MockTransport(handler))
+    return client
+
+
+def _completion(request: httpx.Request) -> httpx.Response:
+    payload = json.loads(request.content)
+    assert request.url == "http://llm.test/v1/chat/completions"
+    assert request.headers["authorization"] == "Bearer test-key"
+    assert payload["model"] == "test-model" and payload["max_tokens"] == 64
+    assert payload["messages"] == [
+        {"role": "system", "content": "Reflect the user's words back"},
+        {"role": "user", "content": "I feel stuck at work"}
+    ]
+    if payload.get("stream"):
+        events = [{"choices": [{"delta": {"role": "assistant"}}]}]
+        events += [{"choices": [{"delta": {"content": token}}]} for token in ("What ", "holds ", "you ", "back?")]
+        body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+    return httpx.Response(200, json={
+        "choices": [{"message": {"role": "assistant", "content": "What holds you back?"}}],
+        "usage": {"total_tokens": 12}
+    })
+
+
+def test_invoke_and_ainvoke_return_the_completion():
+    client = _client(_completion)
+    
+    completion = client.invoke(MESSAGES)
+    assert completion.content == "What holds you back?"
+    assert completion.usage == {"total_tokens": 12}
+    assert asyncio.run(client.ainvoke(MESSAGES)).content == "What holds you back?"
+    
+    stats = client.stats()
+    assert stats["calls"] == 2 and stats["errors"] == 0
+    asyncio.run(client.aclose())
+
+
+def test_astream_yields_deltas_and_early_close_is_not_an_error():
+    client = _client(_completion)
+    
+    async def scenario():
+        tokens = [chunk.content async for chunk in client.astream(MESSAGES)]
+        stream = client.astream(MESSAGES)
+        first = await stream.__anext__()
+        await stream.aclose()
+        return tokens, first.content
+    
+    tokens, first = asyncio.run(scenario())
+    assert tokens == ["What ", "holds ", "you ", "back?"]
+    assert first == "What "
+    stats = client.stats()
+    assert stats["calls"] == 2 and stats["errors"] == 0
+    assert stats["mean_first_token_ms"] > 0
+    asyncio.run(client.aclose())
+
+
+@pytest.mark.parametrize("failure", ["status", "timeout"])
+def test_http_errors_and_timeouts_are_counted(failure):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if failure == "timeout":
+            raise httpx.ReadTimeout("timed out", request=request)
+        return httpx.Response(503, json={"error": {"message": "overloaded"}})
+    client = _client(handler)
+    
+    async def stream():
+        return [chunk async for chunk in client.astream(MESSAGES)]
+    
+    with pytest.raises(httpx.HTTPError):
+        client.invoke(MESSAGES)
+    with pytest.raises(httpx.HTTPError):
+        asyncio.run(client.ainvoke(MESSAGES))
+    with pytest.raises(httpx.HTTPError):
+        asyncio.run(stream())
+    
+    stats = client.stats()
+    assert stats["calls"] == 3 and stats["errors"] == 3
+    asyncio.run(client.aclose())
@@ -0,0 +1,46 @@
+import pytest
+from core.memory.history import Message, MessageRing, intern_metadata
+
+
+def _ring(capacity: int, count: int) -> MessageRing:
+    ring = MessageRing(capacity)
+    for index in range(count):
+        ring.append(Message(text=f"m{index}", is_user=index % 2 == 0))
+    return ring
+
+
+def test_positions_stay_absolute_across_eviction():
+    ring = _ring(3, 2)
+    assert ring.append(Message(text="m2")) is None
+    evicted = ring.append(Message(text="m3"))
+    
+    assert evicted.text == "m0"
+    assert (ring.first, ring.end, len(ring)) == (1, 4, 3)
+    assert ring.get(3).text == "m3" and ring.get(1).text == "m1"
+    with pytest.raises(IndexError):
+        ring.get(0)
+    assert [(position, msg.text) for position, msg in ring.items(0, 10)] == [(1, "m1"), (2, "m2"), (3, "m3")]
+    
+    assert ring.popleft().text == "m1"
+    ring.clear()
+    # Positions keep counting after trims and clears
+    assert (ring.first, ring.end) == (4, 4)
+    ring.append(Message(text="m4"))
+    assert ring.get(4).text == "m4"
+
+
+def test_ring_grows_only_to_what_it_holds():
+    ring = _ring(20, 2)
+    assert len(ring._buffer) == 2
+    restored = MessageRing(20, (Message(text=f"m{index}") for index in range(5)), first=40)
+    assert (restored.first, restored.end) == (40, 45)
+    assert [msg.text for msg in restored] == ["m0", "m1", "m2", "m3", "m4"]
+
+
+def test_messages_are_slotted_and_share_metadata():
+    first = Message(text="hi", metadata=intern_metadata({"validation": {"is_valid": True}}))
+    second = Message(text="hey", metadata=intern_metadata({"validation": {"is_valid": True}}))
+    assert first.metadata is second.metadata
+    assert not hasattr(first, "__dict__")
+    assert first.id != second.id and first.id == first.id
+    assert first.to_dict(cursor=7)["cursor"] == 7
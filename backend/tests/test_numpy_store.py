@@ -0,0 +1,49 @@
+import os
+from langchain_core.documents import Document
+from knowledge.embeddings.embedder import DummyEmbeddings
+from knowledge.vector_store.numpy_store import NumpyVectorStore
+
+
+def _open_descriptors() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+def _documents(prefix: str, count: int):
+    return [Document(page_content=f"{prefix} {index}", metadata={"index": index}) for index in range(count)]
+
+
+def test_appends_reuse_one_documents_descriptor(workdir):
+    store = NumpyVectorStore(str(workdir / "numpy"), DummyEmbeddings())
+    store.add_documents(_documents("first", 2))
+    before = _open_descriptors()
+    documents_file = store._maps[2]
+    for batch in range(20):
+        store.add_documents(_documents(f"batch {batch}", 2))
+        assert store.similarity_search(f"batch {batch} 1", k=1)[0].page_content == f"batch {batch} 1"
+    assert _open_descriptors() == before
+    assert store._maps[2] is documents_file
+    
+    store.clear()
+    store.close()
+    assert _open_descriptors() < before
+
+
+def test_rows_committed_elsewhere_are_picked_up_after_the_refresh_interval(workdir, monkeypatch):
+    path = str(workdir / "numpy")
+    reader = NumpyVectorStore(path, DummyEmbeddings())
+    writer = NumpyVectorStore(path, DummyEmbeddings())
+    writer.add_documents(_documents("shared", 3))
+    stats = []
+    original_stat = os.stat
+    monkeypatch.setattr(os, "stat", lambda *args, **kwargs: stats.append(args[0]) or original_stat(*args, **kwargs))
+    
+    # Within the interval searches do not touch meta.json
+    assert reader.similarity_search("shared 1", k=5) == []
+    assert reader.similarity_search("shared 1", k=5) == []
+    assert not any(str(path).endswith(NumpyVectorStore.META_FILE) for path in stats)
+    
+    reader._refreshed_at -= NumpyVectorStore.REFRESH_INTERVAL_SECONDS
+    assert reader.similarity_search("shared 1", k=1)[0].page_content == "shared 1"
+    assert len(reader) == 3
+    reader.close()
+    writer.close()
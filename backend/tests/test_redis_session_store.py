@@ -0,0 +1,223 @@
+import fnmatch
+import socketserver
+import threading
+import time
+import pytest
+from core.memory.memory_manager import MemoryManager
+from core.memory.redis_store import RedisSessionStore
+
+redis = pytest.importorskip("redis")
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    """In-process stand-in for the Redis commands RedisSessionStore sends, over RESP2 or RESP3"""
+    
+    allow_reuse_address = True
+    daemon_threads = True
+    
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _RespHandler)
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+        self.scans = 0
+    
+    def alive(self, key: bytes) -> bool:
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.time() * 1000:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+    
+    def run(self, command):
+        name, args = command[0].upper(), command[1:]
+        key = args[0] if args else None
+        if name in (b"PING",):
+            return "+PONG"
+        if name in (b"CLIENT", b"SELECT"):
+            return "+OK"
+        if name == b"HSET":
+            self.alive(key)
+            fields = self.data.setdefault(key, {})
+            added = sum(field not in fields for field in args[1::2])
+            fields.update(zip(args[1::2], args[2::2]))
+            return added
+        if name == b"HINCRBY":
+            self.alive(key)
+            fields = self.data.setdefault(key, {})
+            fields[args[1]] = str(int(fields.get(args[1], b"0")) + int(args[2])).encode()
+            return int(fields[args[1]])
+        if name == b"HGETALL":
+            return dict(self.data[key]) if self.alive(key) else {}
+        if name == b"RPUSH":
+            self.alive(key)
+            items = self.data.setdefault(key, [])
+            items.extend(args[1:])
+            return len(items)
+        if name == b"LRANGE":
+            if not self.alive(key):
+                return []
+            start, stop = int(args[1]), int(args[2])
+            return self.data[key][start:None if stop == -1 else stop + 1]
+        if name == b"LTRIM":
+            if self.alive(key):
+                self.data[key] = self.data[key][int(args[1]):]
+            return "+OK"
+        if name == b"PEXPIRE":
+            if not self.alive(key):
+                return 0
+            self.expires[key] = time.time() * 1000 + int(args[1])
+            return 1
+        if name == b"PTTL":
+            if not self.alive(key):
+                return -2
+            return int(self.expires[key] - time.time() * 1000) if key in self.expires else -1
+        if name == b"DEL":
+            deleted = [name for name in args if self.alive(name)]
+            for name in deleted:
+                self.data.pop(name)
+                self.expires.pop(name, None)
+            return len(deleted)
+        if name == b"SCAN":
+            self.scans += 1
+            pattern = args[args.index(b"MATCH") + 1].decode() if b"MATCH" in args else "*"
+            names = [name for name in list(self.data) if self.alive(name) and fnmatch.fnmatchcase(name.decode(), pattern)]
+            return [b"0", names]
+        return ValueError(f"unknown command {name.decode()}")
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        queued = None
+        resp3 = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                command.append(self.rfile.read(length + 2)[:-2])
+            name = command[0].upper()
+            with self.server.lock:
+                if name == b"HELLO":
+                    resp3 = command[1] == b"3"
+                    reply = {b"server": b"resp-stand-in", b"proto": 3 if resp3 else 2}
+                elif name == b"MULTI":
+                    queued, reply = [], "+OK"
+                elif name == b"EXEC":
+                    reply, queued = [self.server.run(queued_command) for queued_command in queued], None
+                elif queued is not None:
+                    queued.append(command)
+                    reply = "+QUEUED"
+                else:
+                    reply = self.server.run(command)
+            self.wfile.write(_encode(reply, resp3))
+
+
+def _encode(value, resp3: bool) -> bytes:
+    if isinstance(value, Exception):
+        return b"-ERR %s\r\n" % str(value).encode()
+    if isinstance(value, str):
+        return value.encode() + b"\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, dict):
+        if resp3:
+            return b"%%%d\r\n" % len(value) + b"".join(_encode(key, resp3) + _encode(item, resp3)
+                                                       for key, item in value.items())
+        value = [item for pair in value.items() for item in pair]
+    return b"*%d\r\n" % len(value) + b"".join(_encode(item, resp3) for item in value)
+
+
+@pytest.fixture
+def server():
+    server = RespServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _store(server: RespServer, **kwargs) -> RedisSessionStore:
+    host, port = server.server_address
+    return RedisSessionStore(f"redis://{host}:{port}/0", session_timeout_minutes=30, max_conversation_length=3, **kwargs)
+
+
+def test_sessions_round_trip_through_redis(workdir, server):
+    store = _store(server)
+    manager = MemoryManager(max_conversation_length=3, store=store)
+    session_id = manager.create_session({"name": "Ada"})
+    
+    manager.add_message(session_id, "I feel stuck at work", metadata={"mood": "low"})
+    manager.add_message(session_id, "What is holding you back?", is_user=False)
+    
+    session = _store(server).load(session_id)
+    assert [msg.text for msg in session.messages] == ["I feel stuck at work", "What is holding you back?"]
+    assert session.messages.get(0).metadata == {"mood": "low"}
+    assert session.user_context == {"name": "Ada"}
+    assert session.stats.message_count == 2
+    
+    assert store.delete(session_id)
+    assert store.load(session_id) is None
+    store.close()
+
+
+def test_trimmed_messages_keep_history_cursors_stable(workdir, server):
+    store = _store(server)
+    manager = MemoryManager(max_conversation_length=3, store=store)
+    session_id = manager.create_session()
+    for index in range(5):
+        manager.add_message(session_id, f"message {index}")
+    
+    session = store.load(session_id)
+    assert [msg.text for msg in session.messages] == ["message 2", "message 3", "message 4"]
+    assert session.messages.first == 2
+    assert server.data[store._meta_key(session_id).encode()][b"trimmed"] == b"2"
+    
+    page = manager.get_history_page(session_id, limit=2, after=3)
+    assert [msg["text"] for msg in page["messages"]] == ["message 3", "message 4"]
+    assert page["start"] == 3 and page["has_more_before"]
+    store.close()
+
+
+def test_load_and_update_refresh_the_ttl(workdir, server):
+    store = _store(server)
+    manager = MemoryManager(max_conversation_length=3, store=store)
+    session_id = manager.create_session()
+    manager.add_message(session_id, "I feel stuck at work")
+    keys = [store._meta_key(session_id), store._messages_key(session_id)]
+    
+    for key in keys:
+        store.client.pexpire(key, 1000)
+    store.load(session_id)
+    assert all(store.client.pttl(key) > store.ttl_ms - 5000 for key in keys)
+    
+    for key in keys:
+        store.client.pexpire(key, 1000)
+    manager.add_message(session_id, "Tell me more", is_user=False)
+    assert all(store.client.pttl(key) > store.ttl_ms - 5000 for key in keys)
+    
+    for key in keys:
+        store.client.pexpire(key, 1)
+    time.sleep(0.01)
+    assert store.load(session_id) is None
+    store.close()
+
+
+def test_count_is_cached_between_scans(workdir, server):
+    store = _store(server, count_cache_seconds=60.0)
+    manager = MemoryManager(max_conversation_length=3, store=store)
+    manager.create_session()
+    
+    assert store.count() == 1
+    manager.create_session()
+    assert store.count() == 1
+    assert server.scans == 1
+    assert _store(server, count_cache_seconds=0.0).count() == 2
+    assert "sessions" not in store.memory_stats()
+    store.close()
@@ -0,0 +1,48 @@
+import os
+import sys
+
+# The legacy app imports its modules from its own directory, as when it runs there
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from memory import MemoryManager
+from search_index import InvertedIndex
+
+
+def test_search_returns_oldest_documents_matching_every_term():
+    texts = {1: "I feel anxious about work", 2: "Work is fine today", 3: "Anxiety about work again",
+             4: "anxious and tired", 5: "tired of work"}
+    index = InvertedIndex(text_of=texts.__getitem__)
+    for doc_id, text in texts.items():
+        index.add(doc_id, text)
+    
+    assert index.search("work") == [1, 2, 3, 5]
+    assert index.search("WORK about", limit=1) == [1]
+    assert index.search("anx", prefix=True) == [1, 3, 4]
+    assert index.search("anx work", prefix=True) == [1, 3]
+    assert index.search("anx") == [] and index.search("") == []
+    
+    index.remove(1, texts[1])
+    assert index.search("anxious") == [4]
+    assert "feel" not in index.postings and "feel" not in index.vocabulary
+    assert index.document_count == 4
+
+
+def test_memory_manager_keeps_the_index_in_step_with_sessions():
+    memory = MemoryManager()
+    memory.max_messages_per_session = 3
+    for turn in range(4):
+        memory.add_message("a", f"stuck at work {turn}", is_user=True)
+    memory.add_message("b", "work feels heavy", is_user=True)
+    
+    # The first message of "a" was trimmed and left the index with it
+    matches = memory.search_sessions("work", limit=10)
+    assert [(match["session_id"], match["message"]["text"]) for match in matches] == [
+        ("a", "stuck at work 1"), ("a", "stuck at work 2"), ("a", "stuck at work 3"), ("b", "work feels heavy")
+    ]
+    assert memory.search_sessions("stuck 0") == []
+    assert len(matches[0]["context"]) == 3
+    
+    memory.clear_session("a")
+    assert [match["session_id"] for match in memory.search_sessions("work", limit=10)] == ["b"]
+    memory.delete_session("b")
+    assert memory.search_sessions("work") == [] and memory.search_index.document_count == 0
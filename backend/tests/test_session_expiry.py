@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+from core.memory.expiry import SessionExpiryWorker
+from core.memory.memory_manager import MemoryManager, Session
+from core.memory.memory_store import InMemorySessionStore
+
+
+def _store_with_idle_sessions(count: int) -> InMemorySessionStore:
+    """Store whose sessions all went idle an hour ago, past the 30 minute timeout"""
+    store = InMemorySessionStore(session_timeout_minutes=30)
+    idle_since = datetime.now() - timedelta(hours=1)
+    for index in range(count):
+        store.create(Session(id=f"s{index}", last_activity=idle_since))
+    return store
+
+
+def test_touched_and_deleted_sessions_are_skipped_lazily():
+    store = _store_with_idle_sessions(3)
+    # Touching only moves last_activity; the stale heap entry stays until it comes due
+    assert store.load("s0") is not None
+    assert store.delete("s1")
+    assert len(store._expiry_heap) == 3
+    
+    assert store.cleanup_expired() == 1
+    assert set(store.sessions) == {"s0"}
+    # The touched session was pushed back with its real deadline, the deleted one dropped
+    assert [session_id for _, session_id in store._expiry_heap] == ["s0"]
+    assert store._expiry_heap[0][0] > datetime.now() + timedelta(minutes=29)
+    assert store.expiry_stats()["evicted_total"] == 1
+
+
+def test_sweeps_stay_within_their_budget():
+    store = _store_with_idle_sessions(10)
+    worker = SessionExpiryWorker(MemoryManager(store=store), batch_budget=4)
+    
+    assert [worker.tick() for _ in range(4)] == [4, 4, 2, 0]
+    assert store.count() == 0
+    stats = worker.stats()
+    assert stats["ticks"] == 4 and stats["evicted_total"] == 10
+    assert stats["heap_entries"] == 0 and stats["oldest_due_entry_ms"] == 0.0
@@ -0,0 +1,127 @@
+import os
+import pytest
+from core.memory.journal import SessionJournal
+from core.memory.memory_manager import MemoryManager
+from core.memory.memory_store import InMemorySessionStore
+from core.memory.sharded_store import ShardedSessionStore
+from core.memory.tiered_store import TieredSessionStore
+
+MAX_LENGTH = 3
+
+
+def _open(path, tiered: bool = False) -> MemoryManager:
+    """A journaled store over ``path``, recovered from whatever is there"""
+    journal = SessionJournal(str(path), flush_interval_ms=0, fsync=False)
+    if tiered:
+        shards = [TieredSessionStore(30, MAX_LENGTH, memory_budget_bytes=64 * 1024, spill_dir=str(path / f"spill-{shard}"),
+                                     journal=journal, shard=shard) for shard in range(2)]
+    else:
+        shards = [InMemorySessionStore(30, MAX_LENGTH, journal) for _ in range(2)]
+    store = ShardedSessionStore(shards, journal)
+    store.recover()
+    return MemoryManager(max_conversation_length=MAX_LENGTH, store=store)
+
+
+def _crash(manager: MemoryManager):
+    """Stop without the shutdown snapshot, leaving whatever the log holds"""
+    manager.store.journal.close()
+    for shard in manager.store.shards:
+        shard.close()
+
+
+def _texts(manager: MemoryManager, session_id: str):
+    return [msg.text for msg in manager.get_session(session_id).messages]
+
+
+@pytest.mark.parametrize("tiered", [False, True])
+def test_restart_replays_the_log_tail_over_the_snapshot(workdir, tiered):
+    path = workdir / "wal"
+    manager = _open(path, tiered)
+    before = manager.create_session({"name": "Ada"})
+    manager.add_message(before, "I feel stuck at work")
+    manager.store.snapshot_sync()
+    manager.add_message(before, "What is holding you back?", is_user=False)
+    after = manager.create_session()
+    manager.add_message(after, "I worry about my plans")
+    _crash(manager)
+    
+    manager = _open(path, tiered)
+    assert manager.store.recovery["snapshot_records"] == 1
+    assert manager.store.recovery["log_records"] == 3
+    assert _texts(manager, before) == ["I feel stuck at work", "What is holding you back?"]
+    assert manager.get_session(before).user_context == {"name": "Ada"}
+    assert _texts(manager, after) == ["I worry about my plans"]
+    assert manager.get_session_stats(before).message_count == 2
+    manager.close()
+
+
+def test_torn_final_record_is_dropped_and_truncated(workdir):
+    path = workdir / "wal"
+    manager = _open(path)
+    session_id = manager.create_session()
+    manager.add_message(session_id, "I feel stuck at work")
+    journal = manager.store.journal
+    log_path = journal._file_path("wal", journal.generation)
+    intact = os.path.getsize(log_path)
+    manager.add_message(session_id, "This one is cut short")
+    _crash(manager)
+    with open(log_path, "r+b") as f:
+        f.truncate(intact + SessionJournal.HEADER.size + 4)
+    
+    manager = _open(path)
+    assert _texts(manager, session_id) == ["I feel stuck at work"]
+    assert os.path.getsize(log_path) == intact
+    manager.add_message(session_id, "Logging continues after the tear")
+    _crash(manager)
+    
+    manager = _open(path)
+    assert _texts(manager, session_id) == ["I feel stuck at work", "Logging continues after the tear"]
+    manager.close()
+
+
+def test_clear_and_delete_survive_a_restart(workdir):
+    path = workdir / "wal"
+    manager = _open(path)
+    cleared = manager.create_session()
+    deleted = manager.create_session()
+    for session_id in (cleared, deleted):
+        manager.add_message(session_id, "I feel stuck at work")
+        manager.add_message(session_id, "What is holding you back?", is_user=False)
+    manager.store.snapshot_sync()
+    manager.clear_session(cleared)
+    manager.delete_session(deleted)
+    _crash(manager)
+    
+    manager = _open(path)
+    assert _texts(manager, cleared) == []
+    assert manager.get_session_stats(cleared).message_count == 0
+    assert manager.get_session(cleared).messages.first == 2
+    assert manager.get_session(deleted) is None
+    manager.close()
+
+
+def test_ring_positions_are_preserved_across_restarts(workdir):
+    path = workdir / "wal"
+    manager = _open(path)
+    session_id = manager.create_session()
+    for index in range(5):
+        manager.add_message(session_id, f"message {index}")
+    manager.store.snapshot_sync()
+    manager.add_message(session_id, "message 5")
+    _crash(manager)
+    
+    manager = _open(path)
+    ring = manager.get_session(session_id).messages
+    assert (ring.first, ring.end) == (3, 6)
+    assert _texts(manager, session_id) == ["message 3", "message 4", "message 5"]
+    page = manager.get_history_page(session_id, limit=2, before=6)
+    assert [msg["text"] for msg in page["messages"]] == ["message 4", "message 5"]
+    assert page["start"] == 4
+    # A clean shutdown snapshots, so the next start has no log to replay
+    manager.close()
+    
+    manager = _open(path)
+    assert manager.store.recovery["log_records"] == 0
+    ring = manager.get_session(session_id).messages
+    assert (ring.first, ring.end) == (3, 6)
+    manager.close()
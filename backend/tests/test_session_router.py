@@ -0,0 +1,233 @@
+import asyncio
+import json
+from types import SimpleNamespace
+import httpx
+import pytest
+from config.settings import settings
+from core.memory.memory_manager import MemoryManager
+from core.memory.memory_store import InMemorySessionStore
+from core.memory.sharded_store import ShardedSessionStore
+from services.session_router import HashRing, SessionAffinityMiddleware, SessionRouter, create_session_router
+
+TOKEN = "test-token"
+NODE_A = "http://node-a"
+NODE_B = "http://node-b"
+
+
+class _Body(httpx.AsyncByteStream):
+    def __init__(self, body: bytes):
+        self.body = body
+    
+    async def __aiter__(self):
+        yield self.body
+
+
+class Cluster:
+    """SessionRouters whose HTTP calls to each other are dispatched in process"""
+    
+    def __init__(self):
+        self.routers = {}
+        self.forwarded = []
+        # Called with (node, path, payload) before a cluster endpoint runs
+        self.on_request = None
+    
+    async def add(self, node_url: str, nodes, handoff_window_seconds: float = 60.0) -> SessionRouter:
+        store = ShardedSessionStore([InMemorySessionStore() for _ in range(2)])
+        router = SessionRouter(MemoryManager(store=store), node_url, nodes, token=TOKEN,
+                               handoff_window_seconds=handoff_window_seconds)
+        await router.client.aclose()
+        router.client = httpx.AsyncClient(transport=httpx.MockTransport(self._handle))
+        self.routers[node_url] = router
+        return router
+    
+    async def _handle(self, request: httpx.Request) -> httpx.Response:
+        node = f"{request.url.scheme}://{request.url.host}"
+        router = self.routers[node]
+        path = request.url.path
+        if not path.startswith("/api/v1/cluster/"):
+            self.forwarded.append((node, path, dict(request.headers)))
+            # Streamed, as forwarded responses are relayed chunk by chunk
+            return httpx.Response(200, stream=_Body(json.dumps({"served_by": node}).encode()))
+        if not router.authorized(request.headers.get(SessionRouter.TOKEN_HEADER)):
+            return httpx.Response(403)
+        payload = json.loads(request.content)
+        if self.on_request is not None:
+            response = self.on_request(node, path, payload)
+            if response is not None:
+                return response
+        if path == "/api/v1/cluster/sessions/export":
+            return httpx.Response(200, json={"sessions": router.export_sessions(payload["session_ids"])})
+        if path == "/api/v1/cluster/sessions/import":
+            return httpx.Response(200, json={"imported": router.import_sessions(payload["sessions"])})
+        if path == "/api/v1/cluster/sessions/release":
+            return httpx.Response(200, json={"released": router.release_sessions(payload["session_ids"])})
+        return httpx.Response(404)
+    
+    async def close(self):
+        for router in self.routers.values():
+            await router.close()
+
+
+def _held(router: SessionRouter, session_id: str) -> bool:
+    return router.store.load(session_id) is not None
+
+
+def test_adding_a_node_moves_about_one_nth_of_keys():
+    nodes = [f"http://node-{index}" for index in range(4)]
+    before = HashRing(nodes)
+    after = HashRing(nodes + ["http://node-4"])
+    keys = [f"session-{index}" for index in range(20000)]
+    
+    moved = [key for key in keys if before.owner(key) != after.owner(key)]
+    
+    assert all(after.owner(key) == "http://node-4" for key in moved)
+    assert 0.15 < len(moved) / len(keys) < 0.25
+
+
+def test_router_requires_a_cluster_token(workdir, monkeypatch):
+    store = ShardedSessionStore([InMemorySessionStore()])
+    with pytest.raises(ValueError):
+        SessionRouter(MemoryManager(store=store), NODE_A, [NODE_A], token="")
+    
+    monkeypatch.setattr(settings, "cluster_nodes", NODE_A)
+    monkeypatch.setattr(settings, "cluster_node_url", NODE_A)
+    monkeypatch.setattr(settings, "cluster_token", "")
+    assert create_session_router(MemoryManager(store=store)) is None
+
+
+def test_push_handoff_keeps_sessions_until_the_new_owner_acknowledges(workdir):
+    async def scenario():
+        cluster = Cluster()
+        node_a = await cluster.add(NODE_A, [NODE_A], handoff_window_seconds=0.0)
+        node_b = await cluster.add(NODE_B, [NODE_A, NODE_B])
+        session_ids = [node_a.memory_manager.create_session() for _ in range(40)]
+        moving = [session_id for session_id in session_ids if HashRing([NODE_A, NODE_B]).owner(session_id) == NODE_B]
+        
+        held_on_import = []
+        imports = 0
+        
+        def on_request(node, path, payload):
+            nonlocal imports
+            if path.endswith("/import"):
+                imports += 1
+                held_on_import.extend(_held(node_a, session_id) for session_id in payload["sessions"])
+                if imports == 1:
+                    # The first push fails: the sessions stay on the old owner
+                    return httpx.Response(500)
+        cluster.on_request = on_request
+        
+        node_a.set_nodes([NODE_A, NODE_B])
+        await node_a._handoff_task
+        assert all(held_on_import) and len(held_on_import) == len(moving)
+        assert all(_held(node_a, session_id) and not _held(node_b, session_id) for session_id in moving)
+        assert node_a.previous_rings == []
+        
+        node_a.set_nodes([NODE_A, NODE_B])
+        await node_a._handoff_task
+        assert all(_held(node_b, session_id) and not _held(node_a, session_id) for session_id in moving)
+        assert all(_held(node_a, session_id) for session_id in session_ids if session_id not in moving)
+        assert node_a.handed_off == len(moving)
+        await cluster.close()
+    
+    asyncio.run(scenario())
+
+
+def test_missing_session_is_pulled_from_its_previous_owner(workdir):
+    async def scenario():
+        cluster = Cluster()
+        node_a = await cluster.add(NODE_A, [NODE_A, NODE_B])
+        node_b = await cluster.add(NODE_B, [NODE_A, NODE_B])
+        session_id = node_a.memory_manager.create_session()
+        node_a.memory_manager.add_message(session_id, "I feel stuck at work")
+        
+        held_on_release = []
+        cluster.on_request = lambda node, path, payload: held_on_release.append(_held(node_b, session_id)) \
+            if path.endswith("/release") else None
+        
+        # Only the new owner has heard about the change; node A has not pushed anything
+        node_b.set_nodes([NODE_B])
+        await node_b.ensure_local(session_id)
+        
+        assert held_on_release == [True]
+        assert not _held(node_a, session_id)
+        assert len(node_b.memory_manager.get_session(session_id).messages) == 1
+        assert node_b.pulled == 1 and node_a.handed_off == 1
+        assert node_b.stats()["handing_off"]
+        await cluster.close()
+    
+    asyncio.run(scenario())
+
+
+def test_pulls_stop_once_the_handoff_window_closes(workdir):
+    async def scenario():
+        cluster = Cluster()
+        node_a = await cluster.add(NODE_A, [NODE_A, NODE_B])
+        node_b = await cluster.add(NODE_B, [NODE_A, NODE_B], handoff_window_seconds=0.05)
+        session_id = node_a.memory_manager.create_session()
+        exports = []
+        cluster.on_request = lambda node, path, payload: exports.append(node) if path.endswith("/export") else None
+        
+        node_b.set_nodes([NODE_B])
+        await node_b._handoff_task
+        await node_b.ensure_local(session_id)
+        
+        assert exports == [] and node_b.previous_rings == []
+        assert _held(node_a, session_id)
+        await cluster.close()
+    
+    asyncio.run(scenario())
+
+
+async def _request(router: SessionRouter, path: str, headers):
+    served = []
+    
+    async def app(scope, receive, send):
+        served.append(scope)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+    
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    sent = []
+    
+    async def send(message):
+        sent.append(message)
+    
+    scope = {
+        "type": "http",
+        "app": SimpleNamespace(state=SimpleNamespace(session_router=router)),
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": [(name.encode(), value.encode()) for name, value in headers.items()]
+    }
+    await SessionAffinityMiddleware(app)(scope, receive, send)
+    return served, sent
+
+
+def test_forwarded_header_is_ignored_without_a_valid_token(workdir):
+    async def scenario():
+        cluster = Cluster()
+        node_a = await cluster.add(NODE_A, [NODE_A, NODE_B])
+        await cluster.add(NODE_B, [NODE_A, NODE_B])
+        ring = node_a.ring
+        remote = next(f"session-{index}" for index in range(100) if ring.owner(f"session-{index}") == NODE_B)
+        local = next(f"session-{index}" for index in range(100) if ring.owner(f"session-{index}") == NODE_A)
+        forged = {SessionRouter.FORWARDED_HEADER: NODE_B, SessionRouter.TOKEN_HEADER: "wrong"}
+        
+        served, _ = await _request(node_a, f"/api/v1/session/{remote}", forged)
+        assert served == []
+        node, _, headers = cluster.forwarded[-1]
+        assert node == NODE_B and headers[SessionRouter.TOKEN_HEADER] == TOKEN
+        
+        served, _ = await _request(node_a, f"/api/v1/session/{local}", forged)
+        assert len(served) == 1
+        assert SessionRouter.FORWARDED_HEADER.encode() not in dict(served[0]["headers"])
+        
+        genuine = {SessionRouter.FORWARDED_HEADER: NODE_B, SessionRouter.TOKEN_HEADER: TOKEN}
+        served, _ = await _request(node_a, f"/api/v1/session/{remote}", genuine)
+        assert len(served) == 1 and len(cluster.forwarded) == 1
+        await cluster.close()
+    
+    asyncio.run(scenario())
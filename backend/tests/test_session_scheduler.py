@@ -0,0 +1,88 @@
+import asyncio
+import httpx
+import pytest
+from config.settings import settings
+from api.dependencies import get_chat_service
+from services.session_scheduler import SessionBusyError, SessionScheduler
+from main import app
+from tests.test_chat_concurrency import SleepingLLM
+
+
+def test_requests_run_in_arrival_order_per_session_and_in_parallel_across_sessions():
+    order = []
+    
+    async def work(label: str, delay: float):
+        order.append(f"start {label}")
+        await asyncio.sleep(delay)
+        order.append(f"end {label}")
+        return label
+    
+    async def scenario():
+        scheduler = SessionScheduler(max_depth=3)
+        results = await asyncio.gather(
+            scheduler.run("a", lambda: work("a1", 0.03)),
+            scheduler.run("a", lambda: work("a2", 0.0)),
+            scheduler.run("b", lambda: work("b1", 0.01)),
+            scheduler.run("a", lambda: work("a3", 0.0))
+        )
+        return results, scheduler.stats()
+    
+    results, stats = asyncio.run(scenario())
+    assert results == ["a1", "a2", "b1", "a3"]
+    # b1 runs while a1 holds session a; a2 and a3 wait their turn
+    assert order == ["start a1", "start b1", "end b1", "end a1", "start a2", "end a2", "start a3", "end a3"]
+    assert stats["admitted"] == 4 and stats["queued"] == 2 and stats["active_sessions"] == 0
+
+
+def test_overflow_is_rejected_and_a_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        scheduler = SessionScheduler(max_depth=2)
+        first = scheduler.reserve("a")
+        second = scheduler.reserve("a")
+        with pytest.raises(SessionBusyError):
+            scheduler.reserve("a")
+        
+        waiter = asyncio.ensure_future(second.__aenter__())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.depth("a") == 1
+        third = scheduler.reserve("a")
+        first.release()
+        async with third:
+            pass
+        return scheduler.stats()
+    
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1 and stats["in_flight"] == 0
+
+
+async def _flood_one_session(count: int, llm: SleepingLLM):
+    async with app.router.lifespan_context(app):
+        get_chat_service().reflection_engine.llm = llm
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.post("/api/v1/chat", json={"message": "I feel stuck at work lately"})
+            session_id = first.json()["session_id"]
+            return await asyncio.gather(*(
+                client.post("/api/v1/chat", json={"message": f"I keep worrying about it {index}",
+                                                  "session_id": session_id})
+                for index in range(count)
+            ))
+
+
+def test_a_flooded_session_gets_429_beyond_its_queue(workdir, monkeypatch):
+    monkeypatch.setattr(settings, "test_mode", False)
+    monkeypatch.setattr(settings, "session_max_queued_requests", 2)
+    get_chat_service.cache_clear()
+    llm = SleepingLLM(0.05)
+    try:
+        responses = asyncio.run(_flood_one_session(5, llm))
+    finally:
+        get_chat_service.cache_clear()
+    
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200, 200, 429, 429, 429]
+    assert all(response.json()["success"] for response in responses if response.status_code == 200)
+    # The admitted requests of the session ran one at a time
+    assert llm.max_in_flight == 1
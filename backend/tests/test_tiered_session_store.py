@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+from core.memory.memory_manager import MemoryManager
+from core.memory.tiered_store import TieredSessionStore
+
+
+def _manager(workdir, **budget) -> MemoryManager:
+    store = TieredSessionStore(30, 4, spill_dir=str(workdir / "spill"), **budget)
+    return MemoryManager(max_conversation_length=4, store=store)
+
+
+def _fill(memory: MemoryManager, count: int):
+    session_ids = []
+    for index in range(count):
+        session_id = memory.create_session({"index": index})
+        memory.add_messages(session_id, [(f"session {index} message {turn} " * 3, turn % 2 == 0, None)
+                                         for turn in range(6)])
+        session_ids.append(session_id)
+    return session_ids
+
+
+def test_sessions_round_trip_through_warm_and_cold_tiers(workdir):
+    # Room for about one hot session and one or two compressed ones
+    memory = _manager(workdir, memory_budget_bytes=6000, hot_fraction=0.75)
+    store = memory.store
+    session_ids = _fill(memory, 6)
+    
+    stats = store.memory_stats()
+    assert stats["sessions"] == 6 and store.count() == 6
+    assert stats["hot"]["sessions"] >= 1 and stats["warm"]["sessions"] >= 1 and stats["cold"]["sessions"] >= 1
+    assert stats["hot"]["approx_bytes"] <= stats["hot"]["budget_bytes"]
+    assert stats["warm"]["bytes"] <= stats["warm"]["budget_bytes"]
+    
+    for index, session_id in enumerate(session_ids):
+        session = memory.get_session(session_id)
+        assert session.user_context == {"index": index}
+        # The ring kept the last four messages and their cursors
+        assert [msg.text for msg in session.messages] == [f"session {index} message {turn} " * 3 for turn in range(2, 6)]
+        assert (session.messages.first, session.messages.end) == (2, 6)
+        assert session.stats.user_message_count == 2 and session.stats.assistant_message_count == 2
+    
+    stats = store.memory_stats()
+    assert stats["rehydrations"]["warm"]["count"] + stats["rehydrations"]["cold"]["count"] >= 5
+    assert store.count() == 6
+    memory.add_message(session_ids[0], "back again")
+    assert memory.get_conversation_view(session_ids[0])[-1].text == "back again"
+    memory.close()
+
+
+def test_idle_sessions_are_demoted_and_expired_in_every_tier(workdir):
+    memory = _manager(workdir, memory_budget_bytes=6000, hot_fraction=0.75, hot_idle_seconds=60)
+    store = memory.store
+    session_ids = _fill(memory, 6)
+    for session_id in session_ids[-2:]:
+        memory.get_session(session_id).last_activity = datetime.now() - timedelta(minutes=5)
+    store.cleanup_expired()
+    assert not store.sessions
+    
+    # Age every tier past the 30 minute timeout
+    idle_since = datetime.now() - timedelta(hours=1)
+    for session_id, (blob, _) in list(store._warm.items()):
+        store._warm[session_id] = (blob, idle_since)
+    store._spill.execute("UPDATE sessions SET last_activity = ?", (idle_since.timestamp(),))
+    # Due heap entries are re-checked against the tiers' last activity
+    store._expiry_heap = [(idle_since, session_id) for _, session_id in store._expiry_heap]
+    assert store.cleanup_expired() == 6
+    assert store.count() == 0 and all(memory.get_session(session_id) is None for session_id in session_ids)
+    memory.close()
+    assert not list((workdir / "spill").glob("*.sqlite3"))
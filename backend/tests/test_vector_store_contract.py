@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from knowledge.embeddings.embedder import DummyEmbeddings
+from knowledge.vector_store.store import VectorStore
+
+
+@pytest.fixture(params=["faiss", "numpy", "chroma"])
+def vector_store(request, workdir):
+    if request.param == "chroma":
+        pytest.importorskip("chromadb")
+    store = VectorStore(store_type=request.param, store_path=str(workdir / "vector_store"))
+    store.embedder._embeddings = DummyEmbeddings()
+    yield store
+    store.close()
+
+
+def test_empty_store_returns_nothing(vector_store):
+    assert vector_store.document_count() == 0
+    assert vector_store.similarity_search("anything", k=3) == []
+    assert vector_store.get_relevant_context("anything") == ""
+
+
+def test_similarity_search_ranks_the_matching_document_first(vector_store):
+    documents = VectorStore.sample_documents()
+    assert vector_store.add_documents(documents)
+    assert vector_store.document_count() == len(documents)
+    
+    query = documents[2].page_content
+    hits = vector_store.similarity_search(query, k=3)
+    assert len(hits) == 3
+    assert hits[0].page_content == query
+    assert hits[0].metadata == documents[2].metadata
+    assert len({hit.page_content for hit in hits}) == 3
+    
+    async_hits = asyncio.run(vector_store.asimilarity_search(query, k=3))
+    assert [hit.page_content for hit in async_hits] == [hit.page_content for hit in hits]
+    
+    assert len(vector_store.similarity_search(query, k=len(documents) + 5)) == len(documents)
+
+
+def test_get_relevant_context_starts_with_the_best_match_and_respects_the_budget(vector_store):
+    documents = VectorStore.sample_documents()
+    vector_store.add_documents(documents)
+    query = documents[0].page_content
+    
+    context = vector_store.get_relevant_context(query)
+    assert context.startswith(query)
+    assert asyncio.run(vector_store.aget_relevant_context(query)) == context
+    
+    short = vector_store.get_relevant_context(query, max_context_length=len(query))
+    assert short == query